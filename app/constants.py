@@ -34,4 +34,106 @@ COVER_ART_URL_PREFIX = "/assets/coverarts"
 
 DATABASE_URL = "sqlite:///db/app.db"
 
-SPOTIFY_URL_PATTERN = re.compile(r'https://open\.spotify\.com/(track|episode)/([a-zA-Z0-9]+)')
\ No newline at end of file
+SPOTIFY_URL_PATTERN = re.compile(r'https://open\.spotify\.com/(track|episode)/([a-zA-Z0-9]+)')
+
+# QUEUE: max number of concurrent metadata lookups per source when resolving a batch
+QUEUE_RESOLVE_CONCURRENCY = {
+    "youtube": 4,
+    "spotify": 4,
+    "mpd": 2,
+    "direct": 8,
+}
+# Number of finished batches kept around for the status endpoint
+QUEUE_BATCH_HISTORY = 50
+
+# METADATA CACHE: seconds a resolved lookup stays valid, per source
+METADATA_CACHE_TTLS = {
+    "youtube": 7 * 24 * 3600,
+    "spotify": 30 * 24 * 3600,
+    "mpd": 5 * 60,  # the local library changes when files are added
+    "url": 24 * 3600,
+}
+METADATA_CACHE_NEGATIVE_TTL = 10 * 60  # failed lookups are retried after this
+METADATA_CACHE_MEMORY_SIZE = 2048  # entries kept in the in-memory LRU
+
+# STREAM PREFETCH: direct audio URLs are resolved ahead of time for the next queue items
+PREFETCH_QUEUE_ITEMS = 3
+PREFETCH_CONCURRENCY = 2
+STREAM_URL_EXPIRY_MARGIN = 10 * 60  # don't hand out URLs that expire sooner than this
+STREAM_URL_DEFAULT_LIFETIME = 5 * 3600  # used when the URL has no expire= parameter
+YTDLP_AUDIO_FORMAT = "bestaudio/best"  # playback is audio only (mpv runs with --no-video)
+
+# YT-DLP WORKER POOL: long-lived processes holding warm yt_dlp.YoutubeDL instances
+YTDLP_POOL_SIZE = 2
+YTDLP_POOL_MAX_JOBS = 100  # a worker is recycled after this many jobs
+YTDLP_JOB_TIMEOUT = 60  # seconds, the worker is killed and restarted on timeout
+YTDLP_MAX_OPEN_STREAMS = 32  # lazily extracted result lists (e.g. searches) a worker keeps open
+YTDLP_MAX_INSTANCES = 16  # YoutubeDL instances (one per option set) a worker keeps warm
+
+# SEARCH: per query result cache, later pages only extract the new results
+SEARCH_CACHE_TTL = 15 * 60
+SEARCH_CACHE_SIZE = 64
+SEARCH_PREFETCH_EXTRA = 10  # results fetched beyond the requested page
+
+# TYPEAHEAD: search-as-you-type, only the latest query of a client is extracted
+TYPEAHEAD_DEBOUNCE = 0.3  # seconds a query waits for a newer keystroke before searching
+
+# UNIFIED SEARCH: every source is searched in parallel, each under its own deadline (seconds)
+UNIFIED_SEARCH_DEADLINES = {
+    "library": 2.0,
+    "favourites": 1.0,
+    "spotify": 1.0,
+    "history": 1.0,
+    "youtube": 8.0,
+}
+
+# PODCASTS: YouTube playlists/channels are listed flat, one page at a time
+PODCAST_PAGE_SIZE = 20
+PODCAST_ENRICH_CONCURRENCY = 4  # full metadata lookups for the visible page
+PODCAST_ENRICH_DEADLINE = 1.5  # seconds, slower lookups finish in the background for the next request
+FEED_CACHE_FRESHNESS = 60 * 60  # seconds a fetched feed is served without asking the source again
+FEED_REFRESH_INTERVAL = 30 * 60  # how often saved podcasts are checked for stale feeds
+FEED_REFRESH_CONCURRENCY = 2
+EPISODE_INDEX_PAGE_SIZE = 50  # episodes listed per request while looking for new ones
+EPISODE_INDEX_MAX_NEW = 200  # cap for the first index of a huge channel or feed
+
+# SPOTIFY API
+SPOTIFY_PAGE_CONCURRENCY = 4  # pages of one listing fetched at the same time
+SPOTIFY_MAX_RETRIES = 5  # retries of a request answered with 429 Too Many Requests
+SPOTIFY_FULL_SYNC_INTERVAL = 24 * 3600  # seconds, a liked songs sync walks the whole library (to find removals) this often
+SPOTIFY_TOKEN_REFRESH_MARGIN = 5 * 60  # seconds, the access token is refreshed this long before it expires
+SPOTIFY_HTTP_POOL_SIZE = 10  # kept-alive connections to the Spotify API
+
+# OUTBOUND HTTP: one shared keep-alive client (app/utils/http_client.py)
+HTTP_TIMEOUT = 10  # seconds, per read/write/pool wait
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_MAX_CONNECTIONS = 50
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY = 60  # seconds an idle connection is kept open
+HTTP_PER_HOST_LIMIT = 6  # concurrent requests to one host
+
+# PODCAST OFFLINE DOWNLOADS: newest episodes of podcasts with `keep_offline` set
+PODCAST_DOWNLOAD_DIR = MUSIC_DIR / "podcasts"  # inside MPD's music directory, so MPD can play them
+PODCAST_DOWNLOAD_RATE_LIMIT = 1024 * 1024  # bytes per second, downloads run one at a time
+PODCAST_DISK_QUOTA = 5 * 1024 ** 3  # bytes, oldest offline episodes are removed beyond this
+PODCAST_DOWNLOAD_INTERVAL = 30 * 60  # seconds between checks for new episodes to download
+
+# ALBUM ART CACHE: images stored by content hash, with resized variants
+ART_CACHE_DIR = COVER_ART_PATH / "art"  # served under COVER_ART_URL_PREFIX + "/art"
+ART_SIZES = (64, 256, 640)  # square bounding boxes of the resized variants, in px
+ART_TRACK_MEMORY = 1024  # track ids remembered for /player/album_art/{track_id}
+
+# LOCAL ALBUM ART: art of MPD library tracks, looked up once per album
+LOCAL_ART_FILENAMES = ("cover", "folder", "front", "album")  # image files next to the tracks, after embedded art
+LOCAL_ART_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+# THUMBNAIL MIRROR: small local copies of remote list thumbnails (Spotify album art, YouTube)
+THUMBNAIL_DIR = COVER_ART_PATH / "thumbs"  # served under COVER_ART_URL_PREFIX + "/thumbs"
+THUMBNAIL_SIZE = 128  # px, square bounding box
+THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 ** 2  # least recently used thumbnails are removed beyond this
+THUMBNAIL_MIRROR_CONCURRENCY = 4
+
+# COVER ART PLACEHOLDERS: blurhash strings computed when art is stored
+PLACEHOLDER_COMPONENTS = (4, 3)  # blurhash components along x and y
+PLACEHOLDER_SAMPLE_SIZE = 32  # px, images are scaled down to this before encoding
+PLACEHOLDER_WORKERS = 2
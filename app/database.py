@@ -1,6 +1,7 @@
 # app/database.py
 
 from sqlmodel import SQLModel, Session, create_engine
+from sqlalchemy import text, inspect
 from .constants import DATABASE_URL
 from pathlib import Path
 
@@ -9,8 +10,111 @@ Path("db").mkdir(parents=True, exist_ok=True)
 
 engine = create_engine(DATABASE_URL, echo=True)
 
+# Full text indexes: table -> indexed columns.
+# FTS5 tables (`<table>_fts`) keeping their own copy of the columns, keyed by the table's
+# primary key (`FTS_KEYS`) and kept in sync by triggers on the table itself.
+# Not external content on `rowid`: these tables have no INTEGER PRIMARY KEY, so VACUUM may renumber it.
+FTS_INDEXES = {
+    "favouritedsongs": ("song_name", "artist"),
+    "spotifylikedsongitem": ("name", "artist"),
+    "history": ("song_name",),
+}
+FTS_KEYS = {
+    "favouritedsongs": "id",
+    "spotifylikedsongitem": "id",
+    "history": "time",
+}
+# Column of `<table>_fts` holding the primary key, last so bm25 weights line up with FTS_INDEXES
+FTS_KEY_COLUMN = "row_key"
+
+# False when SQLite was built without FTS5, searches fall back to LIKE
+fts_available = False
+
+
+def _drop_rowid_fts(conn, table: str):
+    """Drops an index built by an older version, as external content on the unstable rowid."""
+    fts = f"{table}_fts"
+    sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts}
+    ).scalar()
+    if sql is None or FTS_KEY_COLUMN in sql:
+        return
+    for trigger in ("ai", "ad", "au"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{trigger}"))
+    conn.execute(text(f"DROP TABLE {fts}"))
+    print(f"♻️ Rebuilding full text index {fts} on {FTS_KEYS[table]}")
+
+
+def _create_fts_indexes():
+    global fts_available
+
+    with engine.begin() as conn:
+        for table, columns in FTS_INDEXES.items():
+            fts = f"{table}_fts"
+            key = FTS_KEYS[table]
+            cols = ", ".join(columns)
+            new_cols = ", ".join(f"new.{c}" for c in columns)
+
+            _drop_rowid_fts(conn, table)
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts}
+            ).first()
+
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{cols}, {FTS_KEY_COLUMN} UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}({cols}, {FTS_KEY_COLUMN}) VALUES ({new_cols}, new.{key}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"DELETE FROM {fts} WHERE {FTS_KEY_COLUMN} = old.{key}; END"
+            ))
+            # Only the indexed columns, e.g. the `last_seen` updates of a Spotify sync don't touch the index
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols}, {key} ON {table} BEGIN "
+                f"DELETE FROM {fts} WHERE {FTS_KEY_COLUMN} = old.{key}; "
+                f"INSERT INTO {fts}({cols}, {FTS_KEY_COLUMN}) VALUES ({new_cols}, new.{key}); END"
+            ))
+
+            if not exists:
+                # Index the rows that were there before the index
+                conn.execute(text(f"INSERT INTO {fts}({cols}, {FTS_KEY_COLUMN}) SELECT {cols}, {key} FROM {table}"))
+                print(f"✅ Built full text index {fts}")
+
+    fts_available = True
+
+
+def _add_missing_columns():
+    """
+    `create_all` skips tables that already exist, so columns (and indexes) added to a
+    model later are created here. New columns have to be nullable.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                print(f"✅ Added column {table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    _add_missing_columns()
+    try:
+        _create_fts_indexes()
+    except Exception as e:
+        print(f"⚠️ Full text search unavailable, falling back to LIKE: {e}")
 
 def get_session():
     with Session(engine) as session:
@@ -20,7 +20,7 @@ from app.crud import get_items, create_item
 from app.routers import history, player, spotify_tasks, songs_fetchers, search, favourites, podcasts, queue_manager, downloader, tasks
 
 
-from app.constants import VERSION, COVER_ART_PATH, MPD_PORT, COVER_ART_URL_PREFIX
+from app.constants import VERSION, COVER_ART_PATH, MPD_PORT, COVER_ART_URL_PREFIX, PODCAST_DOWNLOAD_DIR
 
 from app.utils.check_utils import check_dependencies
 
@@ -31,6 +31,14 @@ from app.utils.player_utils import *
 from app.variables import player_instance
 
 from app.database import create_db_and_tables, get_session
+import app.utils.metadata_cache as metadata_cache
+import app.utils.stream_prefetcher as stream_prefetcher
+import app.utils.ytdlp_pool as ytdlp_pool
+import app.utils.http_client as http_client
+import app.utils.podcast_downloader as podcast_downloader
+import app.utils.thumbnail_mirror as thumbnail_mirror
+import app.utils.spotify_auth_utils as spotify_auth_utils
+import app.utils.spotify_sync as spotify_sync
 
 from .utils.command import control_playerctl
 
@@ -64,6 +72,7 @@ async def lifespan(app: FastAPI):
     
     # MAKE FOLDER STRUCTURE
     COVER_ART_PATH.mkdir(parents=True, exist_ok=True)
+    PODCAST_DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
     
     await init_mpd_mpdris(MPD_PORT) 
     
@@ -79,8 +88,34 @@ async def lifespan(app: FastAPI):
 
     create_db_and_tables()
     print("✅ SQLite DB and tables ready")
+    metadata_cache.purge_expired()
+
+    await http_client.start()
+
+    # Warm up the yt-dlp workers before the first lookup
+    await asyncio.to_thread(ytdlp_pool.pool.start)
+
+    prefetch_task = asyncio.create_task(stream_prefetcher.run_prefetcher())
+    feed_refresh_task = asyncio.create_task(podcasts.run_feed_refresher())
+    podcast_download_task = asyncio.create_task(podcast_downloader.run_downloader())
+    thumbnail_task = asyncio.create_task(thumbnail_mirror.run_mirror())
+    spotify_token_task = asyncio.create_task(spotify_auth_utils.run_token_refresher())
+    await spotify_sync.resume()
     yield
     # (Optional) Clean-up logic here
+
+    # Keeps its checkpoint, resumed on the next start
+    await spotify_sync.stop()
+
+    for task in (prefetch_task, feed_refresh_task, podcast_download_task, thumbnail_task, spotify_token_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    await asyncio.to_thread(ytdlp_pool.pool.shutdown)
+    await http_client.close()
     
     await cleanup_mpd_mpdris()
         
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
 from typing import Optional
 import uuid
 from datetime import datetime, timezone
@@ -15,7 +16,44 @@ class SpotifyLikedSongItem(SQLModel, table=True):
     artist: str
     album_art: Optional[str]
     spotify_url: str
-    
+    added_at: Optional[str] = Field(default=None, index=True)  # when it was liked, ISO 8601 from Spotify
+    last_seen: Optional[float] = None  # start of the last full sync that listed it, older ones were unliked
+
+
+class SpotifySyncState(SQLModel, table=True):
+    """
+    Single row (`id=1`) tracking the liked songs sync.
+    The checkpoint of a running sync is written with every page it stores,
+    a sync still `running` at startup was interrupted and is resumed from there.
+    """
+    id: int = Field(default=1, primary_key=True)
+    last_sync: Optional[float] = None
+    last_full_sync: Optional[float] = None  # last sync that walked the whole library and removed unliked songs
+
+    status: Optional[str] = None  # running, done, failed
+    mode: Optional[str] = None  # "new" (only newly liked songs) or "full"
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    offset: Optional[int] = None  # checkpoint: next page to fetch
+    checkpoint_added_at: Optional[str] = None  # checkpoint: `added_at` of the last stored song
+    total: Optional[int] = None  # liked songs on Spotify, as of the last page
+    skipped: Optional[int] = None  # listed items without a track id (local files), counted in `total` but not stored
+    added: Optional[int] = None
+    removed: Optional[int] = None
+    error: Optional[str] = None
+
+
+class SpotifyLikedSong(SQLModel):
+    """A liked song as returned by the API: `album_art` is the local thumbnail once it is mirrored."""
+    id: str
+    name: str
+    artist: str
+    album_art: Optional[str]
+    album_art_remote: Optional[str] = None  # Spotify CDN URL, fallback for the local thumbnail
+    album_art_blurhash: Optional[str] = None  # placeholder of the local thumbnail
+    added_at: Optional[str] = None
+    spotify_url: str
+
 class FavouritedSongs(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     song_name: str
@@ -33,13 +71,25 @@ class Podcast(SQLModel, table=True):
     title: str
     url: str
     channel: str
+    # Episode index high-water mark, only newer episodes are fetched on refresh
+    latest_guid: Optional[str] = None
+    latest_upload_date: Optional[str] = None
+    indexed_at: Optional[float] = None
+    keep_offline: Optional[int] = None  # newest N episodes kept downloaded, None/0 = streaming only
     
 class Episode(SQLModel, table=True):
+    __table_args__ = (Index("ix_episode_podcast_id_upload_date", "podcast_id", "upload_date"),)
+
     id: str = Field(primary_key=True)
-    url: str
+    url: str = Field(index=True)
     thumbnail_url: str
     uploader: str
     upload_date: str
+    podcast_id: Optional[str] = None  # None for episodes saved on their own
+    guid: Optional[str] = Field(default=None, index=True)  # RSS guid, YouTube video id or Spotify episode id
+    title: Optional[str] = None
+    local_path: Optional[str] = None  # offline copy, relative to MUSIC_DIR (MPD's music directory)
+    downloaded_at: Optional[float] = None
     
     
 class History(SQLModel, table=True):
@@ -49,24 +99,58 @@ class History(SQLModel, table=True):
     url: int
     player_type: str
 
+
+class MetadataCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True)  # canonical media id, e.g. youtube:dQw4w9WgXcQ
+    source: str
+    data: Optional[str] = None  # JSON encoded metadata, None for a cached failure
+    expires_at: float = Field(index=True)
+
+
+class ArtCacheEntry(SQLModel, table=True):
+    source: str = Field(primary_key=True)  # art URL (plus mtime for local files)
+    art_id: str = Field(index=True)  # sha256 of the image
+    fetched_at: float
+
+
+class FeedCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True)  # feed URL (RSS) or URL + page (YouTube, Spotify)
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = Field(index=True)  # last time the source was checked, a 304 counts
+    data: str  # JSON encoded PodcastSource
+
 # DATA MODELS ------------------------------------------------------- #
 from pydantic import BaseModel, Field
 from typing import Optional, Any, Dict, List
 
 
 class SongMetadataModel(BaseModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)  # queue entry id
     media_name: str
-    artist: Optional[str]
-    album: Optional[str]
-    duration: Optional[int]  # in seconds
-    source: Optional[str]
-    url: Optional[str]
+    artist: Optional[str] = None
+    album: Optional[str] = None
+    duration: Optional[int] = None  # in seconds
+    source: Optional[str] = None
+    url: Optional[str] = None
+    thumbnail: Optional[str] = None
+    resolved: bool = True  # False while this is a placeholder waiting for its metadata
     
 class QueueItem(BaseModel):
     url: Optional[str] = None
     file_name: Optional[str] = None
     song_name: Optional[str] = None
 
+class QueueBatchStatus(BaseModel):
+    batch_id: str
+    status: str = "pending"  # pending | running | completed
+    total: int = 0
+    resolved: int = 0
+    failed: int = 0
+    queued: int = 0  # number of queue entries added so far
+    created_at: str
+    finished_at: Optional[str] = None
+
 class PlayerInfo(BaseModel):
     status: Optional[str] = None
     current_media_type: Optional[str] = None
@@ -79,6 +163,7 @@ class PlayerInfo(BaseModel):
     media_progress: int = 0
     is_live: Optional[bool] = False
     media_url: Optional[str] = ""
+    album_art_blurhash: Optional[str] = None  # placeholder of the art from /player/album_art
     
 
 class MediaData(BaseModel):
@@ -95,6 +180,14 @@ class MediaData(BaseModel):
         description="Absolute or relative file path to the media file to play using MPD."
     )
     
+class StreamInfo(BaseModel):
+    page_url: str
+    stream_url: str  # direct (signed) media URL, playable without yt-dlp
+    format_id: Optional[str] = None
+    http_headers: Dict[str, str] = {}
+    title: Optional[str] = None
+    expires_at: float = 0  # unix time after which stream_url stops working
+
 class MediaInfo(BaseModel):
     title: Optional[str] = ""
     upload_date: Optional[str] = ""
@@ -5,13 +5,16 @@ from ..utils.command import control_playerctl
 from ..utils.player_utils import get_playerctl_data
 from .mediaplayerbase import MediaPlayerBase
 from contextlib import suppress
+from typing import Optional
 
 class MPDPlayer(MediaPlayerBase):
-    def __init__(self, song_name: str):
-        if not song_name:
+    def __init__(self, song_name: str, file: Optional[str] = None):
+        """`file` (relative to the music directory) plays that exact file instead of searching by title."""
+        if not song_name and not file:
             raise ValueError("Song name must be provided for MPD playback.")
 
-        self.song_name = song_name
+        self.song_name = song_name or file
+        self.file = file
         self.type = "mpd"
         self._is_paused = False
         self._unloaded = False
@@ -32,7 +35,10 @@ class MPDPlayer(MediaPlayerBase):
 
     async def _load_song(self):
         await self._run_mpc("clear")
-        cmd = ["mpc", f"--port={MPD_PORT}", "findadd", "title", self.song_name]
+        if self.file:
+            cmd = ["mpc", f"--port={MPD_PORT}", "add", self.file]
+        else:
+            cmd = ["mpc", f"--port={MPD_PORT}", "findadd", "title", self.song_name]
         print("🔧 Running command:", " ".join(shlex.quote(arg) for arg in cmd))
 
         proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
@@ -4,14 +4,17 @@ import os
 import uuid
 from contextlib import suppress
 from typing import Optional
-from app.models import PlayerInfo
+from app.models import PlayerInfo, StreamInfo
+from app.constants import YTDLP_AUDIO_FORMAT
 
 class MPVMediaPlayer:
-    def __init__(self, url):
+    def __init__(self, url, stream: Optional[StreamInfo] = None):
         if not url:
             raise ValueError("A valid URL must be provided to initialize MPVMediaPlayer.")
 
         self.url = url
+        # Pre-resolved direct stream, when set mpv plays it without running yt-dlp again
+        self.stream = stream
         self.info = {}
         self.type = "mpv"
         self.ipc_path = f"/tmp/mpv_socket_{uuid.uuid4().hex[:8]}"
@@ -24,7 +27,7 @@ class MPVMediaPlayer:
         try:
             self.process = await asyncio.create_subprocess_exec(
                 'mpv',
-                self.url,
+                *self._source_args(),
                 '--no-terminal',
                 '--no-video',
                 '--force-window=no',
@@ -52,6 +55,23 @@ class MPVMediaPlayer:
             await self.cleanup()
             raise
 
+    def _source_args(self):
+        if self.stream is None:
+            # mpv's ytdl_hook extracts the page, only fetch audio formats
+            return [self.url, f'--ytdl-format={YTDLP_AUDIO_FORMAT}']
+
+        args = [self.stream.stream_url, '--ytdl=no']
+        # Keep the MPRIS title, the queue monitor compares it with the song name
+        title = self.info.get("title") or self.stream.title
+        if title:
+            args.append(f'--force-media-title={title}')
+        for header, value in self.stream.http_headers.items():
+            if header.lower() == "user-agent":
+                args.append(f'--user-agent={value}')
+            else:
+                args.append(f'--http-header-fields-append={header}: {value}')
+        return args
+
     async def _send_ipc_command(self, command: dict):
         if self._cleaned_up or self._stopping or not self.is_running() or not os.path.exists(self.ipc_path):
             print("⚠️ Cannot send IPC command: player is stopped or cleaning up")
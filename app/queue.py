@@ -1,5 +1,6 @@
+import asyncio
 from collections import deque
-from typing import List
+from typing import List, Optional, Set
 from app.models import QueueItem
 
 def insert_at(deq, index, item):
@@ -53,9 +54,51 @@ def queue_to_json(deq: deque):
     """Returns the queue items as a JSON-serializable list."""
     return list(deq)  # If you want to serialize: return json.dumps(list(deq))
 
+def find_index(deq: deque, item_id: str) -> Optional[int]:
+    """Returns the index of the queue entry with the given id, or None."""
+    for index, entry in enumerate(deq):
+        if getattr(entry, "id", None) == item_id:
+            return index
+    return None
+
 
 queue = deque()
 
+
+# --- Queue change notifications ---
+_subscribers: Set[asyncio.Queue] = set()
+
+def subscribe() -> asyncio.Queue:
+    """Registers a listener, every queue event will be put on the returned asyncio.Queue."""
+    listener: asyncio.Queue = asyncio.Queue(maxsize=100)
+    _subscribers.add(listener)
+    return listener
+
+def unsubscribe(listener: asyncio.Queue):
+    _subscribers.discard(listener)
+
+def _serialize(entry):
+    return entry.model_dump() if hasattr(entry, "model_dump") else entry
+
+def publish_event(event_type: str, **data):
+    """
+    Notifies all listeners about a queue change.
+    Must be called from the event loop thread.
+    """
+    event = {"type": event_type}
+    for key, value in data.items():
+        if isinstance(value, list):
+            event[key] = [_serialize(v) for v in value]
+        else:
+            event[key] = _serialize(value)
+
+    for listener in list(_subscribers):
+        try:
+            listener.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client, drop the event rather than blocking the queue
+            pass
+
 # TODO: Implement this by threading library instead of asybcio
 # def wait_until_finished(
 #     player_type: str,
@@ -3,6 +3,9 @@ from pydantic import BaseModel, HttpUrl
 from app.constants import YTDLP_DOWNLOAD_DIR, SPOTDL_DOWNLOAD_DIR
 import subprocess
 import re
+import asyncio
+import httpx
+import app.utils.http_client as http_client
 from pathlib import Path
 
 router = APIRouter()
@@ -13,21 +16,15 @@ SPOTDL_DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 class DownloadRequest(BaseModel):
     url: HttpUrl
 
-def resolve_spotify_share_link(url: str) -> str:
-    """Resolves Spotify short share links to their final URLs using curl."""
+async def resolve_spotify_share_link(url: str) -> str:
+    """Resolves Spotify short share links to their final URLs by following the redirects."""
     try:
-        result = subprocess.run(
-            ["curl", "-Ls", "-o", "/dev/null", "-w", "%{url_effective}", url],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True,
-            text=True
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
+        async with http_client.stream("GET", url) as response:
+            return str(response.url)
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=400, detail="Failed to resolve share link")
 
-def run_download(url: str):
+async def run_download(url: str):
     youtube_pattern = re.compile(r"(https?://)?(www\.)?(music\.)?youtube\.com|youtu\.be")
     spotify_pattern = re.compile(r"(https?://)?(open\.)?spotify\.com")
     spotify_short_pattern = re.compile(r"(https?://)?(spoti\.fi|spotify\.link)/")
@@ -35,7 +32,7 @@ def run_download(url: str):
     try:
         # Resolve short Spotify links
         if spotify_short_pattern.search(url):
-            url = resolve_spotify_share_link(url)
+            url = await resolve_spotify_share_link(url)
 
         if youtube_pattern.search(url):
             output_template = str(YTDLP_DOWNLOAD_DIR / "%(title)s.%(ext)s")
@@ -47,7 +44,7 @@ def run_download(url: str):
                 "--audio-format", "mp3",
                 url
             ]
-            subprocess.run(command, check=True)
+            await asyncio.to_thread(subprocess.run, command, check=True)
 
         elif spotify_pattern.search(url):
             command = [
@@ -55,9 +52,9 @@ def run_download(url: str):
                 "--output", str(SPOTDL_DOWNLOAD_DIR),
                 url
             ]
-            subprocess.run(command, check=True)
+            await asyncio.to_thread(subprocess.run, command, check=True)
 
-    except subprocess.CalledProcessError:
+    except (subprocess.CalledProcessError, HTTPException):
         # Logging or error tracking can be added here
         pass
 
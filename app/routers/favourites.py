@@ -10,10 +10,29 @@ from app.constants import COVER_ART_PATH, COVER_ART_URL_PREFIX
 from sqlmodel import Session, select
 
 from app.database import engine
+import app.utils.text_search as text_search
+import app.utils.thumbnail_mirror as thumbnail_mirror
+import app.utils.placeholders as placeholders
 
 
 router = APIRouter()
 
+
+def _with_thumbnails(songs) -> list:
+    """
+    Remote cover art points to its mirrored thumbnail, the original stays in `cover_art_remote`.
+    `cover_art_blurhash` is the placeholder of the local image.
+    """
+    results = []
+    for song in songs:
+        data = song.model_dump()
+        data["cover_art_remote"] = data.get("cover_art_url")
+        data["cover_art_url"] = thumbnail_mirror.prefer_local(data["cover_art_remote"])
+        data["cover_art_blurhash"] = placeholders.for_url(data["cover_art_url"])
+        results.append(data)
+    return results
+
+
 @router.post("/favourites", tags=["Manually Saved Songs"])
 async def liked_songs_post(
     song_name: str = Body(..., embed=True),
@@ -50,6 +69,7 @@ async def liked_songs_post(
         file_path = COVER_ART_PATH / filename
         with open(file_path, "wb") as f:
             f.write(await image.read())
+        placeholders.schedule(file_path)
         cover_art_url = f"{COVER_ART_URL_PREFIX}/{filename}"
 
     # Save to DB (update your add_liked_song to accept artist and cover_art_url)
@@ -87,18 +107,29 @@ async def liked_songs_post(
         raise HTTPException(status_code=500, detail=f"Failed to add song to DB: {e}")
 
 @router.get("/favourites", tags=["Manually Saved Songs"])
-def get_all_favourited_songs(type: Optional[str] = Query(None, description="Filter by song type (e.g. youtube, spotify, mpd, ...)")):
+def get_all_favourited_songs(
+    type: Optional[str] = Query(None, description="Filter by song type (e.g. youtube, spotify, mpd, ...)"),
+    q: Optional[str] = Query(None, description="Search song names and artists, best matches first"),
+    limit: int = Query(50, ge=1, le=500, description="Results per page (with `q`)"),
+    offset: int = Query(0, ge=0, description="Results to skip (with `q`)")
+):
     """
     # Get Favourite Songs
-    Get the Manually Added Favourited Songs, can be filtered by add a `type=` parameter
+    Get the Manually Added Favourited Songs, can be filtered by add a `type=` parameter.
+    With `q=` only matching songs are returned, ranked and paginated with `limit`/`offset`.
     """
     try:
+        if q:
+            filters = {"type": type.lower()} if type else None
+            songs, total = text_search.search(FavouritedSongs, q, limit, offset, filters)
+            return {"songs": _with_thumbnails(songs), "total": total, "limit": limit, "offset": offset}
+
         with Session(engine) as session:
             if type:
                 statement = select(FavouritedSongs).where(FavouritedSongs.type == type.lower())
             else:
                 statement = select(FavouritedSongs)
             songs = session.exec(statement).all()
-            return {"songs": songs}
+            return {"songs": _with_thumbnails(songs)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch songs: {e}")
\ No newline at end of file
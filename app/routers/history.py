@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Query, HTTPException, Response
 from sqlmodel import Session, select
 from typing import List, Optional, Union
 from app.database import engine
 from app.models import History
+import app.utils.text_search as text_search
 
 router = APIRouter()
 
 @router.get("/history", response_model=List[History], summary="Get playback history")
 def get_history(
+    response: Response,
     limit: Union[str, int] = Query(
         default="100",
         description=(
@@ -21,8 +23,19 @@ def get_history(
             "all": {"summary": "All entries", "value": "all"},
             "custom": {"summary": "Custom number of entries", "value": "50"}
         } # type: ignore
-    )
+    ),
+    q: Optional[str] = Query(None, description="Search song names, best matches first. The total is in `X-Total-Count`"),
+    offset: int = Query(0, ge=0, description="Results to skip (with `q`)")
 ):
+    if q:
+        page_size = 100 if isinstance(limit, str) and not limit.isdigit() else int(limit)
+        try:
+            results, total = text_search.search(History, q, page_size, offset)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to search history: {str(e)}")
+        response.headers["X-Total-Count"] = str(total)
+        return results
+
     try:
         with Session(engine) as session:
             statement = select(History).order_by(History.time.desc())
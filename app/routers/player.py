@@ -9,11 +9,13 @@ from ..models import PlayerInfo, MediaData
 from typing import Optional
 from fastapi.exceptions import HTTPException
 
-import subprocess
-from pathlib import Path
-from urllib.parse import urlparse, unquote
-from fastapi.responses import Response
-import requests
+from fastapi import Request
+from fastapi.responses import Response, FileResponse
+import mimetypes
+from typing import Tuple
+import app.utils.art_cache as art_cache
+import app.utils.local_art as local_art
+from app.constants import ART_SIZES
 
 from app.utils.media_handlers import *
 
@@ -65,18 +67,22 @@ async def clean_player(player):
         # Always reset the global reference
         vars.player_instance = None
         vars.player_type = ""
+        vars.current_art_id = None
 
 
 @router.get("/", tags=["Player"], summary="Get Player Status", response_model=PlayerInfo)
-def player_status():
+async def player_status():
     """
     # Player Status
     Gets the current status of the media player -> `vars.player_instance`.
+    `album_art_blurhash` is the placeholder of the art last returned by `/player/album_art`.
     """
     
         
     if vars.player_instance is not None:
-        vars.player_info = vars.player_instance.get_state()
+        vars.player_info = await vars.player_instance.get_state()
+        if vars.player_info is not None:
+            vars.player_info.album_art_blurhash = art_cache.blurhash(vars.current_art_id)
         return vars.player_info
     
 @router.post("/play", tags=["Player"])
@@ -169,6 +175,7 @@ async def stop_player():
         await vars.player_instance.stop()
         await vars.player_instance.unload()
         vars.player_instance = None  # Reset the player instance                
+        vars.current_art_id = None
         # Reset the STATE
         vars.player_info = PlayerInfo()
         vars.player_info.status = "stopped"
@@ -255,13 +262,60 @@ def player_previous():
     return {"message": "TODO: player prev"}
 
 
+async def _current_art() -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    One playerctl call for the status, art URL and track URL of the current player.
+    Returns `(status, art_url, track_url)`, all None when nothing is playing.
+    """
+    process = await asyncio.create_subprocess_exec(
+        "playerctl", "--player=" + vars.player_type, "metadata",
+        "--format", "{{status}}\t{{mpris:artUrl}}\t{{xesam:url}}",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode().strip() or f"playerctl exited with {process.returncode}")
+
+    status, art_url, track_url = (stdout.decode().strip().split("\t") + ["", "", ""])[:3]
+    return status.lower() or None, art_url or None, track_url or None
+
+
+async def _serve_art(request: Request, art_id: str, size: Optional[int], cache_control: str, extra_headers: Optional[dict] = None):
+    """Sends a cached image; a client that already has it gets a 304."""
+    try:
+        path = await art_cache.variant_path(art_id, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail="Album art not found")
+
+    headers = {
+        "ETag": art_cache.etag(art_id, path),
+        "Cache-Control": cache_control,
+        "X-Art-Id": art_id,
+        **(extra_headers or {}),
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    media_type = "image/jpeg" if path.suffix == ".jpg" else (mimetypes.guess_type(path.name)[0] or "image/jpeg")
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
 @router.get("/album_art", tags=["Player"])
-async def album_art():
+async def album_art(
+    request: Request,
+    size: Optional[int] = Query(None, description=f"Resized variant, one of {ART_SIZES}. Original if omitted")
+):
     """
     # Album Art
     Returns the album art image.
     Uses MPRIS to get the metadata `mpris:artUrl`
     If no player is running, i.e `vars.player_instance` is `None`, returns an HTTPException
+
+    Art is cached by content hash: send `If-None-Match` with the last `ETag` to get a `304`
+    while the art doesn't change. The `X-Track-Id` header can be used with
+    `/player/album_art/{track_id}`, which is cacheable without asking again.
     """
 
 
@@ -274,51 +328,53 @@ async def album_art():
     valid_states = valid_states_by_player.get(vars.player_type, [])
 
     try:
-        status = subprocess.check_output(
-            ["playerctl", "--player=" + vars.player_type, "status"],
-            text=True
-        ).strip().lower()
-        print(f"{vars.player_type} status: {status}")
-
-        if status not in valid_states:
-            return {"error": f"{vars.player_type} not in a valid state"}
-
-        url = subprocess.check_output(
-            ["playerctl", "--player=" + vars.player_type, "metadata", "mpris:artUrl"],
-            text=True
-        ).strip()
-        print(f"{vars.player_type} artUrl: {url}")
+        status, url, track_url = await _current_art()
+        print(f"{vars.player_type} status: {status}, artUrl: {url}")
+    except Exception as e:
+        print(f"{vars.player_type} command failed: {e}")
+        return {"error": f"{vars.player_type} command failed: {e}"}
 
-        if url.startswith("file://"):
-            parsed = urlparse(url)
-            local_path = Path(unquote(parsed.path))
-            print(f"Trying local path: {local_path}")
+    if status not in valid_states:
+        return {"error": f"{vars.player_type} not in a valid state"}
 
-            if not local_path.exists():
-                return {"error": "File not found at local path"}
+    # mpDris2 often has no artUrl for local files, use the art embedded in the track instead
+    local_track = local_art.track_path(track_url) if vars.player_type == "mpd" and track_url else None
+    art_id = None
+    if not url and local_track is not None:
+        art_id = await asyncio.to_thread(local_art.art_for_track, local_track)
+        if art_id is None:
+            return {"error": f"No album art found for: {local_track}"}
+        url = track_url
 
-            mime = "image/jpeg"
-            if local_path.suffix.lower() == ".png":
-                mime = "image/png"
+    if art_id is None and (not url or not (url.startswith("file://") or url.startswith("http"))):
+        return {"error": f"Unrecognized art URL format: {url}"}
 
-            return Response(content=local_path.read_bytes(), media_type=mime)
+    if art_id is None:
+        art_id = await art_cache.art_id_for_source(url)
+    if art_id is None:
+        return {"error": f"Failed to load album art from: {url}"}
 
-        elif url.startswith("http"):
-            print(f"Downloading remote image from: {url}")
-            response = requests.get(url, timeout=5)
+    track_id = art_cache.make_track_id(track_url or "", url)
+    await art_cache.remember_track(track_id, art_id)
+    vars.current_art_id = art_id
 
-            if response.status_code != 200:
-                return {"error": f"HTTP request failed with status: {response.status_code}"}
+    # The current track changes, clients have to revalidate (cheap with the ETag)
+    return await _serve_art(request, art_id, size, "no-cache", {"X-Track-Id": track_id})
 
-            mime = response.headers.get("Content-Type", "image/jpeg")
-            return Response(content=response.content, media_type=mime)
 
-        else:
-            return {"error": f"Unrecognized art URL format: {url}"}
+@router.get("/album_art/{track_id}", tags=["Player"])
+async def album_art_by_track(
+    request: Request,
+    track_id: str,
+    size: Optional[int] = Query(None, description=f"Resized variant, one of {ART_SIZES}. Original if omitted")
+):
+    """
+    # Album Art of a track
+    `track_id` is the `X-Track-Id` returned by `/player/album_art`. The image of a track
+    doesn't change, so this response can be cached by the client.
+    """
+    art_id = await art_cache.art_for_track(track_id)
+    if art_id is None:
+        raise HTTPException(status_code=404, detail="Unknown track, fetch /player/album_art first")
+    return await _serve_art(request, art_id, size, "public, max-age=86400")
 
-    except subprocess.CalledProcessError as e:
-        print(f"{vars.player_type} command failed: {e}")
-        return {"error": f"{vars.player_type} command failed: {e}"}
-    except Exception as e:
-        print(f"Unexpected error for {vars.player_type}: {e}")
-        return {"error": f"Unexpected error for {vars.player_type}: {e}"}
\ No newline at end of file
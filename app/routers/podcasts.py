@@ -1,25 +1,43 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
+from sqlmodel import Session, select, func
 from app.database import get_session
 from app.models import Podcast, Episode
 import uuid
 from typing import Optional
 from pydantic import BaseModel
 import re
-import subprocess
-import json
-from typing import List, Optional
-from pydantic import BaseModel, HttpUrl
+from typing import List, Optional, Tuple, NamedTuple, Mapping
+from pydantic import BaseModel, HttpUrl, Field
 from urllib.parse import urlparse
 import feedparser
-import requests
-
-
-from app.utils.spotify_auth_utils import is_spotify_setup, load_spotify_auth
-sp = load_spotify_auth()
+import asyncio
+import time
+import app.utils.ytdlp_pool as ytdlp_pool
+from app.utils.ytdlp_helpers import get_media_data
+import app.utils.feed_cache as feed_cache
+import app.utils.http_client as http_client
+import app.utils.podcast_downloader as podcast_downloader
+from app.database import engine
+from app.constants import (
+    PODCAST_PAGE_SIZE,
+    PODCAST_ENRICH_CONCURRENCY,
+    PODCAST_ENRICH_DEADLINE,
+    FEED_REFRESH_INTERVAL,
+    FEED_REFRESH_CONCURRENCY,
+    EPISODE_INDEX_PAGE_SIZE,
+    EPISODE_INDEX_MAX_NEW,
+    PODCAST_DISK_QUOTA,
+    PODCAST_DOWNLOAD_RATE_LIMIT,
+)
+
+
+from app.utils.spotify_auth_utils import is_spotify_setup, get_spotify_client
+from app.utils.spotify_fetchers import call_with_retry, fetch_all_pages
 
 class PodcastParamsBody(BaseModel):
     url: Optional[str]
+    page: int = Field(1, ge=1)
+    per_page: int = Field(PODCAST_PAGE_SIZE, ge=1, le=50)
 
 class PodcastItem(BaseModel):
     title: str
@@ -27,6 +45,7 @@ class PodcastItem(BaseModel):
     thumbnail: Optional[HttpUrl] = None
     uploader: Optional[str] = None
     upload_date: Optional[str] = None  # UTC ISO string
+    guid: Optional[str] = None  # stable id within the podcast: video id, Spotify episode id or RSS guid
 
 class PodcastSource(BaseModel):
     type: str
@@ -34,101 +53,118 @@ class PodcastSource(BaseModel):
     title: Optional[str] = None
     channel: Optional[str] = None
     items: List[PodcastItem]
+    page: int = 1
+    per_page: Optional[int] = None
+    total: Optional[int] = None  # None when the source doesn't tell
+    has_more: bool = False
 
 router = APIRouter()
 
+FEED_USER_AGENT = "Mozilla/5.0 (PodcastFetcher/1.0)"
+
 # --- Handler registry ---
-async def handle_youtube_playlist(url: str) -> PodcastSource:
-    try:
-        result = subprocess.run(
-            ["yt-dlp", "-J", url],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=20
-        )
+CHANNEL_TABS = ("videos", "streams", "shorts", "playlists", "podcasts", "featured", "releases")
 
-        if result.returncode != 0:
-            raise Exception(result.stderr.strip())
 
-        data = json.loads(result.stdout)
-        entries = data.get("entries", [])
+def channel_videos_url(url: str) -> str:
+    """A channel root lists its tabs, not its videos; point it at the videos tab."""
+    parsed = urlparse(url)
+    path = parsed.path.rstrip("/")
+    if path.split("/")[-1] in CHANNEL_TABS:
+        return url
+    return parsed._replace(path=f"{path}/videos").geturl()
 
-        items = []
-        for entry in entries:
-            if not entry or "id" not in entry:
-                continue
 
-            video_url = f"https://www.youtube.com/watch?v={entry['id']}"
-            upload_date = entry.get("upload_date")
-            iso_date = None
-            if upload_date:
-                iso_date = f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:8]}T00:00:00Z"
-
-            items.append(PodcastItem(
-                title=entry.get("title"),
-                url=video_url,
-                thumbnail=entry.get("thumbnail"),
-                uploader=entry.get("uploader"),
-                upload_date=iso_date
-            ))
+def _iso_upload_date(upload_date: Optional[str]) -> Optional[str]:
+    if not upload_date:
+        return None
+    return f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:8]}T00:00:00Z"
 
-        return PodcastSource(
-            type="YouTube Playlist",
-            url=url,
-            title=data.get("title"),
-            channel=data.get("uploader"),
-            items=items
-        )
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch playlist: {str(e)}")
+async def _enrich_page(video_urls: List[str]) -> dict:
+    """
+    Full metadata for the visible page, looked up concurrently (shared metadata cache).
+    Returns what is known after `PODCAST_ENRICH_DEADLINE`, the remaining lookups keep
+    running and land in the cache for the next request.
+    """
+    semaphore = asyncio.Semaphore(PODCAST_ENRICH_CONCURRENCY)
 
+    async def lookup(video_url: str):
+        async with semaphore:
+            return video_url, await asyncio.to_thread(get_media_data, video_url)
 
+    tasks = [asyncio.ensure_future(lookup(video_url)) for video_url in video_urls]
+    if not tasks:
+        return {}
+    done, pending = await asyncio.wait(tasks, timeout=PODCAST_ENRICH_DEADLINE)
+    for task in pending:
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    enriched = {}
+    for task in done:
+        if task.exception() is None:
+            video_url, info = task.result()
+            if info:
+                enriched[video_url] = info
+    return enriched
 
-async def handle_youtube_channel(url: str) -> PodcastSource:
-    try:
-        result = subprocess.run(
-            ["yt-dlp", "-J", url],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=20
-        )
 
-        if result.returncode != 0:
-            raise Exception(result.stderr.strip())
+async def _handle_youtube_list(url: str, source_type: str, page: int, per_page: int) -> PodcastSource:
+    """
+    Lists one page of a playlist or channel with a flat extraction (no per-video requests),
+    then fills in the visible page with full metadata.
+    """
+    start = (page - 1) * per_page + 1
+    # One extra entry tells whether there is a next page
+    data = await ytdlp_pool.extract_info_async(
+        url,
+        {"extract_flat": "in_playlist", "playliststart": start, "playlistend": start + per_page},
+        timeout=20,
+    )
+    entries = [entry for entry in data.get("entries") or [] if entry and entry.get("id")]
+    has_more = len(entries) > per_page
+    entries = entries[:per_page]
+
+    video_urls = [f"https://www.youtube.com/watch?v={entry['id']}" for entry in entries]
+    enriched = await _enrich_page(video_urls)
+
+    items = []
+    for entry, video_url in zip(entries, video_urls):
+        info = enriched.get(video_url) or {}
+        thumbnails = entry.get("thumbnails") or []
+        items.append(PodcastItem(
+            title=info.get("title") or entry.get("title"),
+            url=video_url,
+            thumbnail=info.get("thumbnail") or entry.get("thumbnail") or (thumbnails[-1].get("url") if thumbnails else None),
+            uploader=info.get("uploader") or entry.get("uploader") or entry.get("channel") or data.get("uploader"),
+            upload_date=_iso_upload_date(info.get("upload_date") or entry.get("upload_date")),
+            guid=entry["id"]
+        ))
+
+    return PodcastSource(
+        type=source_type,
+        url=url,
+        title=data.get("title"),
+        channel=data.get("uploader") or data.get("channel"),
+        items=items,
+        page=page,
+        per_page=per_page,
+        total=data.get("playlist_count"),
+        has_more=has_more
+    )
 
-        data = json.loads(result.stdout)
-        entries = data.get("entries", [])
 
-        items = []
-        for entry in entries:
-            if not entry or "id" not in entry:
-                continue
+async def handle_youtube_playlist(url: str, page: int = 1, per_page: int = PODCAST_PAGE_SIZE) -> PodcastSource:
+    try:
+        return await _handle_youtube_list(url, "YouTube Playlist", page, per_page)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch playlist: {str(e)}")
 
-            video_url = f"https://www.youtube.com/watch?v={entry['id']}"
-            upload_date = entry.get("upload_date")
-            iso_date = None
-            if upload_date:
-                iso_date = f"{upload_date[:4]}-{upload_date[4:6]}-{upload_date[6:8]}T00:00:00Z"
-
-            items.append(PodcastItem(
-                title=entry.get("title"),
-                url=video_url,
-                thumbnail=entry.get("thumbnail"),
-                uploader=entry.get("uploader"),
-                upload_date=iso_date
-            ))
 
-        return PodcastSource(
-            type="YouTube Channel",
-            url=url,
-            title=data.get("title"),
-            channel=data.get("uploader"),
-            items=items
-        )
 
+async def handle_youtube_channel(url: str, page: int = 1, per_page: int = PODCAST_PAGE_SIZE) -> PodcastSource:
+    try:
+        return await _handle_youtube_list(channel_videos_url(url), "YouTube Channel", page, per_page)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch channel: {str(e)}")
 
@@ -136,92 +172,175 @@ def extract_show_id(url: str) -> str:
     path = urlparse(url).path
     return path.split('/')[-1]
 
-async def handle_spotify_show(url: str) -> PodcastSource:
-    try:
-        show_id = extract_show_id(url)
-        show = sp.show(show_id)
-        episodes_data = sp.show_episodes(show_id, limit=50)
+async def fetch_spotify_show(url: str) -> PodcastSource:
+    """Every episode of a show; the pages after the first one are fetched concurrently."""
+    show_id = extract_show_id(url)
+    sp = await asyncio.to_thread(get_spotify_client)
+    show = await asyncio.to_thread(call_with_retry, sp.show, show_id)
+    episodes = await fetch_all_pages(
+        lambda offset, limit: sp.show_episodes(show_id, limit=limit, offset=offset)
+    )
 
-        items = []
-        for ep in episodes_data["items"]:
-            items.append(PodcastItem(
-                title=ep["name"],
-                url=ep["external_urls"]["spotify"],
-                thumbnail=ep["images"][0]["url"] if ep["images"] else None,
-                uploader=show["publisher"],
-                upload_date=f"{ep['release_date']}T00:00:00Z" if ep.get("release_date") else None
-            ))
+    items = []
+    for ep in episodes:
+        items.append(PodcastItem(
+            title=ep["name"],
+            url=ep["external_urls"]["spotify"],
+            thumbnail=ep["images"][0]["url"] if ep["images"] else None,
+            uploader=show["publisher"],
+            upload_date=f"{ep['release_date']}T00:00:00Z" if ep.get("release_date") else None,
+            guid=ep["id"]
+        ))
+
+    return PodcastSource(
+        type="Spotify Show",
+        url=url,
+        title=show["name"],
+        channel=show["publisher"],
+        items=items,
+        total=len(items)
+    )
 
-        return PodcastSource(
-            type="Spotify Show",
-            url=url,
-            title=show["name"],
-            channel=show["publisher"],
-            items=items
-        )
 
+async def handle_spotify_show(url: str, page: int = 1, per_page: int = PODCAST_PAGE_SIZE, force: bool = False) -> PodcastSource:
+    try:
+        # Cached whole like an RSS feed, pages are cut from it
+        source = await cached_source(url, lambda: fetch_spotify_show(url), force)
+        return paginate(source, page, per_page)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch Spotify show: {str(e)}")
 
 
-async def handle_rss_feed(url: str) -> PodcastSource:
-    try:
-        # Fetch and parse RSS feed
-        response = requests.get(url, timeout=10)
-        if response.status_code != 200:
-            raise Exception(f"Status code: {response.status_code}")
-        
-        feed = feedparser.parse(response.content)
-        if not feed.entries:
-            raise Exception("No entries found in RSS feed")
-
-        items = []
-        for entry in feed.entries:
-            audio_url = None
-            if 'enclosures' in entry and entry.enclosures:
-                audio_url = entry.enclosures[0].get('href')
-
-            if not audio_url:
-                continue  # Skip if no playable media
-
-            upload_date = None
-            if entry.get("published_parsed"):
-                from datetime import datetime
-                upload_date = datetime(*entry.published_parsed[:6]).isoformat() + "Z"
-
-            thumbnail = None
-            if "itunes_image" in entry:
-                thumbnail = entry.itunes_image.get("href")
-            elif "image" in entry:
-                thumbnail = entry.image.get("href")
-            elif "media_thumbnail" in entry:
-                thumbnail = entry.media_thumbnail[0].get("url")
-
-            uploader = (
-                entry.get("itunes_author") or
-                entry.get("author") or
-                entry.get("dc_creator")
-            )
-
-            items.append(PodcastItem(
-                title=entry.get("title", "Untitled"),
-                url=audio_url,
-                thumbnail=thumbnail,
-                uploader=uploader,
-                upload_date=upload_date
-            ))
-
-        return PodcastSource(
-            type="RSS Feed",
-            url=url,
-            title=feed.feed.get("title"),
-            channel=feed.feed.get("itunes_author") or feed.feed.get("author"),
-            items=items
+def parse_rss_feed(content: bytes, url: str) -> PodcastSource:
+    """Parses a whole RSS feed, every playable entry."""
+    feed = feedparser.parse(content)
+    if not feed.entries:
+        raise Exception("No entries found in RSS feed")
+
+    items = []
+    for entry in feed.entries:
+        audio_url = None
+        if 'enclosures' in entry and entry.enclosures:
+            audio_url = entry.enclosures[0].get('href')
+
+        if not audio_url:
+            continue  # Skip if no playable media
+
+        upload_date = None
+        if entry.get("published_parsed"):
+            from datetime import datetime
+            upload_date = datetime(*entry.published_parsed[:6]).isoformat() + "Z"
+
+        thumbnail = None
+        if "itunes_image" in entry:
+            thumbnail = entry.itunes_image.get("href")
+        elif "image" in entry:
+            thumbnail = entry.image.get("href")
+        elif "media_thumbnail" in entry:
+            thumbnail = entry.media_thumbnail[0].get("url")
+
+        uploader = (
+            entry.get("itunes_author") or
+            entry.get("author") or
+            entry.get("dc_creator")
         )
 
+        items.append(PodcastItem(
+            title=entry.get("title", "Untitled"),
+            url=audio_url,
+            thumbnail=thumbnail,
+            uploader=uploader,
+            upload_date=upload_date,
+            guid=entry.get("id") or audio_url
+        ))
+
+    return PodcastSource(
+        type="RSS Feed",
+        url=url,
+        title=feed.feed.get("title"),
+        channel=feed.feed.get("itunes_author") or feed.feed.get("author"),
+        items=items,
+        total=len(items)
+    )
+
+
+class FetchedFeed(NamedTuple):
+    """A feed body downloaded while classifying its URL."""
+    content: bytes
+    headers: Mapping[str, str]
+
+
+async def fetch_rss_feed(url: str, force: bool = False, prefetched: Optional[FetchedFeed] = None) -> PodcastSource:
+    """
+    Returns the whole parsed feed, from the feed cache while it is fresh.
+    A stale feed is revalidated with a conditional GET, a 304 reuses the cached parse.
+    `force` skips the freshness window (the request stays conditional).
+    `prefetched` is the response the URL was classified with, it is parsed instead of fetching again.
+    """
+    if prefetched is not None:
+        content, headers = prefetched
+    else:
+        entry = await asyncio.to_thread(feed_cache.get_entry, url)
+        if entry is not None and not force and feed_cache.is_fresh(entry):
+            return PodcastSource(**feed_cache.load(entry))
+
+        headers = {"User-Agent": FEED_USER_AGENT, **feed_cache.conditional_headers(entry)}
+        response = await http_client.get(url, headers=headers)
+
+        if response.status_code == 304 and entry is not None:
+            await asyncio.to_thread(feed_cache.touch, url)
+            return PodcastSource(**feed_cache.load(entry))
+        if response.status_code != 200:
+            raise Exception(f"Status code: {response.status_code}")
+        content, headers = response.content, response.headers
+
+    # Parsing a large feed takes a while, keep it off the event loop
+    source = await asyncio.to_thread(parse_rss_feed, content, url)
+    await asyncio.to_thread(
+        feed_cache.store,
+        url,
+        source.model_dump(mode="json"),
+        etag=headers.get("ETag"),
+        last_modified=headers.get("Last-Modified"),
+    )
+    return source
+
+
+def paginate(source: PodcastSource, page: int, per_page: int) -> PodcastSource:
+    offset = (page - 1) * per_page
+    return source.model_copy(update={
+        "items": source.items[offset:offset + per_page],
+        "page": page,
+        "per_page": per_page,
+        "total": len(source.items),
+        "has_more": len(source.items) > offset + per_page,
+    })
+
+
+async def handle_rss_feed(
+    url: str,
+    page: int = 1,
+    per_page: int = PODCAST_PAGE_SIZE,
+    force: bool = False,
+    prefetched: Optional[FetchedFeed] = None
+) -> PodcastSource:
+    try:
+        source = await fetch_rss_feed(url, force, prefetched)
+        return paginate(source, page, per_page)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch RSS feed: {str(e)}")
 
+
+async def cached_source(key: str, fetch, force: bool = False) -> PodcastSource:
+    """Feed cache for sources without conditional requests: served as is while fresh."""
+    entry = await asyncio.to_thread(feed_cache.get_entry, key)
+    if entry is not None and not force and feed_cache.is_fresh(entry):
+        return PodcastSource(**feed_cache.load(entry))
+
+    source = await fetch()
+    await asyncio.to_thread(feed_cache.store, key, source.model_dump(mode="json"))
+    return source
+
 # --- Matcher definitions ---
 def is_youtube_playlist(url: str) -> bool:
     return "youtube.com/playlist" in url or "list=" in url
@@ -232,19 +351,61 @@ def is_youtube_channel(url: str) -> bool:
 def is_spotify_show(url: str) -> bool:
     return "open.spotify.com/show/" in url
 
-def is_rss_feed(url: str) -> bool:
-    try:
-        feed = feedparser.parse(url)
-        return bool(feed.entries)
-    except Exception:
+FEED_CONTENT_TYPES = ("rss", "atom", "xml")
+FEED_MARKERS = (b"<rss", b"<feed", b"<rdf:RDF")
+
+
+def _looks_like_feed(content_type: str, head: bytes) -> bool:
+    """Decides from the Content-Type and the first bytes, without parsing the feed."""
+    if "html" in content_type:
         return False
+    if any(kind in content_type for kind in FEED_CONTENT_TYPES):
+        return True
+    head = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    return head.startswith(b"<?xml") or any(marker in head for marker in FEED_MARKERS)
+
+
+async def classify_podcast_url(url: str) -> Tuple[Optional[str], Optional[FetchedFeed]]:
+    """
+    Returns `(kind, feed)`, `kind` is a key of `PODCAST_HANDLERS` or None.
+    URL patterns are checked first; anything else is fetched once and sniffed.
+    For a feed the downloaded body is returned too, so it isn't downloaded again.
+    """
+    if is_youtube_playlist(url):
+        return "youtube_playlist", None
+    if is_youtube_channel(url):
+        return "youtube_channel", None
+    if is_spotify_show(url):
+        return "spotify_show", None
+
+    # Known feed, the handler revalidates it with a conditional request
+    if await asyncio.to_thread(feed_cache.get_entry, url) is not None:
+        return "rss", None
 
-def safe_get(url: str, timeout: float = 4.0) -> str:
+    try:
+        async with http_client.stream("GET", url, headers={"User-Agent": FEED_USER_AGENT}) as response:
+            if response.status_code != 200:
+                return None, None
+            chunks = response.aiter_bytes()
+            head = await anext(chunks, b"")
+            if not _looks_like_feed(response.headers.get("Content-Type", "").lower(), head[:1024]):
+                return None, None
+            # It's a feed: read the rest, the handler parses this body
+            body = bytearray(head)
+            async for chunk in chunks:
+                body.extend(chunk)
+            return "rss", FetchedFeed(bytes(body), response.headers)
+    except Exception as e:
+        print(f"[classify] Failed to fetch URL: {url} -> {e}")
+        return None, None
+
+
+async def safe_get(url: str, timeout: float = 4.0) -> str:
     try:
         headers = {
-            "User-Agent": "Mozilla/5.0 (PodcastFetcher/1.0)"
+            "User-Agent": FEED_USER_AGENT
         }
-        response = requests.get(url, timeout=timeout, headers=headers)
+        response = await http_client.get(url, timeout=timeout, headers=headers)
         response.raise_for_status()
         return response.text
     except Exception as e:
@@ -258,60 +419,142 @@ async def handle_get():
         "message" : "Please send a POST req with Body"
     }
 
+PODCAST_HANDLERS = {
+    "youtube_playlist": handle_youtube_playlist,
+    "youtube_channel": handle_youtube_channel,
+    "spotify_show": handle_spotify_show,
+    "rss": handle_rss_feed,
+}
+
+
+async def resolve_podcast(url: str, page: int = 1, per_page: int = PODCAST_PAGE_SIZE, force: bool = False) -> Optional[PodcastSource]:
+    """
+    Fetches a page of a podcast through the feed cache.
+    Returns None when the URL isn't a supported podcast source.
+    """
+    kind, prefetched = await classify_podcast_url(url)
+    if kind is None:
+        return None
+
+    if kind == "rss":
+        # RSS is cached whole and revalidated with conditional requests
+        return await handle_rss_feed(url, page, per_page, force=force, prefetched=prefetched)
+    if kind == "spotify_show":
+        return await handle_spotify_show(url, page, per_page, force=force)
+
+    handler = PODCAST_HANDLERS[kind]
+    return await cached_source(f"{url}#page={page}&per_page={per_page}", lambda: handler(url, page, per_page), force)
+
+
 @router.post("/podcast", tags=["Podcasts"])
 async def handle_podcast(request: PodcastParamsBody):
     url = request.url.strip()
 
-    handlers = [
-        (is_youtube_playlist, handle_youtube_playlist),
-        (is_youtube_channel, handle_youtube_channel),
-        (is_spotify_show, handle_spotify_show),
-        (is_rss_feed, handle_rss_feed),
-    ]
-
-    for matcher, handler in handlers:
-        if matcher(url):
-            return await handler(url)
+    podcast = await resolve_podcast(url, request.page, request.per_page)
+    if podcast is not None:
+        return podcast
 
     raise HTTPException(status_code=400, detail="Unsupported podcast URL type")
 
 @router.get("/podcast/episodes",tags=["Podcasts"])
-async def fetch_episodes():
+def fetch_episodes(
+    podcast_id: Optional[str] = Query(None, description="Saved podcast, all saved podcasts if omitted"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session)
+):
     """
     # Fetch episodes of podcast
+    Newest first, from the episode index (kept up to date in the background,
+    or right away with `POST /podcast/{podcast_id}/refresh`).
+    """
+    statement = select(Episode).where(Episode.podcast_id.is_not(None))  # type: ignore
+    if podcast_id:
+        statement = select(Episode).where(Episode.podcast_id == podcast_id)
+
+    total = session.exec(select(func.count()).select_from(statement.subquery())).one()
+    episodes = session.exec(
+        statement.order_by(Episode.upload_date.desc()).offset(offset).limit(limit)  # type: ignore
+    ).all()
+    return {"episodes": episodes, "total": total, "limit": limit, "offset": offset}
+
+
+@router.post("/podcast/{podcast_id}/refresh", tags=["Podcasts"])
+async def refresh_podcast_episodes(podcast_id: str):
+    """
+    # Refresh the episode index of a saved podcast
+    Only episodes newer than the ones already indexed are fetched.
+    """
+    try:
+        new_episodes = await index_podcast(podcast_id)
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Podcast not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to refresh episodes: {str(e)}")
+    return {"status": "refreshed", "podcast_id": podcast_id, "new_episodes": new_episodes}
+
+
+class OfflineSettingsBody(BaseModel):
+    keep_latest: int = Field(..., ge=0, le=100, description="Newest episodes kept downloaded, 0 turns it off")
+
+
+@router.put("/podcast/{podcast_id}/offline", tags=["Podcasts"])
+def set_podcast_offline(podcast_id: str, body: OfflineSettingsBody, session: Session = Depends(get_session)):
     """
-    return {"episodes": "podcast episodes"}
+    # Keep the newest episodes offline
+    They are downloaded in the background (rate limited, within the disk quota)
+    and played from disk through MPD.
+    """
+    podcast = session.get(Podcast, podcast_id)
+    if podcast is None:
+        raise HTTPException(status_code=404, detail="Podcast not found")
+
+    podcast.keep_offline = body.keep_latest or None
+    session.add(podcast)
+    session.commit()
+    podcast_downloader.wake()
+    return {"status": "updated", "podcast_id": podcast_id, "keep_offline": body.keep_latest}
+
+
+@router.get("/podcast/offline", tags=["Podcasts"])
+def get_offline_episodes(session: Session = Depends(get_session)):
+    """
+    # Offline episodes
+    Downloaded episodes and the disk space they use.
+    """
+    episodes = session.exec(
+        select(Episode).where(Episode.local_path.is_not(None)).order_by(Episode.upload_date.desc())  # type: ignore
+    ).all()
+    return {
+        "episodes": episodes,
+        "disk_usage": podcast_downloader.disk_usage(),
+        "disk_quota": PODCAST_DISK_QUOTA,
+        "rate_limit": PODCAST_DOWNLOAD_RATE_LIMIT,
+    }
 
 
 @router.post("/podcast/save", tags=["Podcasts"])
-async def save_podcast(body: PodcastParamsBody, session: Session = Depends(get_session)):
+async def save_podcast(body: PodcastParamsBody, background_tasks: BackgroundTasks, session: Session = Depends(get_session)):
     url = body.url.strip()
 
-    # Match handlers
-    handlers = [
-        (is_youtube_playlist, handle_youtube_playlist),
-        (is_youtube_channel, handle_youtube_channel),
-        (is_spotify_show, handle_spotify_show),
-        (is_rss_feed, handle_rss_feed),
-    ]
+    podcast = await resolve_podcast(url)
+    if podcast is None:
+        raise HTTPException(status_code=400, detail="Unsupported podcast URL type")
 
-    for matcher, handler in handlers:
-        if matcher(url):
-            podcast: PodcastSource = await handler(url)
+    db_podcast = Podcast(
+        id=str(uuid.uuid4()),
+        source=podcast.type,
+        title=podcast.title,
+        url=str(podcast.url),
+        channel=podcast.channel or "Unknown"
+    )
 
-            db_podcast = Podcast(
-                id=str(uuid.uuid4()),
-                source=podcast.type,
-                title=podcast.title,
-                url=podcast.url,
-                channel=podcast.channel or podcast.uploader or "Unknown"
-            )
+    session.add(db_podcast)
+    session.commit()
 
-            session.add(db_podcast)
-            session.commit()
-            return {"status": "saved", "podcast_id": db_podcast.id}
-
-    raise HTTPException(status_code=400, detail="Unsupported podcast URL type")
+    # Build the episode index in the background
+    background_tasks.add_task(index_podcast, db_podcast.id)
+    return {"status": "saved", "podcast_id": db_podcast.id}
 
 @router.post("/episode/save", tags=["Podcasts"])
 async def save_episode(body: PodcastParamsBody, session: Session = Depends(get_session)):
@@ -338,7 +581,6 @@ async def save_episode(body: PodcastParamsBody, session: Session = Depends(get_s
     return {"status": "saved", "episode_id": db_episode.id}
 
 # helper functions
-import yt_dlp
 from typing import Optional
 from pydantic import BaseModel
 
@@ -350,19 +592,219 @@ class EpisodeMetadata(BaseModel):
     upload_date: Optional[str]
 
 async def get_episode_metadata(url: str) -> Optional[EpisodeMetadata]:
-    ydl_opts = {"quiet": True, "skip_download": True, "extract_flat": False, "force_generic_extractor": False, "dump_single_json": True}
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            return EpisodeMetadata(
-                url=info.get("webpage_url"),
-                title=info.get("title"),
-                thumbnail=info.get("thumbnail"),
-                uploader=info.get("uploader"),
-                upload_date=info.get("upload_date")
-            )
-    except Exception as e:
-        print(f"Failed to extract episode metadata: {e}")
+    # Shared metadata cache, the same URL is often already known from the queue or search
+    info = await asyncio.to_thread(get_media_data, url)
+    if not info:
+        print(f"Failed to extract episode metadata: {url}")
         return None
 
+    return EpisodeMetadata(
+        url=info.get("webpage_url") or url,
+        title=info.get("title"),
+        thumbnail=info.get("thumbnail"),
+        uploader=info.get("uploader"),
+        upload_date=info.get("upload_date")
+    )
+
 # FIXME, Deduplication logic
+
+
+# --- Episode index ---
+def _known_guids(podcast_id: str, guids: List[str]) -> set:
+    if not guids:
+        return set()
+    with Session(engine) as session:
+        rows = session.exec(
+            select(Episode.guid).where(Episode.podcast_id == podcast_id, Episode.guid.in_(guids))  # type: ignore
+        ).all()
+    return set(rows)
+
+
+def _item_guid(item: PodcastItem) -> str:
+    return item.guid or str(item.url)
+
+
+def _store_new_episodes(podcast_id: str, items: List[PodcastItem]) -> int:
+    """Inserts the new episodes (newest first) and moves the podcast's high-water mark."""
+    with Session(engine) as session:
+        podcast = session.get(Podcast, podcast_id)
+        if podcast is None:
+            return 0
+
+        for item in items:
+            session.add(Episode(
+                id=str(uuid.uuid4()),
+                podcast_id=podcast_id,
+                guid=_item_guid(item),
+                title=item.title,
+                url=str(item.url),
+                thumbnail_url=str(item.thumbnail) if item.thumbnail else "",
+                uploader=item.uploader or podcast.channel or "Unknown",
+                upload_date=item.upload_date or ""
+            ))
+
+        if items:
+            podcast.latest_guid = _item_guid(items[0])
+            dates = [item.upload_date for item in items if item.upload_date]
+            if podcast.latest_upload_date:
+                dates.append(podcast.latest_upload_date)
+            podcast.latest_upload_date = max(dates) if dates else None
+        podcast.indexed_at = time.time()
+        session.add(podcast)
+        session.commit()
+    return len(items)
+
+
+async def _new_youtube_items(podcast: Podcast) -> List[PodcastItem]:
+    """
+    Lists the playlist/channel flat, page by page. A channel lists newest first, so
+    listing stops at the first page with a known video; a playlist is diffed whole.
+    Only the new videos are looked up in full (for their upload date).
+    """
+    newest_first = podcast.source == "YouTube Channel"
+    new_entries = []
+    start = 1
+    while len(new_entries) < EPISODE_INDEX_MAX_NEW:
+        data = await ytdlp_pool.extract_info_async(
+            podcast.url,
+            {"extract_flat": "in_playlist", "playliststart": start, "playlistend": start + EPISODE_INDEX_PAGE_SIZE - 1},
+            timeout=30,
+        )
+        entries = [entry for entry in data.get("entries") or [] if entry and entry.get("id")]
+        known = await asyncio.to_thread(_known_guids, podcast.id, [entry["id"] for entry in entries])
+        new_entries.extend(entry for entry in entries if entry["id"] not in known)
+
+        if len(entries) < EPISODE_INDEX_PAGE_SIZE or (newest_first and known):
+            break
+        start += EPISODE_INDEX_PAGE_SIZE
+    new_entries = new_entries[:EPISODE_INDEX_MAX_NEW]
+
+    semaphore = asyncio.Semaphore(PODCAST_ENRICH_CONCURRENCY)
+
+    async def to_item(entry: dict) -> PodcastItem:
+        video_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        async with semaphore:
+            info = await asyncio.to_thread(get_media_data, video_url) or {}
+        thumbnails = entry.get("thumbnails") or []
+        return PodcastItem(
+            title=info.get("title") or entry.get("title") or video_url,
+            url=video_url,
+            thumbnail=info.get("thumbnail") or (thumbnails[-1].get("url") if thumbnails else None),
+            uploader=info.get("uploader") or entry.get("uploader") or podcast.channel,
+            upload_date=_iso_upload_date(info.get("upload_date") or entry.get("upload_date")),
+            guid=entry["id"]
+        )
+
+    return list(await asyncio.gather(*(to_item(entry) for entry in new_entries)))
+
+
+async def _new_spotify_items(podcast: Podcast) -> List[PodcastItem]:
+    """Spotify lists episodes newest first: pages until one contains a known episode."""
+    show_id = extract_show_id(podcast.url)
+    sp = await asyncio.to_thread(get_spotify_client)
+    new_items: List[PodcastItem] = []
+    offset = 0
+    while len(new_items) < EPISODE_INDEX_MAX_NEW:
+        data = await asyncio.to_thread(call_with_retry, sp.show_episodes, show_id, limit=EPISODE_INDEX_PAGE_SIZE, offset=offset)
+        episodes = [ep for ep in data["items"] if ep]
+        known = await asyncio.to_thread(_known_guids, podcast.id, [ep["id"] for ep in episodes])
+        for ep in episodes:
+            if ep["id"] in known:
+                continue
+            new_items.append(PodcastItem(
+                title=ep["name"],
+                url=ep["external_urls"]["spotify"],
+                thumbnail=ep["images"][0]["url"] if ep["images"] else None,
+                uploader=podcast.channel,
+                upload_date=f"{ep['release_date']}T00:00:00Z" if ep.get("release_date") else None,
+                guid=ep["id"]
+            ))
+
+        if known or data.get("next") is None:
+            break
+        offset += EPISODE_INDEX_PAGE_SIZE
+    return new_items[:EPISODE_INDEX_MAX_NEW]
+
+
+async def _new_rss_items(podcast: Podcast) -> List[PodcastItem]:
+    """Diffs the feed's guids against the index; an unchanged feed is a 304 from the feed cache."""
+    source = await fetch_rss_feed(podcast.url)
+    items = source.items
+    if not items or _item_guid(items[0]) == podcast.latest_guid:
+        return []
+    known = await asyncio.to_thread(_known_guids, podcast.id, [_item_guid(item) for item in items])
+    return [item for item in items if _item_guid(item) not in known][:EPISODE_INDEX_MAX_NEW]
+
+
+EPISODE_INDEXERS = {
+    "YouTube Playlist": _new_youtube_items,
+    "YouTube Channel": _new_youtube_items,
+    "Spotify Show": _new_spotify_items,
+    "RSS Feed": _new_rss_items,
+}
+
+
+async def index_podcast(podcast_id: str) -> int:
+    """
+    Adds the episodes published since the last refresh to the index.
+    Returns how many were added, raises LookupError for an unknown podcast.
+    """
+    with Session(engine) as session:
+        podcast = session.get(Podcast, podcast_id)
+    if podcast is None:
+        raise LookupError(podcast_id)
+
+    indexer = EPISODE_INDEXERS.get(podcast.source)
+    if indexer is None:
+        print(f"⚠️ No episode indexer for {podcast.source}")
+        return 0
+
+    new_items = await indexer(podcast)
+    added = await asyncio.to_thread(_store_new_episodes, podcast_id, new_items)
+    if added:
+        print(f"✅ Indexed {added} new episodes of {podcast.title}")
+        if podcast.keep_offline:
+            podcast_downloader.wake()
+    return added
+
+
+# --- Background refresh ---
+async def refresh_saved_podcasts():
+    """
+    Refreshes the first page of every saved podcast whose cached feed went stale,
+    and adds its new episodes to the index.
+    """
+    with Session(engine) as session:
+        podcasts = session.exec(select(Podcast)).all()
+
+    semaphore = asyncio.Semaphore(FEED_REFRESH_CONCURRENCY)
+
+    async def refresh(podcast: Podcast):
+        url = podcast.url
+        paged = is_youtube_playlist(url) or is_youtube_channel(url)
+        key = f"{url}#page=1&per_page={PODCAST_PAGE_SIZE}" if paged else url
+        if feed_cache.is_fresh(await asyncio.to_thread(feed_cache.get_entry, key)) and podcast.indexed_at:
+            return
+        async with semaphore:
+            try:
+                await resolve_podcast(url, force=True)
+                await index_podcast(podcast.id)
+            except Exception as e:
+                print(f"⚠️ Failed to refresh podcast {url}: {e}")
+
+    await asyncio.gather(*(refresh(podcast) for podcast in podcasts))
+
+
+async def run_feed_refresher():
+    """Background loop, started in the app lifespan."""
+    print("✅ Podcast feed refresher started")
+    try:
+        while True:
+            try:
+                await refresh_saved_podcasts()
+            except Exception as e:
+                print(f"⚠️ Podcast feed refresh failed: {e}")
+            await asyncio.sleep(FEED_REFRESH_INTERVAL)
+    except asyncio.CancelledError:
+        print("🛑 Podcast feed refresher stopped")
+        raise
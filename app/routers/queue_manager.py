@@ -1,8 +1,8 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel, HttpUrl
 from typing import List, Optional
-from app.utils.metadata_fetchers import get_youtube_metadata, get_mpd_by_metadata, get_spotify_info
-from app.models import QueueItem
+from app.utils.queue_resolver import enqueue_placeholders, resolve_batch, create_batch, get_batch, make_placeholder, schedule_resolution, cancel_resolutions
+from app.models import QueueItem, QueueBatchStatus
 import app.queue as queue
 
 from fastapi import Body
@@ -17,96 +17,89 @@ router = APIRouter()
 
 
 
-def is_spotify_url(url: str) -> bool:
-    return "open.spotify.com" in url and ("track/" in url or "episode/" in url)
-
-def is_youtube_url(url: str) -> bool:
-    return "youtube.com" in url or "youtu.be" in url
-
-
-# --- Placeholder Handlers ---
-
-def add_raw_url(url: str):
-    return {"source": "direct", "url": url}
+@router.get("/queue", tags=["Queue"])
+def get_queue():
+    """
+    # Get the Queue
+    Entries with `resolved: false` are placeholders whose metadata is still being fetched.
+    """
+    return {
+        "queue": queue.queue_to_json(queue.queue)
+    }
 
 
 @router.post("/queue/add", tags=["Queue"])
-def add_to_queue(items: List[QueueItem], background_tasks: BackgroundTasks):
+async def add_to_queue(items: List[QueueItem], background_tasks: BackgroundTasks):
     """
     # Add to queue
-    Accepts List of items and schedules metadata fetching and queueing in the background.
-    Immediately returns a success response.
+    Accepts List of items, they are added to the queue right away as placeholders (in the submitted order)
+    and their metadata is fetched concurrently in the background.
+    Returns a `batch_id`, use `/queue/batch/{batch_id}` to follow the progress, or listen on `/ws/queue` for updates.
     """
     if not items:
         raise HTTPException(status_code=400, detail="Empty list received")
 
+    batch = create_batch(len(items))
+    placeholders = enqueue_placeholders(items, batch)
+
     # Schedule background task
-    background_tasks.add_task(process_and_add_to_queue, items)
+    background_tasks.add_task(resolve_batch, placeholders, batch)
 
     return {
-        "message": "Items scheduled to be added to queue"
+        "message": "Items added to queue, metadata is being fetched",
+        "batch_id": batch.batch_id,
+        "items": placeholders
     }
 
 
+@router.get("/queue/batch/{batch_id}", response_model=QueueBatchStatus, tags=["Queue"])
+def get_queue_batch(batch_id: str):
+    """
+    # Queue Batch Status
+    Reports the progress of a `/queue/add` batch.
+    """
+    batch = get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+
 @router.post("/queue/clear", tags=["Queue"])
-def clear_queue():
+async def clear_queue():
     """
     # Clear the Queue
+    Placeholders still being resolved are dropped as well.
     """
+    cancel_resolutions(queue.queue)
     queue.queue.clear()
+    queue.publish_event("cleared")
     
     return {
         "message": "queue cleared",
         "queue": queue.queue
     }
 
-# Define background processor function
-def process_and_add_to_queue(items: List[QueueItem]):
-    results = []
-
-    for item in items:
-        if not item.url and not item.song_name:
-            continue  # skip invalid item
-
-        if item.song_name:
-            try:
-                print("Calling get_mpd_by_metadata with:", item.song_name)
-                mpd_results = get_mpd_by_metadata(item.song_name)
-                results.extend(mpd_results)
-            except Exception as e:
-                print(f"[MPD Metadata Error] {e}")
-            continue
-
-        if item.url:
-            url = item.url.strip()
-            result = None
-
-            for matcher, handler in [
-                (is_spotify_url, get_spotify_info),
-                (is_youtube_url, get_youtube_metadata),
-            ]:
-                if matcher(url):
-                    try:
-                        print(f"running handler for url: {url}")
-                        result = handler(url)
-                    except Exception as e:
-                        print(f"[URL Handler Error] {e}")
-                    break
-
-            if result is None:
-                try:
-                    result = add_raw_url(url)
-                except Exception as e:
-                    print(f"[Raw URL Error] {e}")
-
-            if result:
-                results.append(result)
-
-    # Add fully processed items to queue
-    if results:
-        queue.add_multiple_extend(queue.queue, results)
-        print(f"Added to queue in background: {results}")
 
+@router.post("/queue/remove", tags=["Queue"])
+async def remove_from_queue(item_id: str = Body(..., embed=True)):
+    """
+    # Remove from the Queue
+    Removes the entry with the given `id`, a placeholder stops being resolved.
+    """
+    index = queue.find_index(queue.queue, item_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail="Item not in the queue")
+
+    entry = queue.queue[index]
+    del queue.queue[index]
+    cancel_resolutions([entry])
+    queue.publish_event("item_removed", id=item_id)
+
+    return {
+        "message": "Item removed from the queue",
+        "removed_item": entry,
+        "queue_length": len(queue.queue),
+    }
 
 class AddBeforeRequest(BaseModel):
     url: HttpUrl = Field(..., description="URL of the media to add")
@@ -115,44 +108,51 @@ class AddBeforeRequest(BaseModel):
 
 
 @router.post("/queue/add_before", tags=["Queue"])
-def add_before(item: AddBeforeRequest):
+async def add_before(item: AddBeforeRequest):
     """
     Insert item before a given index in the queue.
+    The item is inserted as a placeholder, its metadata is fetched in the background.
     """
-    url = item.url.strip()
+    url = str(item.url).strip()
     index = item.index
 
     if index < 0 or index > len(queue.queue):
         raise HTTPException(status_code=400, detail="Invalid index")
 
-    result = None
-
-    # Metadata handling
-    for matcher, handler in [
-        (is_spotify_url, get_spotify_info),
-        (is_youtube_url, get_youtube_metadata),
-    ]:
-        if matcher(url):
-            try:
-                result = handler(url)
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Handler error: {e}")
-            break
-
-    if result is None:
-        try:
-            result = add_raw_url(url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Raw URL handler error: {e}")
+    result = make_placeholder(QueueItem(url=url))
 
     # Insert the result into the queue at the given index
-    qlist = list(queue.queue)
-    qlist.insert(index, result)
-    queue.queue.clear()
-    queue.queue.extend(qlist)
+    queue.queue.insert(index, result)
+    queue.publish_event("items_added", index=index, items=[result])
+
+    # Metadata handling
+    schedule_resolution(result)
 
     return {
         "message": f"Item inserted before index {index}",
         "inserted_item": result,
         "queue_length": len(queue.queue),
-    }
\ No newline at end of file
+    }
+
+
+@router.websocket("/ws/queue")
+async def queue_updates(websocket: WebSocket):
+    """
+    Pushes queue changes to the client as JSON messages:
+    `items_added`, `item_updated` (placeholder resolved), `item_removed` and `cleared`.
+    """
+    await websocket.accept()
+    listener = queue.subscribe()
+    print("🔌 Queue listener connected")
+
+    try:
+        await websocket.send_json({"type": "snapshot", "queue": [
+            entry.model_dump() if hasattr(entry, "model_dump") else entry for entry in queue.queue
+        ]})
+        while True:
+            event = await listener.get()
+            await websocket.send_json(event)
+    except WebSocketDisconnect:
+        print("❌ Queue listener disconnected")
+    finally:
+        queue.unsubscribe(listener)
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 import json
-import subprocess
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, AsyncIterator
+from app.utils.ytdlp_helpers import get_media_data
+import app.utils.ytdlp_pool as ytdlp_pool
+import app.utils.search_cache as search_cache
+import app.utils.typeahead as typeahead
+import app.utils.unified_search as unified_search
+import app.utils.thumbnail_mirror as thumbnail_mirror
 
 router = APIRouter()
 
@@ -63,25 +69,84 @@ def _get_thumbnail_url(video_data: dict) -> Optional[str]:
     return best_thumbnail_url
 
 
+def _process_search_entry(v: dict) -> Dict[str, Any]:
+    """
+    Converts a flat yt-dlp search entry into a search result.
+    `thumbnail` is the local mirror once it is there, `thumbnail_remote` the YouTube URL.
+    """
+    thumbnail = _get_thumbnail_url(v)
+    return {
+        "title": v.get("title"),
+        "id": v.get("id"),
+        "url": v.get("webpage_url") or f"https://www.youtube.com/watch?v={v.get('id')}",
+        "channel": v.get("uploader"),
+        "channel_url": v.get("uploader_url"),
+        "upload_date": v.get("upload_date"),
+        "thumbnail": thumbnail_mirror.prefer_local(thumbnail),
+        "thumbnail_remote": thumbnail,
+        "duration": v.get("duration"),
+        "release_timestamp": v.get("release_timestamp") or v.get("timestamp"),
+        "is_live": v.get("is_live", False),
+        "item_type": _get_item_type(v)
+    }
+
+
+def _ndjson_search(search: str, start: int, per_page: int) -> Iterator[str]:
+    """Yields one JSON line per search result as soon as yt-dlp returns it."""
+    try:
+        for v in search_cache.iter_results(search, start, per_page):
+            if v.get("_type") == "url" and v.get("id"):
+                yield json.dumps(_process_search_entry(v)) + "\n"
+
+        # Everything is cached by now, this doesn't extract anything
+        _, total_found, has_more = search_cache.get_results(search, start, per_page)
+        yield json.dumps({
+            "done": True,
+            "query": search,
+            "total_found": total_found,
+            "next_cursor": search_cache.encode_cursor(search, start + per_page) if has_more else None
+        }) + "\n"
+    except ytdlp_pool.YtdlpError as e:
+        yield json.dumps({"error": "yt-dlp failed", "detail": str(e)}) + "\n"
+    except Exception as e:
+        yield json.dumps({"error": "Unexpected error", "detail": str(e)}) + "\n"
+
+
 @router.get("/youtube", summary="Get YouTube video, playlist, or search results", tags=["Search"])
 def yt_feed(
-    search: str = Query(..., description="Search term or YouTube video/playlist URL"),
+    search: Optional[str] = Query(None, description="Search term or YouTube video/playlist URL"),
     page: int = Query(1, ge=1, description="Page number for pagination (for search only)"),
-    per_page: int = Query(25, ge=1, le=50, description="Results per page (max 50)")
+    per_page: int = Query(25, ge=1, le=50, description="Results per page (max 50)"),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of a previous search response, fetches the next page"),
+    stream: bool = Query(False, description="Stream search results as NDJSON, one line per result as soon as it is extracted")
 ) -> Dict[str, Any]:
     """
     Fetches information from YouTube based on a search term or a direct URL.
     Returns detailed metadata for videos, a list of videos for playlists,
     or paginated search results.
+    Search results come with a `next_cursor`, pass it back as `cursor` to get the next page.
+
+    With `stream=true` a search returns `application/x-ndjson`: one result per line,
+    followed by a last line `{"done": true, "next_cursor": ..., "total_found": ...}`.
     """
+    offset: Optional[int] = None
+    if cursor:
+        try:
+            search, offset = search_cache.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not search:
+        raise HTTPException(status_code=400, detail="Either search or cursor is required")
+
     content_type = is_youtube_url(search)
     
     try:
         if content_type == "video":
-            # Get full metadata for a YouTube video
-            command = ["yt-dlp", "--dump-json", search]
-            output = subprocess.check_output(command, text=True, stderr=subprocess.PIPE)
-            data = json.loads(output)
+            # Get full metadata for a YouTube video (shared metadata cache)
+            data = get_media_data(search)
+            if data is None:
+                return {"error": "yt-dlp failed", "detail": f"Could not fetch metadata for {search}"}
             
             return {
                 "type": "video",
@@ -99,9 +164,8 @@ def yt_feed(
         elif content_type == "playlist":
             # Get list of videos in playlist (limited metadata using --flat-playlist)
             # --flat-playlist provides less detail but is faster for large playlists
-            command = ["yt-dlp", "--flat-playlist", "--dump-json", search]
-            output = subprocess.check_output(command, text=True, stderr=subprocess.PIPE)
-            videos = [json.loads(line) for line in output.strip().split("\n") if line.strip()]
+            info = ytdlp_pool.extract_info(search, {"extract_flat": "in_playlist"})
+            videos = [v for v in info.get("entries") or [] if v]
 
             # Optional: Fetch full details for each video in playlist if needed
             # This would make the response much slower for large playlists
@@ -118,7 +182,8 @@ def yt_feed(
                         "channel": v.get("uploader"),
                         "channel_url": v.get("uploader_url"),
                         "upload_date": v.get("upload_date"),
-                        "thumbnail": _get_thumbnail_url(v), # Use the helper function
+                        "thumbnail": thumbnail_mirror.prefer_local(_get_thumbnail_url(v)),
+                        "thumbnail_remote": _get_thumbnail_url(v),
                         "duration": v.get("duration"),
                         "release_timestamp": v.get("release_timestamp") or v.get("timestamp"),
                         "is_live": v.get("is_live", False)
@@ -131,57 +196,97 @@ def yt_feed(
             }
         else:
             # Perform a fuzzy search
-            # ytsearch<num>: means 'search and return num results'.
-            # We fetch more than per_page to allow for pagination on our end.
-            # Using --flat-playlist for search results for speed.
-            command = [
-                "yt-dlp",
-                f"ytsearch{page * per_page + 10}:{search}", # Fetch a few more to be safe for pagination
-                "--flat-playlist",
-                "--dump-json"
-            ]
-            result = subprocess.check_output(command, text=True, stderr=subprocess.PIPE)
-            videos = [json.loads(line) for line in result.strip().split("\n") if line.strip()]
-            
-            start = (page - 1) * per_page
-            end = start + per_page
-            paginated_videos = videos[start:end]
+            # Results are cached per query and extended incrementally,
+            # so a later page only extracts the results that weren't fetched yet.
+            start = offset if offset is not None else (page - 1) * per_page
+            if stream:
+                return StreamingResponse(_ndjson_search(search, start, per_page), media_type="application/x-ndjson")
+
+            paginated_videos, total_found, has_more = search_cache.get_results(search, start, per_page)
 
             processed_paginated_videos = []
             for v in paginated_videos:
                  # Filter out non-video/playlist entries if necessary, or just process them
                 if v.get("_type") == "url" and v.get("id"): # Ensure it's a video/playlist item
-                    processed_paginated_videos.append({
-                        "title": v.get("title"),
-                        "id": v.get("id"),
-                        "url": v.get("webpage_url") or f"https://www.youtube.com/watch?v={v.get('id')}",
-                        "channel": v.get("uploader"),
-                        "channel_url": v.get("uploader_url"),
-                        "upload_date": v.get("upload_date"),
-                        "thumbnail": _get_thumbnail_url(v), # Use the helper function
-                        "duration": v.get("duration"),
-                        "release_timestamp": v.get("release_timestamp") or v.get("timestamp"),
-                        "is_live": v.get("is_live", False),
-                        "item_type": _get_item_type(v)
-                    })
+                    processed_paginated_videos.append(_process_search_entry(v))
 
             return {
                 "type": "search",
                 "query": search,
-                "page": page,
+                "page": start // per_page + 1,
                 "per_page": per_page,
                 "results": processed_paginated_videos,
-                "total_found": len(videos) # Total found by yt-dlp before pagination
+                "total_found": total_found, # Results fetched from yt-dlp so far
+                "next_cursor": search_cache.encode_cursor(search, start + per_page) if has_more else None
             }
-    except subprocess.CalledProcessError as e:
-        # Capture stdout and stderr from yt-dlp for better debugging
-        error_output = e.stderr if e.stderr else "No stderr output"
-        return {"error": "yt-dlp failed", "detail": f"Command: {' '.join(e.cmd)}\nExit Code: {e.returncode}\nStderr: {error_output}"}
-    except json.JSONDecodeError as e:
-        return {"error": "Failed to parse yt-dlp output", "detail": str(e)}
+    except ytdlp_pool.YtdlpError as e:
+        return {"error": "yt-dlp failed", "detail": str(e)}
     except Exception as e:
         return {"error": "Unexpected error", "detail": str(e)}
 
 
+@router.get("/typeahead", summary="Search-as-you-type YouTube search", tags=["Search"])
+async def yt_typeahead(
+    request: Request,
+    q: str = Query(..., min_length=1, description="What the user typed so far"),
+    per_page: int = Query(10, ge=1, le=50, description="Results to return"),
+    client_id: Optional[str] = Query(None, description="Identifies the search box, defaults to the client address")
+):
+    """
+    Call this on every keystroke. A query only starts searching after a short debounce,
+    identical queries share one extraction, and the extraction for a previous query
+    of the same client is cancelled.
+    Superseded requests (a newer query arrived, or the client disconnected) get `204 No Content`.
+    """
+    client = client_id or (request.client.host if request.client else "anonymous")
 
+    try:
+        entries, total_found, has_more = await typeahead.search(client, q, 0, per_page, request.is_disconnected)
+    except typeahead.Superseded:
+        return Response(status_code=204)
+    except ytdlp_pool.YtdlpError as e:
+        return {"error": "yt-dlp failed", "detail": str(e)}
+
+    return {
+        "type": "search",
+        "query": q,
+        "results": [_process_search_entry(v) for v in entries if v.get("_type") == "url" and v.get("id")],
+        "total_found": total_found,
+        "next_cursor": search_cache.encode_cursor(q, per_page) if has_more else None
+    }
+
+
+async def _ndjson_unified(q: str, limit: int, sources: Optional[list]) -> AsyncIterator[str]:
+    timed_out = []
+    async for part in unified_search.search_sources(q, limit, sources):
+        if part["status"] == "timeout":
+            timed_out.append(part["source"])
+        yield json.dumps(part) + "\n"
+    yield json.dumps({"done": True, "query": q, "timed_out": timed_out}) + "\n"
+
+
+@router.get("/all", summary="Search every source at once", tags=["Search"])
+async def search_everywhere(
+    q: str = Query(..., min_length=1, description="Song title or artist"),
+    limit: int = Query(10, ge=1, le=50, description="Results per source"),
+    sources: Optional[str] = Query(None, description="Comma separated subset of: library, favourites, spotify, history, youtube"),
+    stream: bool = Query(False, description="Stream NDJSON, one line per source as soon as it answers")
+):
+    """
+    Searches the local library, favourites, Spotify liked songs, history and YouTube in parallel.
+    Every source has its own deadline, a source that misses it is reported with `status: "timeout"`.
+
+    With `stream=true` the response is `application/x-ndjson`: one `{"source", "status", "results"}`
+    line per source in the order they answer (local sources are usually first),
+    followed by `{"done": true, "timed_out": [...]}`.
+    """
+    selected = None
+    if sources:
+        selected = [name.strip().lower() for name in sources.split(",") if name.strip()]
+        unknown = [name for name in selected if name not in unified_search.SOURCES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sources: {', '.join(unknown)}")
 
+    if stream:
+        return StreamingResponse(_ndjson_unified(q, limit, selected), media_type="application/x-ndjson")
+    return await unified_search.search_all(q, limit, selected)
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, HTTPException, Query, Request, Body
-from app.models import SpotifyLikedSongItem
-from typing import List, Union, Dict
-from ..utils.spotify_fetchers import fetch_liked_songs_from_spotify, get_all_liked_songs_from_db
+from fastapi import APIRouter, HTTPException, Query, Request, Response, Body
+from fastapi.responses import StreamingResponse
+from app.models import SpotifyLikedSongItem, SpotifyLikedSong
+from typing import List, Union, Dict, Optional
+from ..utils.spotify_fetchers import get_all_liked_songs_from_db
+from ..utils import spotify_sync
 from fastapi import Depends
 from ..utils.spotify_auth_utils import is_spotify_setup
+from ..utils import text_search
+from ..utils.local_art import art_url_for_track
+from ..utils import thumbnail_mirror
+from ..utils import placeholders
 
+import asyncio
+import json
 import subprocess
 from pathlib import Path
 from mutagen import File as MutagenFile  # type: ignore[reportPrivateImportUsage]
@@ -17,31 +25,70 @@ music_dir = MUSIC_DIR
 
 router = APIRouter()
 
-@router.get("/songs/spotify", response_model=List[SpotifyLikedSongItem], tags=["Resource Fetcher"])
-def get_spotify_songs(request: Request):
+
+def _with_thumbnails(songs: list) -> List[dict]:
+    """
+    Blocking (reads the blurhash files): points `album_art` to the mirrored thumbnail,
+    keeping the Spotify URL in `album_art_remote`.
+    """
+    results = []
+    for song in songs:
+        data = dict(song) if isinstance(song, dict) else song.model_dump()
+        data["album_art_remote"] = data.get("album_art")
+        data["album_art"] = thumbnail_mirror.prefer_local(data["album_art_remote"])
+        data["album_art_blurhash"] = placeholders.for_url(data["album_art"])
+        results.append(data)
+    return results
+
+
+@router.get("/songs/spotify", response_model=List[SpotifyLikedSong], tags=["Resource Fetcher"])
+async def get_spotify_songs(
+    request: Request,
+    response: Response,
+    q: Optional[str] = Query(None, description="Search song names and artists in the local DB, best matches first"),
+    limit: int = Query(50, ge=1, le=500, description="Results per page (with `q`)"),
+    offset: int = Query(0, ge=0, description="Results to skip (with `q`)"),
+    full: bool = Query(False, description="With `sync`: walk the whole library and remove songs that are no longer liked")
+):
     """
-    Fetch liked songs from spotify, sync them to DB and the return the songs.
-    if `sync` parameter is passed, then it will freshly fetch the songs from Spotify.
-    else, it will return the songs from the local database.
+    Returns the liked songs from the local database.
+    if `sync` parameter is passed, a sync with Spotify is started in the background
+    (see `POST /songs/spotify/sync`) and the songs stored so far are returned right away;
+    the `X-Sync-Status` header tells whether a sync is running.
+    A sync only fetches the songs liked since the last sync; once a day (or with `full=true`)
+    it walks the whole library and removes the songs that were unliked.
+    With `q=` only matching songs from the local database are returned, ranked and
+    paginated with `limit`/`offset`; the number of matches is in the `X-Total-Count` header.
+    `album_art` is a small local copy once it is mirrored, `album_art_remote` the Spotify URL,
+    and `album_art_blurhash` the placeholder of the local copy.
     """
     
     if not is_spotify_setup():
         raise HTTPException(status_code=400, detail="Spotify auth is not properly set up.")
+
+    if q:
+        try:
+            songs, total = await asyncio.to_thread(text_search.search, SpotifyLikedSongItem, q, limit, offset)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed searching the DB: {e}")
+        response.headers["X-Total-Count"] = str(total)
+        return await asyncio.to_thread(_with_thumbnails, songs)
     
     sync_param = request.query_params.get("sync")
     
     # If sync param is present and NOT in the list of falsey values
     if sync_param is not None and sync_param.lower() not in ["false", "0", "no"]:
         try:
-            songs = fetch_liked_songs_from_spotify()
-            # save_songs_to_db(songs)
-            return songs    
+            await spotify_sync.start(full=True if full else None)
+        except spotify_sync.SyncAlreadyRunning:
+            pass
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to fetch from Spotify: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to start the Spotify sync: {e}")
+        response.headers["X-Sync-Status"] = "running" if spotify_sync.is_running() else "idle"
     
     # If sync is absent or explicitly false
     try:
-        return get_all_liked_songs_from_db()
+        return await asyncio.to_thread(lambda: _with_thumbnails(get_all_liked_songs_from_db()))
     
     except ValueError as v:
         HTTPException(status_code=500, detail=f"Failed fetching from DB: {v}")
@@ -49,10 +96,54 @@ def get_spotify_songs(request: Request):
     except Exception as e:
         HTTPException(status_code=500, detail=f"Something went wrong: {e}")
         
+@router.post("/songs/spotify/sync", status_code=202, tags=["Resource Fetcher"])
+async def start_spotify_sync(
+    full: Optional[bool] = Query(None, description="Walk the whole library and remove unliked songs. Default: when the last full sync is older than a day")
+):
+    """
+    Starts syncing the liked songs in the background and returns the sync state.
+    Progress is checkpointed with every page, a sync interrupted by a restart resumes
+    where it stopped. Only one sync runs at a time, `409` while one is running.
+    """
+    if not is_spotify_setup():
+        raise HTTPException(status_code=400, detail="Spotify auth is not properly set up.")
+    try:
+        return await spotify_sync.start(full)
+    except spotify_sync.SyncAlreadyRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/songs/spotify/sync", tags=["Resource Fetcher"])
+async def spotify_sync_status():
+    """
+    State of the current (or last) liked songs sync: `status` (running, done, failed), `mode`
+    (new, full), songs `added`/`removed`, the checkpoint (`offset`, `checkpoint_added_at`),
+    and `progress` (0-1, full syncs only).
+    """
+    return await asyncio.to_thread(spotify_sync.load_state)
+
+
+async def _ndjson_sync_progress():
+    async for state in spotify_sync.watch():
+        yield json.dumps(state) + "\n"
+
+
+@router.get("/songs/spotify/sync/progress", tags=["Resource Fetcher"])
+async def spotify_sync_progress():
+    """
+    Streams the sync state as NDJSON: one line now and one per stored page,
+    the stream ends when the sync does.
+    """
+    return StreamingResponse(_ndjson_sync_progress(), media_type="application/x-ndjson")
+
+
 @router.get("/songs")
 def get_local_songs():
     """
     # Get All local songs via `mpc`
+    `cover_art_url` is the album art embedded in the files (or a cover.jpg next to them),
+    extracted once per album and served from the static cover art mount,
+    `cover_art_blurhash` is its placeholder.
     """
     try:
         output = subprocess.check_output([
@@ -102,6 +193,9 @@ def get_local_songs():
             # fallback to MPD's time
             duration = int(time_str) if time_str.isdigit() else None
 
+        # Looked up once per album, later tracks and scans are served from the art cache
+        cover_art_url = art_url_for_track(file_path, album or "")
+
         songs.append({
             "file": file_rel,
             "title": title,
@@ -110,7 +204,9 @@ def get_local_songs():
             "track": track,
             "duration": duration,
             "size_bytes": size_bytes,
-            "size_mb": round(size_bytes / (1024 * 1024), 2) if size_bytes else None
+            "size_mb": round(size_bytes / (1024 * 1024), 2) if size_bytes else None,
+            "cover_art_url": cover_art_url,
+            "cover_art_blurhash": placeholders.for_url(cover_art_url)
         })
 
     return {"songs": songs}
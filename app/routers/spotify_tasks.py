@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Request
-from ..utils.spotify_auth_utils import load_config
+from ..utils.spotify_auth_utils import load_config, reset_spotify_auth
 from ..constants import AUTH_PATH, SPOTIFY_SCOPES, CONFIG_PATH
 from fastapi.responses import HTMLResponse, RedirectResponse
 from ..utils.resource_fetchers import get_lan_ip, load_config, save_auth
@@ -70,6 +70,7 @@ def spotify_callback(request: Request):
             return HTMLResponse("<h3>Failed to get access token from Spotify.</h3>", status_code=400)
 
         save_auth(token_info,AUTH_PATH)
+        reset_spotify_auth()
 
         access_token = token_info.get("access_token")
         refresh_token = token_info.get("refresh_token")
@@ -0,0 +1,224 @@
+"""
+Content addressed album art cache.
+
+Art is fetched once per source URL and stored by the sha256 of its bytes under
+`ART_CACHE_DIR/<ab>/<sha256>/`, so the same image used by many tracks is stored once.
+Resized JPEG variants (`ART_SIZES`) are made with ffmpeg on first use, off the
+event loop. The sha256 and the served file (original or size) make a strong ETag.
+The track id -> art id mapping behind `/player/album_art/{track_id}` is kept in
+`ArtCacheEntry` as well (`track:<id>`), so track URLs stay valid across restarts.
+"""
+
+import asyncio
+import hashlib
+import mimetypes
+import subprocess
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, unquote
+
+from sqlmodel import Session
+
+from app.constants import ART_CACHE_DIR, ART_SIZES, ART_TRACK_MEMORY, COVER_ART_PATH, COVER_ART_URL_PREFIX
+from app.database import engine
+from app.models import ArtCacheEntry
+import app.utils.http_client as http_client
+import app.utils.placeholders as placeholders
+
+# source -> art id
+_sources: Dict[str, str] = {}
+# track id -> art id, most recent last (in front of the `track:` rows)
+_tracks: "OrderedDict[str, str]" = OrderedDict()
+_variant_locks: Dict[Tuple[str, int], asyncio.Lock] = {}
+
+
+def art_dir(art_id: str) -> Path:
+    return ART_CACHE_DIR / art_id[:2] / art_id
+
+
+def original_path(art_id: str) -> Optional[Path]:
+    return next(art_dir(art_id).glob("original.*"), None)
+
+
+def art_url(art_id: str, size: Optional[int] = None) -> str:
+    """Static URL of a stored image (served from COVER_ART_PATH)."""
+    path = variant_file(art_id, size) if size else original_path(art_id)
+    if path is None:
+        return ""
+    return f"{COVER_ART_URL_PREFIX}/{path.relative_to(COVER_ART_PATH).as_posix()}"
+
+
+def variant_file(art_id: str, size: int) -> Path:
+    return art_dir(art_id) / f"{size}.jpg"
+
+
+def _local_path(source: str) -> Optional[Path]:
+    if source.startswith("file://"):
+        return Path(unquote(urlparse(source).path))
+    if source.startswith("/"):
+        return Path(source)
+    return None
+
+
+def _source_key(source: str) -> str:
+    """Local files can be replaced in place, their modification time is part of the key."""
+    local = _local_path(source)
+    if local is not None:
+        try:
+            return f"{source}#{local.stat().st_mtime_ns}"
+        except OSError:
+            pass
+    return source
+
+
+def store_bytes(data: bytes, mime: Optional[str] = None) -> str:
+    """Blocking: stores an image by content hash, returns its art id."""
+    art_id = hashlib.sha256(data).hexdigest()
+    if original_path(art_id) is None:
+        extension = mimetypes.guess_extension((mime or "").split(";")[0].strip()) or ".jpg"
+        directory = art_dir(art_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        partial = directory / f".original{extension}.part"
+        partial.write_bytes(data)
+        original = directory / f"original{extension}"
+        partial.rename(original)
+        placeholders.schedule(original)
+    return art_id
+
+
+def _lookup_source(key: str) -> Optional[str]:
+    with Session(engine) as session:
+        entry = session.get(ArtCacheEntry, key)
+    if entry is None or original_path(entry.art_id) is None:
+        return None
+    return entry.art_id
+
+
+def _remember_source(key: str, art_id: str):
+    with Session(engine) as session:
+        session.merge(ArtCacheEntry(source=key, art_id=art_id, fetched_at=time.time()))
+        session.commit()
+
+
+async def _fetch(source: str) -> Tuple[bytes, Optional[str]]:
+    local = _local_path(source)
+    if local is not None:
+        data = await asyncio.to_thread(local.read_bytes)
+        return data, mimetypes.guess_type(local.name)[0]
+
+    response = await http_client.get(source)
+    response.raise_for_status()
+    return response.content, response.headers.get("Content-Type")
+
+
+async def art_id_for_source(source: str) -> Optional[str]:
+    """Returns the art id of an image URL (or local path), fetching it only the first time."""
+    if not source:
+        return None
+    key = _source_key(source)
+    art_id = _sources.get(key)
+    if art_id is not None and original_path(art_id) is not None:
+        return art_id
+
+    art_id = await asyncio.to_thread(_lookup_source, key)
+    if art_id is None:
+        try:
+            data, mime = await _fetch(source)
+        except Exception as e:
+            print(f"⚠️ Failed to fetch art {source}: {e}")
+            return None
+        art_id = await asyncio.to_thread(store_bytes, data, mime)
+        await asyncio.to_thread(_remember_source, key, art_id)
+
+    _sources[key] = art_id
+    return art_id
+
+
+def resize_image(source: Path, target: Path, size: int) -> bool:
+    """Blocking: writes `source` as a JPEG fitting in `size` x `size` px to `target`."""
+    partial = target.with_name(f".{target.name}.part.jpg")
+    result = subprocess.run(
+        [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", str(source),
+            "-vf", f"scale={size}:{size}:force_original_aspect_ratio=decrease",
+            "-frames:v", "1", "-q:v", "3",
+            str(partial),
+        ],
+        capture_output=True,
+    )
+    if result.returncode != 0 or not partial.exists():
+        print(f"⚠️ ffmpeg failed to resize {source}: {result.stderr.decode(errors='ignore').strip()}")
+        partial.unlink(missing_ok=True)
+        return False
+    partial.rename(target)
+    return True
+
+
+async def variant_path(art_id: str, size: Optional[int] = None) -> Optional[Path]:
+    """
+    Path of the image resized to fit `size` px (the original when `size` is None).
+    Variants are made once, on first use; the original is returned if resizing fails.
+    """
+    original = original_path(art_id)
+    if original is None or size is None:
+        return original
+    if size not in ART_SIZES:
+        raise ValueError(f"Unsupported art size {size}, use one of {ART_SIZES}")
+
+    target = variant_file(art_id, size)
+    if target.exists():
+        return target
+
+    lock = _variant_locks.setdefault((art_id, size), asyncio.Lock())
+    async with lock:
+        if not target.exists() and not await asyncio.to_thread(resize_image, original, target, size):
+            return original
+    _variant_locks.pop((art_id, size), None)
+    return target
+
+
+def _track_key(track_id: str) -> str:
+    return f"track:{track_id}"
+
+
+def _remember_in_memory(track_id: str, art_id: str):
+    _tracks[track_id] = art_id
+    _tracks.move_to_end(track_id)
+    while len(_tracks) > ART_TRACK_MEMORY:
+        _tracks.popitem(last=False)
+
+
+async def remember_track(track_id: str, art_id: str):
+    """Records the art of a track, the DB is only written when the mapping is new or changed."""
+    known = _tracks.get(track_id) == art_id
+    _remember_in_memory(track_id, art_id)
+    if not known:
+        await asyncio.to_thread(_remember_source, _track_key(track_id), art_id)
+
+
+async def art_for_track(track_id: str) -> Optional[str]:
+    art_id = _tracks.get(track_id)
+    if art_id is None:
+        art_id = await asyncio.to_thread(_lookup_source, _track_key(track_id))
+        if art_id is None:
+            return None
+    _remember_in_memory(track_id, art_id)
+    return art_id
+
+
+def make_track_id(*parts: str) -> str:
+    """Short stable id for the playing track, from its MPRIS url/art url."""
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def blurhash(art_id: Optional[str]) -> Optional[str]:
+    """Placeholder of a stored image, None while it is being computed."""
+    return placeholders.for_path(original_path(art_id)) if art_id else None
+
+
+def etag(art_id: str, path: Path) -> str:
+    """ETag of the file actually served, `path.stem` is the size or "original" (a failed resize)."""
+    return f'"{art_id}-{path.stem}"'
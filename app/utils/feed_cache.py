@@ -0,0 +1,75 @@
+"""
+Cache of fetched podcast feeds (`FeedCacheEntry`).
+
+A feed fetched less than `FEED_CACHE_FRESHNESS` ago is served as is. After that RSS
+feeds are revalidated with a conditional GET (ETag / Last-Modified): an unchanged
+feed costs a 304 and no parsing. Sources without conditional requests (YouTube,
+Spotify) are simply fetched again.
+"""
+
+import json
+import time
+from typing import Optional
+
+from sqlmodel import Session
+
+from app.constants import FEED_CACHE_FRESHNESS
+from app.database import engine
+from app.models import FeedCacheEntry
+
+
+def get_entry(key: str) -> Optional[FeedCacheEntry]:
+    try:
+        with Session(engine) as session:
+            return session.get(FeedCacheEntry, key)
+    except Exception as e:
+        print(f"⚠️ Feed cache read failed for {key}: {e}")
+        return None
+
+
+def is_fresh(entry: Optional[FeedCacheEntry]) -> bool:
+    return entry is not None and time.time() - entry.fetched_at < FEED_CACHE_FRESHNESS
+
+
+def conditional_headers(entry: Optional[FeedCacheEntry]) -> dict:
+    """Headers turning a GET into a conditional one, for a feed fetched before."""
+    headers = {}
+    if entry is not None:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+    return headers
+
+
+def store(key: str, data: dict, etag: Optional[str] = None, last_modified: Optional[str] = None):
+    """Stores a freshly fetched and parsed feed."""
+    try:
+        with Session(engine) as session:
+            session.merge(FeedCacheEntry(
+                key=key,
+                etag=etag,
+                last_modified=last_modified,
+                fetched_at=time.time(),
+                data=json.dumps(data),
+            ))
+            session.commit()
+    except Exception as e:
+        print(f"⚠️ Feed cache write failed for {key}: {e}")
+
+
+def touch(key: str):
+    """The source answered 304 Not Modified, the cached feed is fresh again."""
+    try:
+        with Session(engine) as session:
+            entry = session.get(FeedCacheEntry, key)
+            if entry is not None:
+                entry.fetched_at = time.time()
+                session.add(entry)
+                session.commit()
+    except Exception as e:
+        print(f"⚠️ Feed cache update failed for {key}: {e}")
+
+
+def load(entry: FeedCacheEntry) -> dict:
+    return json.loads(entry.data)
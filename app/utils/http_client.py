@@ -0,0 +1,87 @@
+"""
+The app-wide async HTTP client.
+
+One `httpx.AsyncClient` is created in the app lifespan and shared by every outbound
+fetch, so connections (and their TLS sessions) are pooled and kept alive between
+requests. Requests to one host are limited to `HTTP_PER_HOST_LIMIT` at a time.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from app.constants import (
+    VERSION,
+    HTTP_TIMEOUT,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_PER_HOST_LIMIT,
+)
+
+_client: Optional[httpx.AsyncClient] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        follow_redirects=True,
+        headers={"User-Agent": f"StreamStation/{VERSION}"},
+    )
+
+
+async def start():
+    """Creates the shared client, called from the app lifespan."""
+    global _client
+    if _client is None:
+        _client = _create_client()
+        print("✅ HTTP client ready")
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        print("🛑 HTTP client closed")
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared client; created on first use when running outside the lifespan."""
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    host = urlparse(url).netloc.lower()
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(HTTP_PER_HOST_LIMIT)
+        _host_semaphores[host] = semaphore
+    return semaphore
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    """GET with the shared client, the body is read completely."""
+    async with _host_semaphore(url):
+        return await get_client().get(url, **kwargs)
+
+
+@asynccontextmanager
+async def stream(method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+    """Like `httpx.AsyncClient.stream`: the body is read on demand, e.g. to sniff the first bytes."""
+    async with _host_semaphore(url):
+        async with get_client().stream(method, url, **kwargs) as response:
+            yield response
@@ -0,0 +1,179 @@
+"""
+Album art of local MPD library tracks.
+
+Art embedded in the files (ID3 APIC, MP4 covr, FLAC/Vorbis pictures) or a
+cover.jpg/folder.png next to them is looked up once per album (directory + album
+tag) and stored in the content addressed art cache, so it is served statically
+from the cover art mount and files are not parsed again.
+An album is only looked up again when its directory or one of its files changes.
+"""
+
+import base64
+import mimetypes
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, unquote
+
+from mutagen import File as MutagenFile  # type: ignore[reportPrivateImportUsage]
+from mutagen.flac import Picture
+from mutagen.mp4 import MP4Cover
+from sqlmodel import Session
+
+from app.constants import MUSIC_DIR, LOCAL_ART_FILENAMES, LOCAL_ART_EXTENSIONS
+from app.database import engine
+from app.models import ArtCacheEntry
+import app.utils.art_cache as art_cache
+
+# Stored as the art id of albums without any art, so they aren't searched again either
+NO_ART = ""
+
+# album key -> (looked up at, art id or NO_ART)
+_albums: Dict[str, Tuple[float, str]] = {}
+
+FRONT_COVER = 3  # ID3/FLAC picture type
+
+
+def track_path(url: str) -> Optional[Path]:
+    """Path of a track from a `file://` URL, an absolute path or a path relative to MUSIC_DIR."""
+    if not url or ("://" in url and not url.startswith("file://")):
+        return None
+    if url.startswith("file://"):
+        return Path(unquote(urlparse(url).path))
+    path = Path(url)
+    return path if path.is_absolute() else MUSIC_DIR / path
+
+
+def _album_key(path: Path, album: Optional[str]) -> str:
+    return f"album:{path.parent}|{album or ''}"
+
+
+def _pick(pictures: list):
+    return next((p for p in pictures if getattr(p, "type", None) == FRONT_COVER), pictures[0])
+
+
+def _embedded_art(path: Path) -> Optional[Tuple[bytes, Optional[str]]]:
+    """Returns `(image bytes, mime)` of the front cover embedded in a file."""
+    audio = MutagenFile(path)
+    if audio is None:
+        return None
+
+    # FLAC
+    pictures = getattr(audio, "pictures", None)
+    if pictures:
+        picture = _pick(pictures)
+        return picture.data, picture.mime
+
+    tags = audio.tags
+    if not tags:
+        return None
+
+    # ID3 (mp3, aiff, wav)
+    if hasattr(tags, "getall"):
+        frames = tags.getall("APIC")
+        if frames:
+            frame = _pick(frames)
+            return frame.data, frame.mime
+        return None
+
+    # MP4 / m4a
+    covers = tags.get("covr")
+    if covers:
+        cover = covers[0]
+        return bytes(cover), "image/png" if getattr(cover, "imageformat", None) == MP4Cover.FORMAT_PNG else "image/jpeg"
+
+    # Ogg Vorbis / Opus
+    blocks = tags.get("metadata_block_picture")
+    if blocks:
+        picture = _pick([Picture(base64.b64decode(block)) for block in blocks])
+        return picture.data, picture.mime
+
+    return None
+
+
+def _folder_art(directory: Path) -> Optional[Path]:
+    """Returns an image like `cover.jpg` or `Folder.png` from the album directory."""
+    try:
+        files = {p.name.lower(): p for p in directory.iterdir() if p.is_file()}
+    except OSError:
+        return None
+    for name in LOCAL_ART_FILENAMES:
+        for extension in LOCAL_ART_EXTENSIONS:
+            found = files.get(name + extension)
+            if found is not None:
+                return found
+    return None
+
+
+def _find_art(path: Path) -> str:
+    """Blocking: stores the album art of a track in the art cache, returns its art id or NO_ART."""
+    try:
+        embedded = _embedded_art(path)
+    except Exception as e:
+        print(f"⚠️ Failed reading embedded art of {path}: {e}")
+        embedded = None
+    if embedded is not None:
+        data, mime = embedded
+        return art_cache.store_bytes(data, mime)
+
+    folder_image = _folder_art(path.parent)
+    if folder_image is not None:
+        try:
+            return art_cache.store_bytes(folder_image.read_bytes(), mimetypes.guess_type(folder_image.name)[0])
+        except OSError as e:
+            print(f"⚠️ Failed reading {folder_image}: {e}")
+    return NO_ART
+
+
+def _changed_since(path: Path) -> float:
+    """Latest modification of a track or its directory, covers new files and re-tagged files."""
+    try:
+        return max(path.stat().st_mtime, path.parent.stat().st_mtime)
+    except OSError:
+        return time.time()
+
+
+def _valid(art_id: str) -> bool:
+    return art_id == NO_ART or art_cache.original_path(art_id) is not None
+
+
+def art_for_track(path: Path, album: Optional[str] = None) -> Optional[str]:
+    """
+    Blocking: returns the art id of a local track's album, or None when it has no art.
+    `album` is the album tag when the caller already read it (library scans).
+    """
+    if album is None:
+        try:
+            audio = MutagenFile(path, easy=True)
+            album = ((audio.tags or {}).get("album") or [None])[0] if audio else None
+        except Exception:
+            album = None
+
+    key = _album_key(path, album)
+    changed = _changed_since(path)
+
+    cached = _albums.get(key)
+    if cached is None:
+        with Session(engine) as session:
+            entry = session.get(ArtCacheEntry, key)
+        if entry is not None:
+            cached = (entry.fetched_at, entry.art_id)
+
+    if cached is None or cached[0] < changed or not _valid(cached[1]):
+        cached = (time.time(), _find_art(path))
+        with Session(engine) as session:
+            session.merge(ArtCacheEntry(source=key, art_id=cached[1], fetched_at=cached[0]))
+            session.commit()
+
+    _albums[key] = cached
+    return cached[1] or None
+
+
+def art_url_for_track(path: Path, album: Optional[str] = None) -> Optional[str]:
+    """Blocking: static URL of a local track's album art, None when it has none."""
+    try:
+        art_id = art_for_track(path, album)
+    except Exception as e:
+        print(f"⚠️ Album art lookup failed for {path}: {e}")
+        return None
+    return art_cache.art_url(art_id) if art_id else None
@@ -2,14 +2,17 @@ from app.players.mpdplayer import MPDPlayer
 from app.players.spotifymprisplayer import SpotifyMPRISPlayer
 from app.players.mpvplayer import MPVMediaPlayer
 import re
-from app.utils.spotify_auth_utils import is_spotify_setup, load_spotify_auth
-from app.utils.ytdlp_helpers import get_media_data, extract_youtube_id
+from app.utils.spotify_auth_utils import is_spotify_setup, get_spotify_client
+from app.utils.ytdlp_helpers import get_media_data, is_known_unavailable, extract_youtube_id
 from fastapi import HTTPException
 from app.variables import media_info
 import app.variables as vars
 from app.constants import SPOTIFY_MODE
 from app.utils.history import log_history
 from app.utils.player_utils import wait_until_finished
+from app.utils.queue_resolver import ensure_resolved
+from app.utils.stream_prefetcher import get_stream_for_playback
+from app.utils.podcast_downloader import local_file_for
 import asyncio
 
 from typing import Optional
@@ -81,10 +84,14 @@ async def play_next_in_queue():
                 # Get next item from queue
                 try:
                     popped_item = queue.queue.popleft()
-                    print(f"🎵 Next song: {popped_item.media_name if hasattr(popped_item, 'media_name') else 'Unknown'}")
+                    queue.publish_event("item_removed", id=getattr(popped_item, "id", None))
                 except IndexError:
                     print("⚠️ Queue became empty during processing")
                     break
+
+                # Placeholders get their metadata on demand, right before playing
+                popped_item = await ensure_resolved(popped_item)
+                print(f"🎵 Next song: {popped_item.media_name if hasattr(popped_item, 'media_name') else 'Unknown'}")
                 
                 if not play_from_queue:
                     break
@@ -94,6 +101,15 @@ async def play_next_in_queue():
                     async def dummy_clean_player(player):
                         pass
                         
+                    # Podcast episodes kept offline play from disk through MPD
+                    local_file = await asyncio.to_thread(local_file_for, getattr(popped_item, "url", None))
+                    if local_file:
+                        print(f"💾 Playing offline copy: {local_file}")
+                        result = await handle_mpd_song(popped_item.media_name, dummy_clean_player, file=local_file)
+                        if result is not None:
+                            break
+                        print("🔄 Offline copy failed, streaming instead...")
+
                     if popped_item.source == "mpd":
                         result = await handle_mpd_song(popped_item.media_name, dummy_clean_player)
                         if result is not None:
@@ -208,7 +224,7 @@ async def handle_spotify_url(url: str, clean_player):
         raise HTTPException(status_code=403, detail="Spotify is not authenticated. Please visit /setup.")
     
     try:
-        sp = load_spotify_auth()
+        sp = await asyncio.to_thread(get_spotify_client)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to authenticate with Spotify: {str(e)}")
 
@@ -252,15 +268,25 @@ async def handle_spotify_url(url: str, clean_player):
 
 async def handle_youtube_url(url: str, clean_player):
     global _current_monitoring_task
+
+    # One extraction per play: use the stream resolved by the prefetcher, or resolve it now.
+    # The extraction also fills the metadata cache (unavailable media included), so get_media_data
+    # below only runs yt-dlp again after a temporary failure.
+    stream = await get_stream_for_playback(url)
+
     try:
-        data = get_media_data(url)
+        data = await asyncio.to_thread(get_media_data, url)
     except ValueError as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch media data: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
     if data is None:
-        raise HTTPException(status_code=404, detail="Media not found or unsupported format.")
+        if await asyncio.to_thread(is_known_unavailable, url):
+            raise HTTPException(status_code=404, detail="Media not found or unsupported format.")
+        # Temporary failure (timeout, network): mpv's ytdl hook may still manage to play it
+        print(f"⚠️ No metadata for {url}, letting mpv resolve it")
+        data = {}
 
     # Set media info
     media_info.title = data.get("title")
@@ -273,7 +299,7 @@ async def handle_youtube_url(url: str, clean_player):
     await clean_player(vars.player_instance)
 
     # Create and start MPV player
-    vars.player_instance = MPVMediaPlayer(data.get("webpage_url"))
+    vars.player_instance = MPVMediaPlayer(data.get("webpage_url") or url, stream=stream)
     
     # Store media info in player for later access
     vars.player_instance.info = {
@@ -301,14 +327,14 @@ async def handle_youtube_url(url: str, clean_player):
     
     return await vars.player_instance.get_state()
 
-async def handle_mpd_song(song_name: str, clean_player):
+async def handle_mpd_song(song_name: str, clean_player, file: Optional[str] = None):
     global _current_monitoring_task
     
     print(f"🎵 MPD Song Name: '{song_name}'")
 
     try:
         await clean_player(vars.player_instance)
-        vars.player_instance = MPDPlayer(song_name=song_name)
+        vars.player_instance = MPDPlayer(song_name=song_name, file=file)
         vars.player_type = vars.player_instance.type
         
         print("PLAYING MPD PLAYER??????/")
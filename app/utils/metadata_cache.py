@@ -0,0 +1,158 @@
+"""
+Shared cache for URL metadata lookups (yt-dlp, Spotify API, MPD).
+
+Entries are keyed by a canonical media id (e.g. `youtube:<video id>`), so different
+URL spellings of the same media share one entry. An in-memory LRU sits in front of
+the `MetadataCacheEntry` SQLite table, failed lookups are cached for a short time too.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.constants import (
+    SPOTIFY_URL_PATTERN,
+    METADATA_CACHE_TTLS,
+    METADATA_CACHE_NEGATIVE_TTL,
+    METADATA_CACHE_MEMORY_SIZE,
+)
+from app.database import engine
+from app.models import MetadataCacheEntry
+
+YOUTUBE_ID_PATTERNS = [
+    re.compile(r"(?:https?://)?(?:www\.|music\.|m\.)?youtube\.com/watch\?(?:.*&)?v=([\w-]{11})"),
+    re.compile(r"(?:https?://)?youtu\.be/([\w-]{11})"),
+    re.compile(r"(?:https?://)?(?:www\.|m\.)?youtube\.com/(?:embed|shorts|live)/([\w-]{11})"),
+]
+
+# key -> (expires_at, value)
+_memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def canonical_media_id(url: str) -> str:
+    """
+    Returns the cache key for a media URL.
+    `youtube:<id>`, `spotify:<track|episode>:<id>`, or `url:<url>` for anything else.
+    """
+    url = url.strip()
+    for pattern in YOUTUBE_ID_PATTERNS:
+        match = pattern.search(url)
+        if match:
+            return f"youtube:{match.group(1)}"
+
+    match = SPOTIFY_URL_PATTERN.match(url)
+    if match:
+        item_type, item_id = match.groups()
+        return f"spotify:{item_type}:{item_id}"
+
+    return f"url:{url}"
+
+
+def _remember(key: str, expires_at: float, value: Any):
+    with _lock:
+        _memory[key] = (expires_at, value)
+        _memory.move_to_end(key)
+        while len(_memory) > METADATA_CACHE_MEMORY_SIZE:
+            _memory.popitem(last=False)
+
+
+def get(key: str) -> Tuple[bool, Any]:
+    """
+    Looks up a key, returns `(found, value)`.
+    `value` is None for a cached failure.
+    """
+    now = time.time()
+
+    with _lock:
+        cached = _memory.get(key)
+        if cached is not None:
+            expires_at, value = cached
+            if expires_at > now:
+                _memory.move_to_end(key)
+                return True, value
+            del _memory[key]
+
+    try:
+        with Session(engine) as session:
+            entry = session.get(MetadataCacheEntry, key)
+            if entry is None:
+                return False, None
+            if entry.expires_at <= now:
+                session.delete(entry)
+                session.commit()
+                return False, None
+            value = json.loads(entry.data) if entry.data is not None else None
+            expires_at = entry.expires_at
+    except Exception as e:
+        print(f"⚠️ Metadata cache read failed for {key}: {e}")
+        return False, None
+
+    _remember(key, expires_at, value)
+    return True, value
+
+
+def put(key: str, source: str, value: Any, ttl: Optional[float] = None):
+    """Stores a lookup result, `value=None` records a failed lookup."""
+    if ttl is None:
+        ttl = METADATA_CACHE_NEGATIVE_TTL if value is None else METADATA_CACHE_TTLS.get(source, METADATA_CACHE_TTLS["url"])
+    expires_at = time.time() + ttl
+
+    _remember(key, expires_at, value)
+
+    try:
+        with Session(engine) as session:
+            session.merge(MetadataCacheEntry(
+                key=key,
+                source=source,
+                data=json.dumps(value) if value is not None else None,
+                expires_at=expires_at,
+            ))
+            session.commit()
+    except Exception as e:
+        print(f"⚠️ Metadata cache write failed for {key}: {e}")
+
+
+def invalidate(key: str):
+    with _lock:
+        _memory.pop(key, None)
+    try:
+        with Session(engine) as session:
+            entry = session.get(MetadataCacheEntry, key)
+            if entry is not None:
+                session.delete(entry)
+                session.commit()
+    except Exception as e:
+        print(f"⚠️ Metadata cache delete failed for {key}: {e}")
+
+
+def cached_lookup(key: str, source: str, fetch: Callable[[], Any]) -> Any:
+    """
+    Returns the cached value for `key`, or calls `fetch()` and caches its result.
+    `fetch` should return a JSON serializable value, or None when the lookup failed.
+    Exceptions raised by `fetch` are not cached.
+    """
+    found, value = get(key)
+    if found:
+        return value
+
+    value = fetch()
+    put(key, source, value)
+    return value
+
+
+def purge_expired():
+    """Removes expired rows from the SQLite table."""
+    now = time.time()
+    try:
+        with Session(engine) as session:
+            for entry in session.exec(select(MetadataCacheEntry).where(MetadataCacheEntry.expires_at <= now)):
+                session.delete(entry)
+            session.commit()
+    except Exception as e:
+        print(f"⚠️ Metadata cache purge failed: {e}")
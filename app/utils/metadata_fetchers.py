@@ -1,11 +1,14 @@
 import subprocess
-import json
 from typing import Optional, List
 from app.constants import SPOTIFY_URL_PATTERN
 from app.models import SongMetadataModel
+from app.utils.ytdlp_helpers import get_media_data
+import app.utils.metadata_cache as metadata_cache
 from urllib.parse import urlparse, parse_qs, urlunparse
 
-from .spotify_auth_utils import load_spotify_auth
+from spotipy.exceptions import SpotifyException
+
+from .spotify_auth_utils import get_spotify_client
 
 def clean_youtube_url(url: str) -> Optional[str]:
     parsed = urlparse(url)
@@ -35,10 +38,10 @@ def get_youtube_metadata(youtube_url: str) -> Optional[SongMetadataModel]:
             print("Invalid YouTube URL.")
             return None
 
-        # Fetch metadata using yt-dlp
-        cmd = ["yt-dlp", "-j", clean_url]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        data = json.loads(result.stdout)
+        # Fetch metadata using yt-dlp (shared metadata cache)
+        data = get_media_data(clean_url)
+        if data is None:
+            return None
 
         return SongMetadataModel(
             media_name=data.get("title"),
@@ -46,12 +49,10 @@ def get_youtube_metadata(youtube_url: str) -> Optional[SongMetadataModel]:
             album=None,
             source="youtube",
             duration=data.get("duration"),  # already in seconds
-            url=clean_url  # optionally include cleaned URL
+            url=clean_url,  # optionally include cleaned URL
+            thumbnail=data.get("thumbnail")
         )
 
-    except subprocess.CalledProcessError as e:
-        print("Error fetching metadata with yt-dlp:", e)
-        return None
     except Exception as e:
         print("Unexpected error:", e)
         return None
@@ -62,38 +63,47 @@ def get_mpd_by_metadata(song_name: str) -> List[SongMetadataModel]:
     if not song_name:
         raise ValueError("Song Name not Provided")
 
-    cmd = ["mpc", "-f", "%title%\n%artist%\n%album%\n%time%", "search", "title", song_name]
-
+    key = f"mpd:search:{song_name.strip().lower()}"
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        lines = result.stdout.strip().split("\n")
-
-        songs = []
-        for i in range(0, len(lines), 4):
-            chunk = lines[i:i+4]
-            if len(chunk) < 4:
-                continue
-            title, artist, album, duration_str = map(str.strip, chunk)
-            try:
-                minutes, seconds = map(int, duration_str.split(":"))
-                duration = minutes * 60 + seconds
-            except:
-                duration = None
-
-            songs.append(SongMetadataModel(
-                media_name=title,
-                artist=artist,
-                album=album,
-                duration=duration,
-                source="mpd",
-                url=""
-            ))
-
-        return songs
-
+        songs = metadata_cache.cached_lookup(key, "mpd", lambda: _search_mpd(song_name))
     except subprocess.CalledProcessError as e:
+        # MPD not reachable, not cached so the next search asks again
         print("Error running mpc:", e)
         return []
+    # Fresh models, every queue entry needs its own id
+    return [SongMetadataModel(**song) for song in songs or []]
+
+
+def _search_mpd(song_name: str) -> List[dict]:
+    """Raises CalledProcessError when mpc fails, an empty result is cached as such."""
+
+    cmd = ["mpc", "-f", "%title%\n%artist%\n%album%\n%time%", "search", "title", song_name]
+
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    lines = result.stdout.strip().split("\n")
+
+    songs = []
+    for i in range(0, len(lines), 4):
+        chunk = lines[i:i+4]
+        if len(chunk) < 4:
+            continue
+        title, artist, album, duration_str = map(str.strip, chunk)
+        try:
+            minutes, seconds = map(int, duration_str.split(":"))
+            duration = minutes * 60 + seconds
+        except:
+            duration = None
+
+        songs.append(SongMetadataModel(
+            media_name=title,
+            artist=artist,
+            album=album,
+            duration=duration,
+            source="mpd",
+            url=""
+        ).model_dump(exclude={"id", "resolved"}))
+
+    return songs
 
 
 def get_spotify_info(url: str) -> SongMetadataModel:
@@ -104,10 +114,28 @@ def get_spotify_info(url: str) -> SongMetadataModel:
     if not match:
         raise ValueError("Invalid Spotify URL format")
 
-    item_type, item_id = match.groups()
+    key = metadata_cache.canonical_media_id(url)
+    found, data = metadata_cache.get(key)
+    if found:
+        if data is None:
+            raise ValueError("Spotify item not found")
+        return SongMetadataModel(**data)
+
+    try:
+        song = _fetch_spotify_info(url, *match.groups())
+    except SpotifyException as e:
+        if e.http_status in (400, 404):
+            # The item doesn't exist, don't ask again for a while
+            metadata_cache.put(key, "spotify", None)
+        raise ValueError(f"Failed to fetch Spotify item: {e}")
+
+    metadata_cache.put(key, "spotify", song.model_dump(exclude={"id", "resolved"}))
+    return song
 
+
+def _fetch_spotify_info(url: str, item_type: str, item_id: str) -> SongMetadataModel:
     try:
-        sp = load_spotify_auth()
+        sp = get_spotify_client()
     except Exception as e:
         raise ValueError("Spotify not authenticated. Please run /setup to login.")
 
@@ -119,18 +147,20 @@ def get_spotify_info(url: str) -> SongMetadataModel:
             album=data["album"]["name"],
             duration=int(data["duration_ms"] / 1000),
             source="spotify",
-            url=url
+            url=url,
+            thumbnail=data["album"]["images"][0]["url"] if data["album"]["images"] else None
         )
 
     elif item_type == "episode":
         data = sp.episode(item_id)
         return SongMetadataModel(
-            song_name=data["name"],
+            media_name=data["name"],
             artist=data["show"]["publisher"],  # e.g., podcast publisher
             album=data["show"]["name"],         # podcast name
             duration=int(data["duration_ms"] / 1000),
             source="spotify",
-            url=url
+            url=url,
+            thumbnail=data["images"][0]["url"] if data.get("images") else None
         )
 
     else:
@@ -0,0 +1,193 @@
+"""
+Blurhash placeholders for cover art.
+
+Every image stored under COVER_ART_PATH (favourite uploads, the art cache, mirrored
+thumbnails) gets a blurhash when it is stored, computed in a small worker pool:
+ffmpeg scales the image down to `PLACEHOLDER_SAMPLE_SIZE` px of raw RGB, which is
+then encoded in pure Python. The string is kept in a `<image>.blurhash` file next
+to the image, so responses can return it inline and clients draw a placeholder
+without another request.
+Images stored before this existed are picked up the first time they are looked up.
+"""
+
+import math
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.constants import (
+    COVER_ART_PATH,
+    COVER_ART_URL_PREFIX,
+    PLACEHOLDER_COMPONENTS,
+    PLACEHOLDER_SAMPLE_SIZE,
+    PLACEHOLDER_WORKERS,
+)
+
+BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+SIDECAR_SUFFIX = ".blurhash"
+
+_executor = ThreadPoolExecutor(max_workers=PLACEHOLDER_WORKERS, thread_name_prefix="blurhash")
+# image path -> blurhash
+_hashes: Dict[str, str] = {}
+_pending: Set[str] = set()
+_lock = threading.Lock()
+
+
+# --- Blurhash encoding ---
+
+def _base83(value: int, length: int) -> str:
+    return "".join(BASE83[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(value: int) -> float:
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = min(max(value, 0.0), 1.0)
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exponent: float) -> float:
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def encode(rgb: bytes, width: int, height: int, components: Tuple[int, int] = PLACEHOLDER_COMPONENTS) -> str:
+    """Encodes raw rgb24 pixels into a blurhash string."""
+    cx, cy = components
+    linear = [_srgb_to_linear(b) for b in rgb]
+
+    factors: List[Tuple[float, float, float]] = []
+    for j in range(cy):
+        cos_y = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(cx):
+            cos_x = [math.cos(math.pi * i * x / width) for x in range(width)]
+            norm = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width * 3
+                for x in range(width):
+                    basis = cos_x[x] * cos_y[y]
+                    index = row + x * 3
+                    r += basis * linear[index]
+                    g += basis * linear[index + 1]
+                    b += basis * linear[index + 2]
+            scale = norm / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((cx - 1) + (cy - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(c) for factor in ac for c in factor)
+        quantised_max = max(0, min(82, int(math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        max_value = 1.0
+        result += _base83(0, 1)
+
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+
+    for factor in ac:
+        r, g, b = (max(0, min(18, int(math.floor(_sign_pow(c / max_value, 0.5) * 9 + 9.5)))) for c in factor)
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+# --- Files ---
+
+def _sidecar(image: Path) -> Path:
+    return image.with_name(image.name + SIDECAR_SUFFIX)
+
+
+def compute(image: Path) -> Optional[str]:
+    """Blocking: computes the blurhash of an image and writes it next to the image."""
+    size = PLACEHOLDER_SAMPLE_SIZE
+    result = subprocess.run(
+        [
+            "ffmpeg", "-loglevel", "error",
+            "-i", str(image),
+            "-vf", f"scale={size}:{size}",
+            "-frames:v", "1", "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1",
+        ],
+        capture_output=True,
+    )
+    if result.returncode != 0 or len(result.stdout) < size * size * 3:
+        print(f"⚠️ ffmpeg failed to sample {image}: {result.stderr.decode(errors='ignore').strip()}")
+        return None
+
+    blurhash = encode(result.stdout[:size * size * 3], size, size)
+    try:
+        _sidecar(image).write_text(blurhash)
+    except OSError as e:
+        print(f"⚠️ Failed writing the blurhash of {image}: {e}")
+    with _lock:
+        _hashes[str(image)] = blurhash
+    return blurhash
+
+
+def _run(image: Path):
+    try:
+        compute(image)
+    except Exception as e:
+        print(f"⚠️ Blurhash failed for {image}: {e}")
+    finally:
+        with _lock:
+            _pending.discard(str(image))
+
+
+def schedule(image: Path):
+    """Computes the blurhash of a newly stored image in the worker pool."""
+    key = str(image)
+    with _lock:
+        if key in _pending:
+            return
+        _pending.add(key)
+    _executor.submit(_run, image)
+
+
+def forget(image: Path):
+    """Removes the blurhash of a deleted image."""
+    with _lock:
+        _hashes.pop(str(image), None)
+    _sidecar(image).unlink(missing_ok=True)
+
+
+def for_path(image: Optional[Path]) -> Optional[str]:
+    """
+    The blurhash of a stored image, None while it isn't computed yet.
+    An image without one (stored before placeholders existed) is queued.
+    """
+    if image is None:
+        return None
+    key = str(image)
+    blurhash = _hashes.get(key)
+    if blurhash is not None:
+        return blurhash
+
+    try:
+        blurhash = _sidecar(image).read_text().strip()
+    except OSError:
+        if image.is_file():
+            schedule(image)
+        return None
+    with _lock:
+        _hashes[key] = blurhash
+    return blurhash
+
+
+def for_url(url: Optional[str]) -> Optional[str]:
+    """The blurhash of an image served from the cover art mount, None for anything else."""
+    prefix = COVER_ART_URL_PREFIX + "/"
+    if not url or not url.startswith(prefix):
+        return None
+    image = (COVER_ART_PATH / url[len(prefix):]).resolve()
+    if COVER_ART_PATH.resolve() not in image.parents:
+        return None
+    return for_path(image)
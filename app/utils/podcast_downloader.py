@@ -0,0 +1,246 @@
+"""
+Keeps the newest episodes of podcasts with `keep_offline` set downloaded.
+
+Episodes are downloaded one at a time, capped at `PODCAST_DOWNLOAD_RATE_LIMIT`, into
+`PODCAST_DOWNLOAD_DIR` (inside MPD's music directory). Episodes that dropped out of
+the newest N are deleted. Before each download the oldest offline episodes are
+removed while the directory is over `PODCAST_DISK_QUOTA` (so it can overshoot by
+at most one episode). Playback prefers the offline copy (MPD).
+Spotify episodes are DRM protected and stay streaming only.
+"""
+
+import asyncio
+import time
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from sqlmodel import Session, select
+
+from app.constants import (
+    MUSIC_DIR,
+    MPD_PORT,
+    PODCAST_DOWNLOAD_DIR,
+    PODCAST_DOWNLOAD_RATE_LIMIT,
+    PODCAST_DISK_QUOTA,
+    PODCAST_DOWNLOAD_INTERVAL,
+)
+from app.database import engine
+from app.models import Podcast, Episode
+import app.utils.http_client as http_client
+
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".aac", ".ogg", ".opus", ".wav", ".flac")
+
+_wake = asyncio.Event()
+
+
+def wake():
+    """Runs a download pass now instead of waiting for the next interval."""
+    _wake.set()
+
+
+def _absolute(local_path: str) -> Path:
+    return MUSIC_DIR / local_path
+
+
+def disk_usage() -> int:
+    if not PODCAST_DOWNLOAD_DIR.exists():
+        return 0
+    return sum(f.stat().st_size for f in PODCAST_DOWNLOAD_DIR.rglob("*") if f.is_file())
+
+
+def local_file_for(url: Optional[str]) -> Optional[str]:
+    """Blocking: the offline copy of an episode URL, relative to MPD's music directory."""
+    if not url:
+        return None
+    with Session(engine) as session:
+        episode = session.exec(
+            select(Episode).where(Episode.url == url, Episode.local_path.is_not(None))  # type: ignore
+        ).first()
+    if episode is None or not _absolute(episode.local_path).exists():
+        return None
+    return episode.local_path
+
+
+# --- Downloads ---
+
+async def _download_http(url: str, target: Path):
+    """Streams a file to disk, sleeping between chunks to stay under the rate limit."""
+    partial = target.with_suffix(target.suffix + ".part")
+    started = time.monotonic()
+    received = 0
+    try:
+        async with http_client.stream("GET", url) as response:
+            response.raise_for_status()
+            with open(partial, "wb") as f:
+                async for chunk in response.aiter_bytes(64 * 1024):
+                    f.write(chunk)
+                    received += len(chunk)
+                    ahead = received / PODCAST_DOWNLOAD_RATE_LIMIT - (time.monotonic() - started)
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+        partial.rename(target)
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+async def _download_ytdlp(url: str, directory: Path, stem: str) -> Path:
+    """Audio only download through the yt-dlp CLI, which has its own rate limit option."""
+    command = [
+        "yt-dlp",
+        "-f", "bestaudio",
+        "--no-playlist",
+        "--limit-rate", str(PODCAST_DOWNLOAD_RATE_LIMIT),
+        "-o", str(directory / f"{stem}.%(ext)s"),
+        url,
+    ]
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(stderr.decode().strip() or f"yt-dlp exited with {process.returncode}")
+
+    matches = [p for p in directory.glob(f"{stem}.*") if not p.name.endswith(".part")]
+    if not matches:
+        raise RuntimeError("yt-dlp finished without an output file")
+    return matches[0]
+
+
+async def _download_episode(episode: Episode) -> Optional[str]:
+    """Downloads one episode, returns its path relative to MUSIC_DIR (None if it can't be downloaded)."""
+    host = urlparse(episode.url).netloc.lower()
+    if "spotify.com" in host:
+        return None
+
+    directory = PODCAST_DOWNLOAD_DIR / str(episode.podcast_id)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    if "youtube.com" in host or "youtu.be" in host:
+        path = await _download_ytdlp(episode.url, directory, episode.id)
+    else:
+        extension = Path(urlparse(episode.url).path).suffix.lower()
+        path = directory / f"{episode.id}{extension if extension in AUDIO_EXTENSIONS else '.mp3'}"
+        await _download_http(episode.url, path)
+
+    return str(path.relative_to(MUSIC_DIR))
+
+
+async def _update_mpd(local_path: str):
+    """Makes MPD index the new file so it can be played by path."""
+    process = await asyncio.create_subprocess_exec(
+        "mpc", f"--port={MPD_PORT}", "--wait", "update", str(Path(local_path).parent),
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+    await process.wait()
+
+
+# --- Keeping the newest N ---
+
+def _plan() -> tuple[List[Episode], List[Episode]]:
+    """Blocking: returns `(to_download, to_delete)`; every wanted episode newest first."""
+    to_download: List[Episode] = []
+    wanted_ids = set()
+    with Session(engine) as session:
+        for podcast in session.exec(select(Podcast).where(Podcast.keep_offline > 0)).all():  # type: ignore
+            newest = session.exec(
+                select(Episode)
+                .where(Episode.podcast_id == podcast.id)
+                .order_by(Episode.upload_date.desc())  # type: ignore
+                .limit(podcast.keep_offline)
+            ).all()
+            for episode in newest:
+                wanted_ids.add(episode.id)
+                if not episode.local_path or not _absolute(episode.local_path).exists():
+                    to_download.append(episode)
+
+        downloaded = session.exec(select(Episode).where(Episode.local_path.is_not(None))).all()  # type: ignore
+        to_delete = [episode for episode in downloaded if episode.id not in wanted_ids]
+
+    to_download.sort(key=lambda e: e.upload_date or "", reverse=True)
+    return to_download, to_delete
+
+
+def _forget_local_copy(episode_id: str):
+    with Session(engine) as session:
+        episode = session.get(Episode, episode_id)
+        if episode is None or not episode.local_path:
+            return
+        _absolute(episode.local_path).unlink(missing_ok=True)
+        print(f"🗑️ Removed offline episode {episode.title or episode.url}")
+        episode.local_path = None
+        episode.downloaded_at = None
+        session.add(episode)
+        session.commit()
+
+
+def _save_local_copy(episode_id: str, local_path: str):
+    with Session(engine) as session:
+        episode = session.get(Episode, episode_id)
+        if episode is not None:
+            episode.local_path = local_path
+            episode.downloaded_at = time.time()
+            session.add(episode)
+            session.commit()
+
+
+def _make_room(for_episode: Episode) -> bool:
+    """
+    Blocking: while over the quota, removes offline episodes older than `for_episode`.
+    Returns False if there is still no room; older episodes never push out newer ones,
+    so the same episodes aren't downloaded and removed over and over.
+    """
+    while disk_usage() >= PODCAST_DISK_QUOTA:
+        with Session(engine) as session:
+            oldest = session.exec(
+                select(Episode)
+                .where(Episode.local_path.is_not(None), Episode.upload_date < (for_episode.upload_date or ""))  # type: ignore
+                .order_by(Episode.upload_date.asc())  # type: ignore
+            ).first()
+        if oldest is None:
+            return False
+        _forget_local_copy(oldest.id)
+    return True
+
+
+async def sync_offline_episodes():
+    """One pass: drop episodes no longer wanted, then download the missing ones newest first."""
+    to_download, to_delete = await asyncio.to_thread(_plan)
+
+    for episode in to_delete:
+        await asyncio.to_thread(_forget_local_copy, episode.id)
+
+    for episode in to_download:
+        if not await asyncio.to_thread(_make_room, episode):
+            print("⚠️ Podcast disk quota reached, skipping the remaining downloads")
+            break
+        try:
+            print(f"⬇️ Downloading episode {episode.title or episode.url}")
+            local_path = await _download_episode(episode)
+        except Exception as e:
+            print(f"⚠️ Failed to download episode {episode.url}: {e}")
+            continue
+        if local_path is None:
+            continue
+        await asyncio.to_thread(_save_local_copy, episode.id, local_path)
+        await _update_mpd(local_path)
+        print(f"✅ Episode available offline: {local_path}")
+
+
+async def run_downloader():
+    """Background loop, started in the app lifespan."""
+    print("✅ Podcast downloader started")
+    try:
+        while True:
+            _wake.clear()
+            try:
+                await sync_offline_episodes()
+            except Exception as e:
+                print(f"⚠️ Podcast download pass failed: {e}")
+            try:
+                await asyncio.wait_for(_wake.wait(), timeout=PODCAST_DOWNLOAD_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    except asyncio.CancelledError:
+        print("🛑 Podcast downloader stopped")
+        raise
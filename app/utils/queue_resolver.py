@@ -0,0 +1,240 @@
+"""
+Resolves the metadata of items submitted to the queue.
+
+Items are enqueued right away as placeholders (URL and a source guessed from it),
+the title/artist/duration/thumbnail are filled in the background, bounded per source.
+Only the item that is about to be played has to wait for its metadata.
+"""
+
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from app.constants import QUEUE_RESOLVE_CONCURRENCY, QUEUE_BATCH_HISTORY
+from app.models import QueueItem, QueueBatchStatus, SongMetadataModel
+from app.utils.metadata_fetchers import get_youtube_metadata, get_mpd_by_metadata, get_spotify_info
+import app.queue as queue
+
+
+def is_spotify_url(url: str) -> bool:
+    return "open.spotify.com" in url and ("track/" in url or "episode/" in url)
+
+def is_youtube_url(url: str) -> bool:
+    return "youtube.com" in url or "youtu.be" in url
+
+def add_raw_url(url: str) -> SongMetadataModel:
+    return SongMetadataModel(media_name=url, source="direct", url=url)
+
+
+URL_HANDLERS: List[tuple[str, Callable[[str], bool], Callable[[str], Any]]] = [
+    ("spotify", is_spotify_url, get_spotify_info),
+    ("youtube", is_youtube_url, get_youtube_metadata),
+]
+
+# One semaphore per source, so a slow source can't starve the others
+_source_semaphores: Dict[str, asyncio.Semaphore] = {
+    source: asyncio.Semaphore(limit) for source, limit in QUEUE_RESOLVE_CONCURRENCY.items()
+}
+
+# batch_id -> status, oldest first
+queue_batches: "OrderedDict[str, QueueBatchStatus]" = OrderedDict()
+
+# placeholder id -> task filling in its metadata
+_pending_resolutions: Dict[str, asyncio.Task] = {}
+# ids of popped entries the player is waiting on (`ensure_resolved`)
+_playing: Set[str] = set()
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def get_url_source(url: str) -> str:
+    """Returns the source name the URL will be resolved with."""
+    for source, matcher, _ in URL_HANDLERS:
+        if matcher(url):
+            return source
+    return "direct"
+
+
+def resolve_url(url: str) -> SongMetadataModel:
+    """
+    Blocking metadata lookup for a single URL.
+    Raises if the source specific handler fails.
+    """
+    url = url.strip()
+    for _, matcher, handler in URL_HANDLERS:
+        if matcher(url):
+            print(f"running handler for url: {url}")
+            result = handler(url)
+            if result is not None:
+                return result
+            break
+    return add_raw_url(url)
+
+
+def make_placeholder(item: QueueItem) -> SongMetadataModel:
+    """Builds the queue entry shown until the metadata of `item` is known."""
+    if item.song_name:
+        return SongMetadataModel(media_name=item.song_name, source="mpd", resolved=False)
+
+    url = item.url.strip() if item.url else ""
+    source = get_url_source(url)
+    return SongMetadataModel(media_name=url, source=source, url=url, resolved=(source == "direct"))
+
+
+async def _lookup(placeholder: SongMetadataModel) -> List[SongMetadataModel]:
+    """Fetches the metadata for a placeholder, a song name can match several MPD songs."""
+    source = placeholder.source or "direct"
+    async with _source_semaphores[source]:
+        if source == "mpd":
+            print("Calling get_mpd_by_metadata with:", placeholder.media_name)
+            return await asyncio.to_thread(get_mpd_by_metadata, placeholder.media_name)
+        try:
+            return [await asyncio.to_thread(resolve_url, placeholder.url or "")]
+        except Exception as e:
+            print(f"[URL Handler Error] {e}")
+            return [add_raw_url(placeholder.url or "")]
+
+
+def _fill_in(placeholder: SongMetadataModel, results: List[SongMetadataModel]):
+    """
+    Copies the resolved metadata into the placeholder (in place, so it is updated wherever
+    it currently is), extra MPD matches are inserted right after it.
+    A song name without any MPD match is removed from the queue, it couldn't be played.
+    """
+    index = queue.find_index(queue.queue, placeholder.id)
+    playing = placeholder.id in _playing
+
+    if not results:
+        placeholder.resolved = True
+        if placeholder.source == "mpd" and not placeholder.url:
+            if index is not None:
+                del queue.queue[index]
+                queue.publish_event("item_removed", id=placeholder.id)
+            return
+        # Keep the entry playable with what we have
+        queue.publish_event("item_updated", item=placeholder)
+        return
+
+    first, extra = results[0], results[1:]
+    for field, value in first.model_dump(exclude={"id", "resolved"}).items():
+        if value is not None:
+            setattr(placeholder, field, value)
+    placeholder.resolved = True
+    queue.publish_event("item_updated", item=placeholder)
+
+    if not extra:
+        return
+    if index is not None:
+        insert_at = index + 1
+    elif playing:
+        # Popped for playback, the other matches play right after it
+        insert_at = 0
+    else:
+        # Removed from the queue (or the queue was cleared) meanwhile
+        return
+    for offset, entry in enumerate(extra):
+        queue.queue.insert(insert_at + offset, entry)
+    queue.publish_event("items_added", index=insert_at, items=extra)
+
+
+async def _resolve_placeholder(placeholder: SongMetadataModel, batch: Optional[QueueBatchStatus] = None):
+    try:
+        results = await _lookup(placeholder)
+        _fill_in(placeholder, results)
+        if batch:
+            batch.resolved += 1
+    except Exception as e:
+        print(f"[Queue Resolve Error] {e}")
+        # Played with what we have, clients still need to stop showing it as pending
+        placeholder.resolved = True
+        queue.publish_event("item_updated", item=placeholder)
+        if batch:
+            batch.failed += 1
+    finally:
+        _pending_resolutions.pop(placeholder.id, None)
+
+
+def schedule_resolution(placeholder: SongMetadataModel, batch: Optional[QueueBatchStatus] = None) -> Optional[asyncio.Task]:
+    """Starts filling in a placeholder in the background. Must be called from the event loop."""
+    if placeholder.resolved:
+        if batch:
+            batch.resolved += 1
+        return None
+    task = asyncio.create_task(_resolve_placeholder(placeholder, batch))
+    _pending_resolutions[placeholder.id] = task
+    return task
+
+
+async def ensure_resolved(entry):
+    """
+    Waits until a queue entry has its full metadata, resolving it right now if needed.
+    Used for the item that is about to be played.
+    """
+    if not isinstance(entry, SongMetadataModel) or entry.resolved:
+        return entry
+
+    task = _pending_resolutions.get(entry.id)
+    if task is None:
+        task = schedule_resolution(entry)
+    if task is not None:
+        _playing.add(entry.id)
+        try:
+            await task
+        finally:
+            _playing.discard(entry.id)
+    return entry
+
+
+def cancel_resolutions(entries: Iterable[Any]):
+    """Stops filling in placeholders that were removed from the queue."""
+    for entry in entries:
+        task = _pending_resolutions.pop(getattr(entry, "id", None), None)
+        if task is not None:
+            task.cancel()
+
+
+def create_batch(total: int) -> QueueBatchStatus:
+    batch = QueueBatchStatus(batch_id=uuid.uuid4().hex, total=total, created_at=_utc_now())
+    queue_batches[batch.batch_id] = batch
+
+    # Forget the oldest finished batches
+    while len(queue_batches) > QUEUE_BATCH_HISTORY:
+        oldest_id, oldest = next(iter(queue_batches.items()))
+        if oldest.status != "completed":
+            break
+        del queue_batches[oldest_id]
+
+    return batch
+
+
+def get_batch(batch_id: str) -> Optional[QueueBatchStatus]:
+    return queue_batches.get(batch_id)
+
+
+def enqueue_placeholders(items: List[QueueItem], batch: QueueBatchStatus) -> List[SongMetadataModel]:
+    """Appends a placeholder for every valid item to the queue, in the submitted order."""
+    placeholders = [make_placeholder(item) for item in items if item.url or item.song_name]
+    batch.total = len(placeholders)
+
+    if placeholders:
+        index = len(queue.queue)
+        queue.add_multiple_extend(queue.queue, placeholders)
+        batch.queued = len(placeholders)
+        queue.publish_event("items_added", index=index, items=placeholders)
+
+    return placeholders
+
+
+async def resolve_batch(placeholders: List[SongMetadataModel], batch: QueueBatchStatus):
+    """Fills in all placeholders of a batch concurrently."""
+    batch.status = "running"
+    tasks = [task for task in (schedule_resolution(p, batch) for p in placeholders) if task is not None]
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    batch.status = "completed"
+    batch.finished_at = _utc_now()
+    print(f"✅ Queue batch {batch.batch_id} done: {batch.resolved} resolved, {batch.failed} failed")
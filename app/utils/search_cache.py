@@ -0,0 +1,205 @@
+"""
+Per-query cache of YouTube search results.
+
+The result list of a query is extended incrementally: a yt-dlp worker keeps the
+search open (`ytsearchall:`), so a later page only extracts the new results, and
+repeated identical searches are served from memory until `SEARCH_CACHE_TTL`.
+Pages are addressed with an opaque cursor.
+"""
+
+import base64
+import json
+import queue as queue_module
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from app.constants import SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE, SEARCH_PREFETCH_EXTRA
+import app.utils.ytdlp_pool as ytdlp_pool
+
+SEARCH_OPTS = {"extract_flat": "in_playlist"}
+
+
+class _CachedSearch:
+    def __init__(self, query: str):
+        self.query = query
+        self.entries: List[dict] = []
+        self.stream: Optional[ytdlp_pool.YtdlpStream] = None
+        # Position in the yt-dlp result list, empty entries included
+        self.position = 0
+        self.exhausted = False
+        self.expires_at = time.time() + SEARCH_CACHE_TTL
+        self.lock = threading.Lock()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+
+# normalized query -> cached search, least recently used first
+_searches: "OrderedDict[str, _CachedSearch]" = OrderedDict()
+_searches_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def encode_cursor(query: str, offset: int) -> str:
+    raw = json.dumps({"q": query, "o": offset}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Returns `(query, offset)`, raises ValueError for a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(data["q"]), max(int(data["o"]), 0)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _get_search(query: str) -> _CachedSearch:
+    key = normalize_query(query)
+    expired = []
+    with _searches_lock:
+        now = time.time()
+        for old_key in [k for k, s in _searches.items() if s.expires_at <= now]:
+            expired.append(_searches.pop(old_key))
+
+        search = _searches.get(key)
+        if search is None:
+            search = _CachedSearch(query)
+            _searches[key] = search
+        _searches.move_to_end(key)
+
+        while len(_searches) > SEARCH_CACHE_SIZE:
+            expired.append(_searches.popitem(last=False)[1])
+
+    for old in expired:
+        old.close()
+    return search
+
+
+def _extend(
+    search: _CachedSearch,
+    count: int,
+    on_entry: Optional[Callable[[dict], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+):
+    """
+    Pulls `count` more results, reopening the search if its worker was restarted.
+    `on_entry` is called for every new result as soon as it arrives.
+    Results that arrived before a cancellation stay cached.
+    """
+    target = len(search.entries) + count
+
+    def add(entry: dict):
+        search.entries.append(entry)
+        if on_entry:
+            on_entry(entry)
+
+    for _ in range(2):
+        stream = search.stream
+        try:
+            if stream is None:
+                stream = search.stream = ytdlp_pool.open_stream(f"ytsearchall:{search.query}", SEARCH_OPTS, cancel_event=cancel_event)
+                if search.position:
+                    # Reopened: skip what we already have
+                    stream.take(search.position, cancel_event=cancel_event)
+
+            stream.take(target - len(search.entries), on_item=add, cancel_event=cancel_event)
+            if stream.exhausted:
+                search.exhausted = True
+                search.close()
+            return
+        except ytdlp_pool.YtdlpStreamLost:
+            search.stream = None
+        except ytdlp_pool.YtdlpCancelled:
+            # The worker was killed, the open search went with it
+            search.stream = None
+            raise
+        finally:
+            # Also counts what arrived before a failure, so a reopened search skips it
+            if stream is not None:
+                search.position = max(search.position, stream.position)
+
+
+def peek_results(query: str, offset: int, count: int) -> Optional[Tuple[List[dict], int, bool]]:
+    """Same as `get_results`, but only when the page is already cached; never extracts or waits."""
+    with _searches_lock:
+        search = _searches.get(normalize_query(query))
+    if search is None or search.expires_at <= time.time():
+        return None
+    if not search.lock.acquire(blocking=False):
+        return None
+    try:
+        needed = offset + count
+        if len(search.entries) < needed and not search.exhausted:
+            return None
+        page = search.entries[offset:needed]
+        return page, len(search.entries), len(search.entries) > needed or not search.exhausted
+    finally:
+        search.lock.release()
+
+
+def get_results(
+    query: str,
+    offset: int,
+    count: int,
+    cancel_event: Optional[threading.Event] = None,
+) -> Tuple[List[dict], int, bool]:
+    """
+    Returns `(entries, total_known, has_more)` for the results `offset .. offset + count`.
+    Only results that were not fetched before are extracted.
+    Concurrent calls for the same query wait for each other, so they share one extraction.
+    """
+    search = _get_search(query)
+    with search.lock:
+        needed = offset + count
+        if len(search.entries) < needed and not search.exhausted:
+            _extend(search, needed - len(search.entries) + SEARCH_PREFETCH_EXTRA, cancel_event=cancel_event)
+
+        page = search.entries[offset:needed]
+        has_more = len(search.entries) > needed or not search.exhausted
+        return page, len(search.entries), has_more
+
+
+def iter_results(query: str, offset: int, count: int) -> Iterator[dict]:
+    """
+    Yields the results `offset .. offset + count` one by one, new results are
+    yielded as soon as yt-dlp extracts them instead of after the whole page.
+    """
+    search = _get_search(query)
+    needed = offset + count
+    items: "queue_module.Queue[Any]" = queue_module.Queue()
+    done = object()
+
+    def on_entry(entry: dict):
+        if offset < len(search.entries) <= needed:
+            items.put(entry)
+
+    def produce():
+        try:
+            with search.lock:
+                for entry in search.entries[offset:needed]:
+                    items.put(entry)
+                if len(search.entries) < needed and not search.exhausted:
+                    _extend(search, needed - len(search.entries) + SEARCH_PREFETCH_EXTRA, on_entry=on_entry)
+        except Exception as e:
+            items.put(e)
+        finally:
+            items.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    while True:
+        item = items.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
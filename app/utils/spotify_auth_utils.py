@@ -1,8 +1,13 @@
+import asyncio
 import os
-from ..constants import AUTH_PATH, CONFIG_PATH, SPOTIFY_SCOPES
+import threading
+from typing import Optional, Tuple
+from ..constants import AUTH_PATH, CONFIG_PATH, SPOTIFY_SCOPES, SPOTIFY_HTTP_POOL_SIZE, SPOTIFY_TOKEN_REFRESH_MARGIN, HTTP_TIMEOUT
 import yaml
+import requests
 import spotipy
 import time
+from requests.adapters import HTTPAdapter
 from spotipy.oauth2 import SpotifyOAuth
 from .resource_fetchers import load_config, load_auth, save_auth
 
@@ -20,10 +25,44 @@ REQUIRED_KEYS = [
     "token_type"
 ]
 
+
+class _CachedTokenManager:
+    """
+    spotipy auth manager handing out the process wide token.
+    The background refresher renews it before it expires; a request finding it
+    expired (refresher not running yet) refreshes it itself.
+    """
+
+    def get_access_token(self, as_dict: bool = False):
+        # Not one that expires in the middle of the request
+        token = _valid_token(30)
+        return token if as_dict else token["access_token"]
+
+
+_lock = threading.RLock()
+_token: Optional[dict] = None
+_client: Optional[spotipy.Spotify] = None
+# (auth file mtime, result), so the auth file is only parsed again after it changed
+_setup_state: Optional[Tuple[float, bool]] = None
+
+
 def is_spotify_setup():
-    if not os.path.exists(AUTH_PATH):
+    global _setup_state
+    try:
+        mtime = os.stat(AUTH_PATH).st_mtime
+    except OSError:
         return False
-    
+
+    cached = _setup_state
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    result = _check_auth_file()
+    _setup_state = (mtime, result)
+    return result
+
+
+def _check_auth_file():
     try:
         with open(AUTH_PATH, "r") as f:
             data = yaml.safe_load(f)
@@ -33,50 +72,96 @@ def is_spotify_setup():
 
     # Check that all required keys exist and are not empty
     for key in REQUIRED_KEYS:
-        if not data.get(key):
+        if not (data or {}).get(key):
             print(f"Missing or empty Spotify auth key: {key}")
             return False
     
     return True
 
-def load_spotify_auth():
-    auth = load_auth(AUTH_PATH)
+
+def _load_spotify_config() -> dict:
     config = load_config(CONFIG_PATH)
-    
     if not config or not all(k in config for k in ("spotify_client_id", "spotify_client_secret", "spotify_redirect_uri")):
         raise ValueError("Spotify configuration is incomplete. Please check your config.yaml.")
-    
-    if auth and "access_token" in auth and "expires_at" in auth:
-        if auth["expires_at"] > int(time.time()):
-                sp = spotipy.Spotify(auth=auth["access_token"])
-                return sp
-                # RETURN THIS????
+    return config
+
+
+def _valid_token(margin: float) -> dict:
+    """
+    Blocking: returns a token valid for at least `margin` more seconds, refreshing it when needed.
+    The auth file is only read the first time, refreshed tokens are written back to it.
+    """
+    global _token
+    with _lock:
+        token = _token or load_auth(AUTH_PATH)
+        if token and "access_token" in token and token.get("expires_at", 0) - margin > time.time():
+            _token = token
+            return token
+
+        config = _load_spotify_config()
+        sp_oauth = SpotifyOAuth(
+            client_id=config["spotify_client_id"],
+            client_secret=config["spotify_client_secret"],
+            redirect_uri=config["spotify_redirect_uri"],
+            scope=SPOTIFY_SCOPES,
+            cache_path=AUTH_PATH
+        )
+        if token and token.get("refresh_token"):
+            token_info = sp_oauth.refresh_access_token(token["refresh_token"])
+            # Spotify may leave the refresh token (and scope) out of the answer, the old ones stay valid
+            token_info = {**token, **token_info}
         else:
-                sp_oauth = SpotifyOAuth(
-                    client_id=config["spotify_client_id"],
-                    client_secret=config["spotify_client_secret"],
-                    redirect_uri=config["spotify_redirect_uri"],
-                    scope=SPOTIFY_SCOPES,
-                    cache_path=AUTH_PATH
-                )
-                token_info = sp_oauth.refresh_access_token(auth["refresh_token"])
-                save_auth(token_info, AUTH_PATH)
-                sp = spotipy.Spotify(auth=token_info["access_token"])
-                return sp
-                # RETURN THIS????
-    
-    else:
-            sp_oauth = SpotifyOAuth(
-                client_id=config["spotify_client_id"],
-                client_secret=config["spotify_client_secret"],
-                redirect_uri=config["spotify_redirect_uri"],
-                scope=SPOTIFY_SCOPES,
-                cache_path=AUTH_PATH
-            )
             token_info = sp_oauth.get_access_token(as_dict=True)
-            save_auth(token_info, AUTH_PATH)
-            sp = spotipy.Spotify(auth=token_info["access_token"])
-            return sp
-            # RETURN THIS????
-            
-            
\ No newline at end of file
+        save_auth(token_info, AUTH_PATH)
+        _token = token_info
+        return token_info
+
+
+def get_spotify_client() -> spotipy.Spotify:
+    """
+    The process wide Spotify client, safe to use from any thread.
+    It shares one pooled HTTP session, the token is renewed in the background
+    (`run_token_refresher`). Raises ValueError when config.yaml lacks the Spotify keys.
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            _load_spotify_config()
+            _valid_token(0)
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SPOTIFY_HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            _client = spotipy.Spotify(auth_manager=_CachedTokenManager(), requests_session=session, requests_timeout=HTTP_TIMEOUT)
+        return _client
+
+
+def reset_spotify_auth():
+    """Forgets the cached token and setup check, e.g. after logging in again."""
+    global _token, _setup_state
+    with _lock:
+        _token = None
+        _setup_state = None
+
+
+async def run_token_refresher():
+    """
+    Background loop, started in the app lifespan.
+    Renews the access token `SPOTIFY_TOKEN_REFRESH_MARGIN` before it expires,
+    so requests never wait on a token refresh.
+    """
+    print("✅ Spotify token refresher started")
+    try:
+        while True:
+            delay = 60.0
+            if is_spotify_setup():
+                try:
+                    token = await asyncio.to_thread(_valid_token, SPOTIFY_TOKEN_REFRESH_MARGIN)
+                    # Wake up just inside the margin, so the next call refreshes
+                    delay = max(token.get("expires_at", 0) - SPOTIFY_TOKEN_REFRESH_MARGIN - time.time() + 1, 5.0)
+                except Exception as e:
+                    print(f"⚠️ Spotify token refresh failed: {e}")
+            await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        print("🛑 Spotify token refresher stopped")
+        raise
@@ -1,60 +1,73 @@
-from .spotify_auth_utils import load_spotify_auth
-from sqlmodel import Session, select
+from sqlmodel import Session, select, col
 from app.models import SpotifyLikedSongItem
 from app.database import engine
+from app.constants import SPOTIFY_PAGE_CONCURRENCY, SPOTIFY_MAX_RETRIES
+
+import asyncio
+import threading
+import time
+from typing import Callable, List
+from spotipy.exceptions import SpotifyException
+
+# Set when Spotify answers 429, every request waits until then
+_retry_not_before = 0.0
+_retry_lock = threading.Lock()
+
+
+def call_with_retry(fn: Callable, *args, **kwargs):
+    """
+    Blocking: calls a spotipy method, waiting out `429 Too Many Requests` as told by `Retry-After`.
+    The wait applies to all requests going through here, not just the one that was rejected.
+    """
+    global _retry_not_before
+
+    for attempt in range(SPOTIFY_MAX_RETRIES + 1):
+        wait = _retry_not_before - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            return fn(*args, **kwargs)
+        except SpotifyException as e:
+            if e.http_status != 429 or attempt == SPOTIFY_MAX_RETRIES:
+                raise
+            try:
+                retry_after = float((e.headers or {}).get("Retry-After", 1))
+            except (TypeError, ValueError):
+                retry_after = 1.0
+            print(f"⏳ Spotify rate limit hit, retrying in {retry_after}s")
+            with _retry_lock:
+                _retry_not_before = max(_retry_not_before, time.time() + retry_after)
+
+
+async def fetch_all_pages(fetch_page: Callable[[int, int], dict], limit: int = 50) -> List[dict]:
+    """
+    Fetches every item of an offset paginated Spotify listing.
+    The first page tells the `total`, the remaining pages are fetched concurrently
+    (at most `SPOTIFY_PAGE_CONCURRENCY` at once) and merged back in order.
+    `fetch_page(offset, limit)` is a blocking call returning a Spotify paging object.
+    """
+    first = await asyncio.to_thread(call_with_retry, fetch_page, 0, limit)
+    total = first.get("total") or 0
+    semaphore = asyncio.Semaphore(SPOTIFY_PAGE_CONCURRENCY)
+
+    async def fetch(offset: int) -> List[dict]:
+        async with semaphore:
+            page = await asyncio.to_thread(call_with_retry, fetch_page, offset, limit)
+        return page.get("items") or []
+
+    pages = await asyncio.gather(*(fetch(offset) for offset in range(limit, total, limit)))
+
+    items = list(first.get("items") or [])
+    for page_items in pages:
+        items.extend(page_items)
+    return [item for item in items if item]
+
 
 def get_all_liked_songs_from_db():
     try:
         with Session(engine) as session:
-            songs = session.exec(select(SpotifyLikedSongItem)).all()
+            songs = session.exec(select(SpotifyLikedSongItem).order_by(col(SpotifyLikedSongItem.added_at).desc())).all()
             return [song.model_dump() for song in songs]
     except Exception as e:
         return e
-    
-
-def fetch_liked_songs_from_spotify():
-    sp = load_spotify_auth()
-    songs = []
-
-    results = sp.current_user_saved_tracks(limit=50)
-
-    with Session(engine) as session:
-        while results:
-            for item in results["items"]:
-                track = item["track"]
-                
-                name = track.get("name") or "Unknown Title"
-                artist = track["artists"][0]["name"] if track["artists"] else "Unknown Artist"
-                album_art = track["album"]["images"][0]["url"] if track["album"]["images"] else None
-                
-                if not album_art:
-                    album_art = "https://example.com/default.jpg"  # fallback image
-                
-                song_data = {
-                    "id": track["id"],
-                    "name": track["name"],
-                    "artist": track["artists"][0]["name"],
-                    "album_art": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
-                    "spotify_url": track["external_urls"]["spotify"]
-                }
-
-                # Check if this song is already in the DB
-                existing = session.exec(
-                    select(SpotifyLikedSongItem).where(SpotifyLikedSongItem.id == song_data["id"])
-                ).first()
-                
-                if not existing:
-                    song = SpotifyLikedSongItem(**song_data)
-                    session.add(song)
-                    songs.append(song)
-                else:
-                    # Ensure it's a full dict version of the existing object
-                    songs.append(existing.model_dump())
-
-            session.commit()
-
-            if results["next"]:
-                results = sp.next(results)
-            else:
-                break
-    return songs
+
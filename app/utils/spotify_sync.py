@@ -0,0 +1,315 @@
+"""
+Background sync of the Spotify liked songs into the DB.
+
+A sync runs as one job per process (`start` refuses a second one) and stores
+songs page by page. Every page is committed together with a checkpoint in
+`SpotifySyncState` (next offset, `added_at` of the last song), so a sync that is
+interrupted, e.g. by a restart, is resumed from the last stored page (`resume`).
+
+- "new": saved tracks come newest first, paging stops at the first page without
+  an unknown song. One `IN (...)` query and one bulk insert per page.
+- "full": walks the whole library, `SPOTIFY_PAGE_CONCURRENCY` pages at a time, marks
+  every listed song with the start of the run (`last_seen`) and finally deletes the
+  songs that weren't listed, i.e. were unliked. Runs every `SPOTIFY_FULL_SYNC_INTERVAL`.
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, List, Optional, Set
+
+from sqlmodel import Session, select, col
+from sqlalchemy import insert, update, delete, func, or_
+
+from app.constants import SPOTIFY_PAGE_CONCURRENCY, SPOTIFY_FULL_SYNC_INTERVAL
+from app.database import engine
+from app.models import SpotifyLikedSongItem, SpotifySyncState
+from app.utils.spotify_auth_utils import get_spotify_client, is_spotify_setup
+from app.utils.spotify_fetchers import call_with_retry
+import app.utils.thumbnail_mirror as thumbnail_mirror
+
+SAVED_TRACKS_PAGE_SIZE = 50  # maximum allowed by the API
+
+
+class SyncAlreadyRunning(Exception):
+    pass
+
+
+_task: Optional[asyncio.Task] = None
+# Latest state, `watch` waits on `_updated` for the next one
+_snapshot: dict = {}
+_updated = asyncio.Event()
+
+
+# --- DB ---
+
+def _song_row(item: dict) -> Optional[dict]:
+    """Saved track item -> `SpotifyLikedSongItem` columns, None for tracks without an id (local files)."""
+    track = item.get("track")
+    if not track or not track.get("id"):
+        return None
+    artists = track.get("artists") or []
+    images = (track.get("album") or {}).get("images") or []
+    return {
+        "id": track["id"],
+        "name": track.get("name") or "Unknown Title",
+        "artist": artists[0]["name"] if artists else "Unknown Artist",
+        "album_art": images[0]["url"] if images else None,
+        "spotify_url": (track.get("external_urls") or {}).get("spotify") or f"https://open.spotify.com/track/{track['id']}",
+        "added_at": item.get("added_at"),
+    }
+
+
+def _song_rows(items: List[dict]) -> List[dict]:
+    rows = {}
+    for item in items:
+        row = _song_row(item)
+        if row is not None:
+            rows.setdefault(row["id"], row)
+    return list(rows.values())
+
+
+def _skipped_items(items: List[dict]) -> int:
+    """Items `_song_row` leaves out, Spotify still counts them in `total`."""
+    return sum(1 for item in items if _song_row(item) is None)
+
+
+def _known_ids(session: Session, ids: List[str]) -> Set[str]:
+    """One `IN (...)` query for a page of ids."""
+    if not ids:
+        return set()
+    return set(session.exec(select(SpotifyLikedSongItem.id).where(col(SpotifyLikedSongItem.id).in_(ids))).all())
+
+
+def _state_dict(state: SpotifySyncState) -> dict:
+    data = state.model_dump(exclude={"id"})
+    data["running"] = _task is not None and not _task.done()
+    data["progress"] = (
+        round(min(state.offset / state.total, 1.0), 3)
+        if state.mode == "full" and state.total and state.offset is not None else None
+    )
+    return data
+
+
+def load_state() -> dict:
+    with Session(engine) as session:
+        return _state_dict(session.get(SpotifySyncState, 1) or SpotifySyncState())
+
+
+def _begin(mode: str) -> dict:
+    with Session(engine) as session:
+        state = session.get(SpotifySyncState, 1) or SpotifySyncState()
+        state.status = "running"
+        state.mode = mode
+        state.started_at = time.time()
+        state.finished_at = None
+        state.offset = 0
+        state.checkpoint_added_at = None
+        state.total = None
+        state.skipped = 0
+        state.added = 0
+        state.removed = 0
+        state.error = None
+        session.add(state)
+        session.commit()
+        return _state_dict(state)
+
+
+def _store_page(rows: List[dict], mark_seen: Optional[float], next_offset: int, total: Optional[int], skipped: int = 0) -> List[dict]:
+    """
+    Blocking: stores a page (or a batch of pages) of liked songs and moves the checkpoint past it,
+    in one transaction. Returns the songs that were new.
+    """
+    with Session(engine) as session:
+        known = _known_ids(session, [row["id"] for row in rows])
+        new = [row for row in rows if row["id"] not in known]
+        if mark_seen is not None:
+            for row in new:
+                row["last_seen"] = mark_seen
+        if new:
+            session.execute(insert(SpotifyLikedSongItem), new)
+
+        if mark_seen is not None:
+            # Also backfills `added_at` of songs stored before it was kept
+            seen = [{"id": row["id"], "added_at": row["added_at"], "last_seen": mark_seen} for row in rows if row["id"] in known]
+            if seen:
+                session.execute(update(SpotifyLikedSongItem), seen)
+
+        state = session.get(SpotifySyncState, 1) or SpotifySyncState()
+        state.offset = next_offset
+        state.total = total if total is not None else state.total
+        state.added = (state.added or 0) + len(new)
+        state.skipped = (state.skipped or 0) + skipped
+        if rows:
+            state.checkpoint_added_at = rows[-1]["added_at"]
+        session.add(state)
+        session.commit()
+    return new
+
+
+def _remove_unliked(run_started_at: float) -> Optional[int]:
+    """
+    Blocking: deletes the songs the full sync didn't list. Skipped (None) when fewer songs were
+    listed than Spotify reports (minus the local files it counts), the library changed during the
+    sync and a song could be missed.
+    """
+    with Session(engine) as session:
+        state = session.get(SpotifySyncState, 1)
+        seen = session.exec(
+            select(func.count()).select_from(SpotifyLikedSongItem).where(col(SpotifyLikedSongItem.last_seen) >= run_started_at)
+        ).one()
+        if state is None or state.total is None or seen < state.total - (state.skipped or 0):
+            return None
+        result = session.execute(delete(SpotifyLikedSongItem).where(or_(
+            col(SpotifyLikedSongItem.last_seen).is_(None),
+            col(SpotifyLikedSongItem.last_seen) < run_started_at,
+        )))
+        state.removed = result.rowcount or 0
+        session.add(state)
+        session.commit()
+        return state.removed
+
+
+def _finish(status: str, full_done: bool = False, error: Optional[str] = None) -> dict:
+    with Session(engine) as session:
+        state = session.get(SpotifySyncState, 1) or SpotifySyncState()
+        state.status = status
+        state.finished_at = time.time()
+        state.error = error
+        if status == "done":
+            state.last_sync = state.finished_at
+            if full_done:
+                state.last_full_sync = state.finished_at
+        session.add(state)
+        session.commit()
+        return _state_dict(state)
+
+
+def _publish(state: dict):
+    global _snapshot, _updated
+    _snapshot = state
+    _updated.set()
+    _updated = asyncio.Event()
+
+
+# --- Job ---
+
+async def _sync_new(sp, offset: int):
+    while True:
+        page = await asyncio.to_thread(call_with_retry, sp.current_user_saved_tracks, limit=SAVED_TRACKS_PAGE_SIZE, offset=offset)
+        offset += SAVED_TRACKS_PAGE_SIZE
+        new = await asyncio.to_thread(_store_page, _song_rows(page.get("items") or []), None, offset, page.get("total"))
+        thumbnail_mirror.request_many(row["album_art"] for row in new)
+        _publish(await asyncio.to_thread(load_state))
+        if not new or not page.get("next"):
+            return
+
+
+async def _sync_full(sp, offset: int, run_started_at: float) -> bool:
+    """Returns False when unliked songs couldn't be removed safely."""
+    total: Optional[int] = None
+
+    async def fetch(page_offset: int) -> dict:
+        return await asyncio.to_thread(call_with_retry, sp.current_user_saved_tracks, limit=SAVED_TRACKS_PAGE_SIZE, offset=page_offset)
+
+    while total is None or offset < total:
+        offsets = range(offset, offset + SAVED_TRACKS_PAGE_SIZE * SPOTIFY_PAGE_CONCURRENCY, SAVED_TRACKS_PAGE_SIZE)
+        pages = await asyncio.gather(*(fetch(page_offset) for page_offset in offsets))
+        total = pages[-1].get("total") or 0
+        items = [item for page in pages for item in page.get("items") or []]
+        offset = offsets[-1] + SAVED_TRACKS_PAGE_SIZE
+
+        new = await asyncio.to_thread(_store_page, _song_rows(items), run_started_at, offset, total, _skipped_items(items))
+        thumbnail_mirror.request_many(row["album_art"] for row in new)
+        _publish(await asyncio.to_thread(load_state))
+        if not pages[-1].get("items"):
+            break
+
+    removed = await asyncio.to_thread(_remove_unliked, run_started_at)
+    if removed is None:
+        print("⚠️ Liked songs changed during the full sync, unliked songs are removed on the next one")
+        return False
+    return True
+
+
+async def _run(state: dict):
+    mode = state["mode"]
+    print(f"🔄 Spotify liked songs sync ({mode}) from offset {state['offset']}")
+    try:
+        sp = await asyncio.to_thread(get_spotify_client)
+        if mode == "full":
+            full_done = await _sync_full(sp, state["offset"] or 0, state["started_at"])
+        else:
+            await _sync_new(sp, state["offset"] or 0)
+            full_done = False
+        final = await asyncio.to_thread(_finish, "done", full_done)
+        print(f"✅ Spotify liked songs synced ({mode}): {final['added']} added, {final['removed']} removed")
+    except asyncio.CancelledError:
+        # Left `running` on purpose, the checkpoint is resumed on the next start
+        print("🛑 Spotify liked songs sync interrupted, it will resume from its checkpoint")
+        raise
+    except Exception as e:
+        print(f"❌ Spotify liked songs sync failed: {e}")
+        final = await asyncio.to_thread(_finish, "failed", False, str(e))
+    final["running"] = False
+    _publish(final)
+
+
+def is_running() -> bool:
+    return _task is not None and not _task.done()
+
+
+def _launch(state: dict) -> dict:
+    global _task
+    _task = asyncio.create_task(_run(state))
+    state["running"] = True
+    _publish(state)
+    return state
+
+
+async def start(full: Optional[bool] = None) -> dict:
+    """
+    Starts a sync in the background and returns its state.
+    `full=None` runs a full sync when the last one is older than `SPOTIFY_FULL_SYNC_INTERVAL`.
+    Raises SyncAlreadyRunning while another sync runs.
+    """
+    if is_running():
+        raise SyncAlreadyRunning("A Spotify liked songs sync is already running")
+
+    if full is None:
+        last_full = (await asyncio.to_thread(load_state)).get("last_full_sync")
+        full = last_full is None or time.time() - last_full > SPOTIFY_FULL_SYNC_INTERVAL
+
+    state = await asyncio.to_thread(_begin, "full" if full else "new")
+    return _launch(state)
+
+
+async def resume():
+    """Resumes a sync that was still running when the app stopped. Called in the app lifespan."""
+    state = await asyncio.to_thread(load_state)
+    if state.get("status") != "running" or is_running() or not is_spotify_setup():
+        return
+    print(f"🔄 Resuming the interrupted Spotify liked songs sync at offset {state['offset']}")
+    _launch(state)
+
+
+async def stop():
+    """Interrupts a running sync, keeping its checkpoint."""
+    if is_running():
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+
+
+async def watch() -> AsyncIterator[dict]:
+    """Yields the sync state now and after every stored page, until the sync ends."""
+    if not _snapshot:
+        _publish(await asyncio.to_thread(load_state))
+    while True:
+        event = _updated
+        state = dict(_snapshot, running=is_running())
+        yield state
+        if not state["running"]:
+            return
+        await event.wait()
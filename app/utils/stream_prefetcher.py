@@ -0,0 +1,178 @@
+"""
+Resolves direct audio stream URLs for the next items in the queue, in the background.
+
+When a YouTube item reaches the head of the queue, the pre-resolved (signed) URL is
+handed to mpv, so the transition doesn't wait on a yt-dlp extraction.
+Signed URLs expire, the expiry is tracked and stale entries are resolved again.
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+from app.constants import (
+    PREFETCH_QUEUE_ITEMS,
+    PREFETCH_CONCURRENCY,
+    STREAM_URL_EXPIRY_MARGIN,
+    STREAM_URL_DEFAULT_LIFETIME,
+    METADATA_CACHE_NEGATIVE_TTL,
+    YTDLP_AUDIO_FORMAT,
+)
+from app.models import StreamInfo
+import app.queue as queue
+import app.utils.metadata_cache as metadata_cache
+import app.utils.ytdlp_pool as ytdlp_pool
+from app.utils.ytdlp_helpers import trim_info, is_unavailable_error
+
+# canonical media id -> resolved stream
+_streams: Dict[str, StreamInfo] = {}
+# canonical media id -> running extraction
+_inflight: Dict[str, asyncio.Task] = {}
+_semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+
+def _stream_expiry(stream_url: str) -> float:
+    """Reads the expiry from the signed URL (googlevideo `expire=`), or assumes a default lifetime."""
+    query = parse_qs(urlparse(stream_url).query)
+    expire = query.get("expire", [None])[0]
+    try:
+        return float(expire)
+    except (TypeError, ValueError):
+        return time.time() + STREAM_URL_DEFAULT_LIFETIME
+
+
+def extract_audio_stream(url: str) -> Optional[StreamInfo]:
+    """
+    Blocking: runs a single audio-only yt-dlp extraction and returns the direct stream URL.
+    The metadata of the same extraction is stored in the shared metadata cache.
+    """
+    try:
+        data = ytdlp_pool.extract_info(url, {"format": YTDLP_AUDIO_FORMAT, "noplaylist": True})
+    except ytdlp_pool.YtdlpTimeout:
+        print(f"⚠️ Stream extraction timed out: {url}")
+        return None
+    except Exception as e:
+        print(f"⚠️ Stream extraction failed for {url}: {e}")
+        if is_unavailable_error(e):
+            # Playback then knows the media is gone without asking yt-dlp again
+            key = metadata_cache.canonical_media_id(url)
+            metadata_cache.put(key, "youtube" if key.startswith("youtube:") else "url", None)
+        return None
+
+    # Same extraction gives the metadata, so playback never needs a second yt-dlp run
+    key = metadata_cache.canonical_media_id(url)
+    ttl = METADATA_CACHE_NEGATIVE_TTL if data.get("is_live") else None
+    metadata_cache.put(key, "youtube" if key.startswith("youtube:") else "url", trim_info(data), ttl=ttl)
+
+    stream_url = data.get("url")
+    if not stream_url:
+        return None
+
+    return StreamInfo(
+        page_url=data.get("webpage_url") or url,
+        stream_url=stream_url,
+        format_id=data.get("format_id"),
+        http_headers=data.get("http_headers") or {},
+        title=data.get("title"),
+        expires_at=_stream_expiry(stream_url),
+    )
+
+
+def _is_fresh(stream: Optional[StreamInfo]) -> bool:
+    return stream is not None and stream.expires_at - STREAM_URL_EXPIRY_MARGIN > time.time()
+
+
+def get_prefetched_stream(url: str) -> Optional[StreamInfo]:
+    """Returns the pre-resolved stream for a URL if it is still valid."""
+    stream = _streams.get(metadata_cache.canonical_media_id(url))
+    return stream if _is_fresh(stream) else None
+
+
+def remember_stream(url: str, stream: StreamInfo):
+    _streams[metadata_cache.canonical_media_id(url)] = stream
+
+
+async def _prefetch(key: str, url: str):
+    try:
+        async with _semaphore:
+            stream = await asyncio.to_thread(extract_audio_stream, url)
+        if stream is not None:
+            _streams[key] = stream
+            print(f"⚡ Prefetched stream for {url}")
+    finally:
+        _inflight.pop(key, None)
+
+
+def prefetch_stream(url: str) -> Optional[asyncio.Task]:
+    """Starts resolving the stream of a URL unless it's already known or being resolved."""
+    key = metadata_cache.canonical_media_id(url)
+    if _is_fresh(_streams.get(key)):
+        return None
+    if key in _inflight:
+        return _inflight[key]
+
+    task = asyncio.create_task(_prefetch(key, url))
+    _inflight[key] = task
+    return task
+
+
+async def get_stream_for_playback(url: str) -> Optional[StreamInfo]:
+    """
+    Returns a valid stream for playback: the pre-resolved one, the result of a prefetch
+    that is already running, or a new extraction. At most one extraction runs per call,
+    a prefetch that just failed is not repeated.
+    Returns None when the extraction failed or gave no stream URL.
+    """
+    stream = get_prefetched_stream(url)
+    if stream is not None:
+        print(f"⚡ Using prefetched stream for: {url}")
+        return stream
+
+    task = _inflight.get(metadata_cache.canonical_media_id(url))
+    if task is not None:
+        try:
+            await task
+        except Exception as e:
+            print(f"⚠️ Prefetch failed: {e}")
+        return get_prefetched_stream(url)
+
+    stream = await asyncio.to_thread(extract_audio_stream, url)
+    if stream is not None:
+        remember_stream(url, stream)
+    return stream
+
+
+def schedule_prefetch():
+    """Prefetches the next queue items and forgets streams that are no longer upcoming."""
+    upcoming = set()
+    for entry in list(queue.queue)[:PREFETCH_QUEUE_ITEMS]:
+        if getattr(entry, "source", None) != "youtube" or not getattr(entry, "url", None):
+            continue
+        upcoming.add(metadata_cache.canonical_media_id(entry.url))
+        prefetch_stream(entry.url)
+
+    for key in list(_streams):
+        if key not in upcoming and not _is_fresh(_streams[key]):
+            del _streams[key]
+
+
+async def run_prefetcher():
+    """
+    Background loop, started in the app lifespan.
+    Reacts to queue changes, and wakes up periodically to re-resolve URLs about to expire.
+    """
+    listener = queue.subscribe()
+    print("✅ Stream prefetcher started")
+    try:
+        while True:
+            schedule_prefetch()
+            try:
+                await asyncio.wait_for(listener.get(), timeout=60)
+            except asyncio.TimeoutError:
+                pass
+    except asyncio.CancelledError:
+        print("🛑 Stream prefetcher stopped")
+        raise
+    finally:
+        queue.unsubscribe(listener)
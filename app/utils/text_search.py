@@ -0,0 +1,77 @@
+"""
+Ranked text search over the tables listed in `app.database.FTS_INDEXES`.
+
+Uses the FTS5 indexes (bm25 ranking, first indexed column weighted highest, last
+word matched as a prefix so partial input finds results). Falls back to LIKE when
+SQLite has no FTS5.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import select as sa_select, text, func
+from sqlmodel import Session, SQLModel, select, or_
+
+import app.database as database
+from app.database import engine, FTS_INDEXES, FTS_KEYS, FTS_KEY_COLUMN
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """Turns user input into an FTS5 query, every word must match. None if there are no words."""
+    words = re.findall(r"\w+", q)
+    if not words:
+        return None
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(
+    model: Type[SQLModel],
+    q: str,
+    limit: int = 50,
+    offset: int = 0,
+    filters: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Any], int]:
+    """
+    Returns `(rows, total_matches)` of `model` matching `q`, best match first.
+    `filters` are extra `column == value` conditions.
+    """
+    table = model.__tablename__  # type: ignore[attr-defined]
+    columns = FTS_INDEXES[table]
+    filters = filters or {}
+
+    match = build_match_query(q)
+    if match is None:
+        return [], 0
+
+    with Session(engine) as session:
+        if not database.fts_available:
+            pattern = f"%{q.strip()}%"
+            statement = select(model).where(or_(*[getattr(model, c).ilike(pattern) for c in columns]))
+            for column, value in filters.items():
+                statement = statement.where(getattr(model, column) == value)
+            total = session.exec(select(func.count()).select_from(statement.subquery())).one()
+            rows = session.exec(statement.offset(offset).limit(limit)).all()
+            return list(rows), total
+
+        fts = f"{table}_fts"
+        join = f"JOIN {fts} ON {fts}.{FTS_KEY_COLUMN} = t.{FTS_KEYS[table]}"
+        conditions = "".join(f" AND t.{column} = :f_{column}" for column in filters)
+        params = {"q": match, "limit": limit, "offset": offset, **{f"f_{c}": v for c, v in filters.items()}}
+        # Title weighs more than artist
+        weights = ", ".join(["2.0"] + ["1.0"] * (len(columns) - 1))
+
+        total = session.execute(
+            text(f"SELECT count(*) FROM {table} t {join} WHERE {fts} MATCH :q{conditions}"),
+            params,
+        ).scalar_one()
+        rows = session.scalars(
+            sa_select(model).from_statement(text(
+                f"SELECT t.* FROM {table} t {join} "
+                f"WHERE {fts} MATCH :q{conditions} "
+                f"ORDER BY bm25({fts}, {weights}) LIMIT :limit OFFSET :offset"
+            )),
+            params,
+        ).all()
+        return list(rows), total
@@ -0,0 +1,250 @@
+"""
+Local mirror of remote thumbnails shown in long lists.
+
+Spotify album art and YouTube search thumbnails are downloaded in the background,
+shrunk to `THUMBNAIL_SIZE` and served from the cover art mount, so a client
+rendering hundreds of rows doesn't fetch hundreds of images over the internet.
+Responses use `prefer_local(url)`: the local URL once the thumbnail is mirrored,
+the remote URL (and a queued mirror job) until then.
+The mirror is capped at `THUMBNAIL_CACHE_MAX_BYTES`, least recently used first out.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlmodel import Session, select
+
+from app.constants import (
+    THUMBNAIL_DIR,
+    THUMBNAIL_SIZE,
+    THUMBNAIL_CACHE_MAX_BYTES,
+    THUMBNAIL_MIRROR_CONCURRENCY,
+    COVER_ART_PATH,
+    COVER_ART_URL_PREFIX,
+)
+from app.database import engine
+from app.models import SpotifyLikedSongItem, FavouritedSongs
+import app.utils.art_cache as art_cache
+import app.utils.http_client as http_client
+import app.utils.placeholders as placeholders
+
+# A hit only rewrites the file's mtime (kept for the LRU order across restarts) this often
+TOUCH_INTERVAL = 24 * 3600
+# A thumbnail that failed to download is not tried again before this
+FAILURE_BACKOFF = 3600
+# Expired failures are swept once this many are recorded
+FAILURE_SWEEP_SIZE = 1024
+
+# file name -> (size in bytes, last touched), least recently used first
+_index: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+_total_bytes = 0
+_lock = threading.Lock()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_queue: Optional["asyncio.Queue[str]"] = None
+_queued: Set[str] = set()
+# url -> time of the failed download
+_failed: Dict[str, float] = {}
+
+
+def _file_name(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg"
+
+
+def _is_remote(url: Optional[str]) -> bool:
+    return bool(url) and url.startswith(("http://", "https://"))
+
+
+def _load_index():
+    """Blocking: rebuilds the LRU order from the files on disk (oldest mtime first)."""
+    global _total_bytes
+    THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+    files = []
+    for path in THUMBNAIL_DIR.iterdir():
+        if path.name.startswith("."):
+            # Left over from an interrupted download
+            path.unlink(missing_ok=True)
+            continue
+        if path.suffix != ".jpg":
+            continue
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        files.append((stat.st_mtime, path.name, stat.st_size))
+
+    with _lock:
+        _index.clear()
+        for mtime, name, size in sorted(files):
+            _index[name] = (size, mtime)
+        _total_bytes = sum(size for size, _ in _index.values())
+    print(f"✅ Thumbnail mirror has {len(files)} thumbnails ({_total_bytes // 1024} KiB)")
+
+
+def _add(name: str, size: int):
+    """Records a new thumbnail and removes the least recently used ones beyond the cap."""
+    global _total_bytes
+    evicted = []
+    with _lock:
+        old = _index.pop(name, None)
+        if old is not None:
+            _total_bytes -= old[0]
+        _index[name] = (size, time.time())
+        _total_bytes += size
+        while _total_bytes > THUMBNAIL_CACHE_MAX_BYTES and len(_index) > 1:
+            old_name, (old_size, _) = _index.popitem(last=False)
+            _total_bytes -= old_size
+            evicted.append(old_name)
+
+    for old_name in evicted:
+        (THUMBNAIL_DIR / old_name).unlink(missing_ok=True)
+        placeholders.forget(THUMBNAIL_DIR / old_name)
+
+
+def local_url(url: Optional[str]) -> Optional[str]:
+    """
+    Returns the local URL of a mirrored thumbnail, None if it isn't mirrored (yet).
+    A thumbnail that isn't mirrored is queued for the background job.
+    """
+    if not _is_remote(url):
+        return None
+
+    name = _file_name(url)
+    touch = False
+    with _lock:
+        entry = _index.get(name)
+        if entry is not None:
+            _index.move_to_end(name)
+            size, touched_at = entry
+            if time.time() - touched_at > TOUCH_INTERVAL:
+                _index[name] = (size, time.time())
+                touch = True
+
+    if entry is None:
+        request(url)
+        return None
+    if touch:
+        try:
+            os.utime(THUMBNAIL_DIR / name)
+        except OSError:
+            pass
+    return f"{COVER_ART_URL_PREFIX}/{(THUMBNAIL_DIR / name).relative_to(COVER_ART_PATH).as_posix()}"
+
+
+def prefer_local(url: Optional[str]) -> Optional[str]:
+    """The mirrored thumbnail of `url` if there is one, else `url` itself."""
+    return local_url(url) or url
+
+
+def request(url: str):
+    """Queues a thumbnail for mirroring, callable from any thread."""
+    if _loop is None or _queue is None or not _is_remote(url):
+        return
+    with _lock:
+        if url in _queued:
+            return
+        failed_at = _failed.get(url)
+        if failed_at is not None:
+            if time.time() - failed_at < FAILURE_BACKOFF:
+                return
+            del _failed[url]
+        _queued.add(url)
+    _loop.call_soon_threadsafe(_queue.put_nowait, url)
+
+
+def request_many(urls: Iterable[Optional[str]]):
+    for url in urls:
+        if url and _is_remote(url) and _file_name(url) not in _index:
+            request(url)
+
+
+def _store(data: bytes, name: str) -> Optional[int]:
+    """Blocking: shrinks the downloaded image into the mirror, returns the thumbnail size in bytes."""
+    download = THUMBNAIL_DIR / f".{name}.download"
+    target = THUMBNAIL_DIR / name
+    try:
+        download.write_bytes(data)
+        if not art_cache.resize_image(download, target, THUMBNAIL_SIZE):
+            return None
+        placeholders.schedule(target)
+        return target.stat().st_size
+    finally:
+        download.unlink(missing_ok=True)
+
+
+def _record_failure(url: str):
+    now = time.time()
+    with _lock:
+        _failed[url] = now
+        if len(_failed) >= FAILURE_SWEEP_SIZE:
+            for old_url in [u for u, failed_at in _failed.items() if now - failed_at >= FAILURE_BACKOFF]:
+                del _failed[old_url]
+
+
+async def _mirror(url: str):
+    name = _file_name(url)
+    try:
+        if name in _index:
+            return
+        response = await http_client.get(url)
+        response.raise_for_status()
+        size = await asyncio.to_thread(_store, response.content, name)
+        if size is None:
+            _record_failure(url)
+        else:
+            _add(name, size)
+    except Exception as e:
+        _record_failure(url)
+        print(f"⚠️ Failed to mirror thumbnail {url}: {e}")
+    finally:
+        with _lock:
+            _queued.discard(url)
+
+
+def _library_thumbnails() -> list:
+    """Blocking: remote thumbnails of the liked songs and favourites, to mirror ahead of time."""
+    with Session(engine) as session:
+        urls = list(session.exec(select(SpotifyLikedSongItem.album_art)))
+        urls += list(session.exec(select(FavouritedSongs.cover_art_url)))
+    return [url for url in urls if _is_remote(url)]
+
+
+async def run_mirror():
+    """
+    Background loop, started in the app lifespan.
+    Mirrors the liked songs and favourites first, then whatever the responses queue.
+    """
+    global _loop, _queue
+    await asyncio.to_thread(_load_index)
+    _loop = asyncio.get_running_loop()
+    _queue = asyncio.Queue()
+    running: Set[asyncio.Task] = set()
+
+    print("✅ Thumbnail mirror started")
+    try:
+        try:
+            request_many(await asyncio.to_thread(_library_thumbnails))
+        except Exception as e:
+            print(f"⚠️ Failed listing library thumbnails: {e}")
+
+        while True:
+            url = await _queue.get()
+            while len(running) >= THUMBNAIL_MIRROR_CONCURRENCY:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            task = asyncio.create_task(_mirror(url))
+            running.add(task)
+            task.add_done_callback(running.discard)
+    except asyncio.CancelledError:
+        for task in running:
+            task.cancel()
+        print("🛑 Thumbnail mirror stopped")
+        raise
+    finally:
+        _loop = None
+        _queue = None
+        _queued.clear()
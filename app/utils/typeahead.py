@@ -0,0 +1,110 @@
+"""
+Search-as-you-type on top of the search cache.
+
+Every keystroke of a client supersedes its previous query. A query waits a short
+debounce window first, so intermediate keystrokes never start an extraction.
+Identical queries in flight share one extraction, which is cancelled (its yt-dlp
+worker killed) once no client is waiting for it anymore, because they disconnected
+or typed something newer.
+"""
+
+import asyncio
+import itertools
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.constants import TYPEAHEAD_DEBOUNCE
+import app.utils.search_cache as search_cache
+import app.utils.ytdlp_pool as ytdlp_pool
+
+
+class Superseded(Exception):
+    """The client sent a newer query or went away, its result is not needed anymore."""
+
+
+class _InFlight:
+    def __init__(self, key: Tuple[str, int, int], task: asyncio.Task, cancel_event: threading.Event):
+        self.key = key
+        self.task = task
+        self.cancel_event = cancel_event
+        self.waiters = 0
+
+
+# (normalized query, offset, count) -> shared extraction
+_inflight: Dict[Tuple[str, int, int], _InFlight] = {}
+# client id -> sequence number of its latest query
+_latest: Dict[str, int] = {}
+_sequence = itertools.count(1)
+
+
+def _start(key: Tuple[str, int, int], query: str, offset: int, count: int) -> _InFlight:
+    cancel_event = threading.Event()
+    task = asyncio.create_task(asyncio.to_thread(search_cache.get_results, query, offset, count, cancel_event))
+    flight = _InFlight(key, task, cancel_event)
+    _inflight[key] = flight
+
+    def forget(_):
+        if _inflight.get(key) is flight:
+            del _inflight[key]
+        # Retrieve the exception so a cancelled extraction isn't logged as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    task.add_done_callback(forget)
+    return flight
+
+
+def _leave(flight: _InFlight):
+    flight.waiters -= 1
+    if flight.waiters <= 0 and not flight.task.done():
+        print(f"🛑 Cancelling typeahead search nobody waits for: {flight.key[0]!r}")
+        flight.cancel_event.set()
+        # A new client asking for the same query starts a fresh extraction
+        if _inflight.get(flight.key) is flight:
+            del _inflight[flight.key]
+
+
+async def search(
+    client_id: str,
+    query: str,
+    offset: int,
+    count: int,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+) -> Tuple[List[dict], int, bool]:
+    """
+    Returns `(entries, total_known, has_more)` like `search_cache.get_results`.
+    Raises `Superseded` when the client sent a newer query or disconnected meanwhile.
+    """
+    seq = next(_sequence)
+    _latest[client_id] = seq
+
+    def superseded() -> bool:
+        return _latest.get(client_id) != seq
+
+    # Already cached pages are cheap, no reason to debounce them
+    cached = search_cache.peek_results(query, offset, count)
+    if cached is not None:
+        _latest.pop(client_id, None)
+        return cached
+
+    await asyncio.sleep(TYPEAHEAD_DEBOUNCE)
+    if superseded():
+        raise Superseded()
+
+    key = (search_cache.normalize_query(query), offset, count)
+    flight = _inflight.get(key) or _start(key, query, offset, count)
+    flight.waiters += 1
+    try:
+        while True:
+            done, _ = await asyncio.wait({flight.task}, timeout=0.2)
+            if done:
+                return flight.task.result()
+            if superseded() or (is_disconnected is not None and await is_disconnected()):
+                raise Superseded()
+    except ytdlp_pool.YtdlpCancelled:
+        # Cancelled for everyone else while we were still waiting, shouldn't happen
+        raise Superseded()
+    finally:
+        _leave(flight)
+        if not superseded():
+            _latest.pop(client_id, None)
@@ -0,0 +1,135 @@
+"""
+One search over every place a song can come from.
+
+The local library, favourites, Spotify liked songs, history and YouTube are searched
+in parallel, each under its own deadline (`UNIFIED_SEARCH_DEADLINES`). Results are
+handed out per source as soon as that source answers, so fast local hits never wait
+for YouTube. A source that misses its deadline is reported as timed out; a YouTube
+search keeps running in the background and fills the search cache for the next call.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.constants import UNIFIED_SEARCH_DEADLINES
+from app.models import FavouritedSongs, SpotifyLikedSongItem, History
+from app.utils.metadata_fetchers import get_mpd_by_metadata
+import app.utils.search_cache as search_cache
+import app.utils.text_search as text_search
+import app.utils.thumbnail_mirror as thumbnail_mirror
+
+
+def _result(source: str, title: Optional[str], url: Optional[str] = None, **extra) -> Dict[str, Any]:
+    """Common shape of a unified search result, extra keys are source specific."""
+    thumbnail = extra.get("thumbnail")
+    if thumbnail:
+        extra["thumbnail"] = thumbnail_mirror.prefer_local(thumbnail)
+        extra["thumbnail_remote"] = thumbnail
+    return {"source": source, "title": title, "url": url, **extra}
+
+
+def _search_library(q: str, limit: int) -> List[Dict[str, Any]]:
+    return [
+        _result("library", song.media_name, artist=song.artist, album=song.album, duration=song.duration)
+        for song in get_mpd_by_metadata(q)[:limit]
+    ]
+
+
+def _search_favourites(q: str, limit: int) -> List[Dict[str, Any]]:
+    songs, _ = text_search.search(FavouritedSongs, q, limit)
+    return [
+        _result("favourites", s.song_name, s.url or None, artist=s.artist, type=s.type, thumbnail=s.cover_art_url)
+        for s in songs
+    ]
+
+
+def _search_spotify_liked(q: str, limit: int) -> List[Dict[str, Any]]:
+    songs, _ = text_search.search(SpotifyLikedSongItem, q, limit)
+    return [
+        _result("spotify", s.name, s.spotify_url, artist=s.artist, thumbnail=s.album_art)
+        for s in songs
+    ]
+
+
+def _search_history(q: str, limit: int) -> List[Dict[str, Any]]:
+    rows, _ = text_search.search(History, q, limit * 5)
+
+    # The same song is usually played many times, keep one entry per song
+    results, seen = [], set()
+    for row in rows:
+        key = (row.song_name, row.url)
+        if key in seen:
+            continue
+        seen.add(key)
+        results.append(_result("history", row.song_name, str(row.url) if row.url else None,
+                               player_type=row.player_type, last_played=row.time))
+        if len(results) >= limit:
+            break
+    return results
+
+
+def _search_youtube(q: str, limit: int) -> List[Dict[str, Any]]:
+    entries, _, _ = search_cache.get_results(q, 0, limit)
+    results = []
+    for v in entries:
+        if v.get("_type") != "url" or not v.get("id"):
+            continue
+        thumbnails = v.get("thumbnails") or []
+        results.append(_result(
+            "youtube",
+            v.get("title"),
+            v.get("webpage_url") or f"https://www.youtube.com/watch?v={v.get('id')}",
+            artist=v.get("uploader") or v.get("channel"),
+            duration=v.get("duration"),
+            thumbnail=thumbnails[-1].get("url") if thumbnails else None,
+        ))
+    return results
+
+
+# Local sources first, that's also the order results are reported in when they arrive together
+SOURCES: Dict[str, Callable[[str, int], List[Dict[str, Any]]]] = {
+    "library": _search_library,
+    "favourites": _search_favourites,
+    "spotify": _search_spotify_liked,
+    "history": _search_history,
+    "youtube": _search_youtube,
+}
+
+
+async def _run_source(source: str, q: str, limit: int) -> Dict[str, Any]:
+    """Runs one source under its deadline, never raises."""
+    deadline = UNIFIED_SEARCH_DEADLINES.get(source, 2.0)
+    # The thread can't be interrupted, shielding keeps it (and a YouTube search) filling the caches
+    task = asyncio.ensure_future(asyncio.to_thread(SOURCES[source], q, limit))
+    try:
+        results = await asyncio.wait_for(asyncio.shield(task), timeout=deadline)
+        return {"source": source, "status": "ok", "results": results}
+    except asyncio.TimeoutError:
+        print(f"⏱️ Unified search: {source} missed its {deadline}s deadline for {q!r}")
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return {"source": source, "status": "timeout", "results": []}
+    except Exception as e:
+        print(f"⚠️ Unified search: {source} failed for {q!r}: {e}")
+        return {"source": source, "status": "error", "error": str(e), "results": []}
+
+
+async def search_sources(q: str, limit: int, sources: Optional[List[str]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Yields one `{"source", "status", "results"}` dict per source, in the order they finish."""
+    names = [name for name in SOURCES if sources is None or name in sources]
+    pending = [asyncio.ensure_future(_run_source(name, q, limit)) for name in names]
+    try:
+        for next_done in asyncio.as_completed(pending):
+            yield await next_done
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def search_all(q: str, limit: int, sources: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Waits for every source (each bounded by its deadline) and groups the results."""
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    status: Dict[str, str] = {}
+    async for part in search_sources(q, limit, sources):
+        results[part["source"]] = part["results"]
+        status[part["source"]] = part["status"]
+    return {"query": q, "results": results, "status": status}
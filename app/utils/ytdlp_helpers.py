@@ -1,9 +1,9 @@
 import shutil
-import subprocess
-import json
 import re
 from typing import Optional
-from app.models import MediaInfo
+from app.constants import METADATA_CACHE_NEGATIVE_TTL
+import app.utils.metadata_cache as metadata_cache
+import app.utils.ytdlp_pool as ytdlp_pool
 
 from ..variables import media_info
 
@@ -11,34 +11,88 @@ from ..variables import media_info
 def check_ytdlp_available():
     return shutil.which("yt-dlp") is not None
 
-def get_media_data(url: str) -> Optional[MediaInfo]:
-    try:
-        if not check_ytdlp_available():
-            print("yt-dlp not available")
-            # LOG this error or handle it as needed
-            raise ValueError("yt-dlp is not installed or not found in PATH")
+# Fields of the yt-dlp info dict that are kept in the metadata cache,
+# formats and signed stream URLs are left out since they expire.
+CACHED_INFO_FIELDS = [
+    "id", "title", "webpage_url", "uploader", "uploader_url", "channel", "channel_id",
+    "upload_date", "duration", "thumbnail", "release_timestamp", "timestamp", "is_live",
+]
+
+def trim_info(data: dict) -> dict:
+    """Reduces a yt-dlp info dict to the cacheable metadata."""
+    info = {field: data.get(field) for field in CACHED_INFO_FIELDS}
+    info["thumbnails"] = [
+        {"url": t.get("url"), "width": t.get("width"), "height": t.get("height")}
+        for t in data.get("thumbnails") or []
+        if t.get("url")
+    ]
+    return info
 
-        cmd = ["yt-dlp", "-j", url]  # -j = print metadata as JSON
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=60)
-        
-        if result.returncode != 0:
-            raise ValueError(f"yt-dlp error: {result.stderr.strip()}")
+# yt-dlp errors meaning the media itself is gone or unsupported, these are negative cached.
+# Anything else (timeouts, cancellations, network errors, rate limits) may work on the next try.
+UNAVAILABLE_ERROR_PATTERN = re.compile(
+    r"unavailable|not available|private video|has been removed|been terminated|does not exist"
+    r"|not found|HTTP Error 404|HTTP Error 410|Unsupported URL|is not a valid URL|members-only"
+    r"|sign in to confirm your age",
+    re.IGNORECASE,
+)
 
+def is_unavailable_error(error: Exception) -> bool:
+    if isinstance(error, (ytdlp_pool.YtdlpTimeout, ytdlp_pool.YtdlpCancelled, ytdlp_pool.YtdlpStreamLost)):
+        return False
+    return bool(UNAVAILABLE_ERROR_PATTERN.search(str(error)))
 
-            
-        data = json.loads(result.stdout)
+def _fetch_media_data(url: str) -> Optional[dict]:
+    """
+    Returns the trimmed metadata, None when the media is definitely unavailable.
+    Raises on transient errors, so they aren't negative cached.
+    """
+    try:
+        # Single item lookup, through the warm yt-dlp worker pool
+        data = ytdlp_pool.extract_info(url, {"noplaylist": True})
+    except ytdlp_pool.YtdlpError as e:
+        if is_unavailable_error(e):
+            print(f"Media unavailable: {e}")
+            return None
+        raise
+
+    if not data:
+        print("No metadata found for the provided URL")
+        return None
+    return trim_info(data)
 
-        if not data:
-            raise ValueError("No metadata found for the provided URL")
-                
+def get_media_data(url: str) -> Optional[dict]:
+    """
+    Returns the yt-dlp metadata for a URL (see `CACHED_INFO_FIELDS`).
+    Served from the shared metadata cache when possible.
+    Unavailable media is negative cached, failed lookups (timeouts, network errors) are not.
+    """
+    key = metadata_cache.canonical_media_id(url)
+    source = "youtube" if key.startswith("youtube:") else "url"
+
+    found, data = metadata_cache.get(key)
+    if found:
         return data
-    except subprocess.TimeoutExpired:
+
+    try:
+        data = _fetch_media_data(url)
+    except ytdlp_pool.YtdlpTimeout:
         print("yt-dlp metadata fetch timed out")
         return None
     except Exception as e:
         print(f"Error fetching media info: {e}")
         return None
+
+    # Live streams change (title, duration), don't keep them for long
+    ttl = METADATA_CACHE_NEGATIVE_TTL if data and data.get("is_live") else None
+    metadata_cache.put(key, source, data, ttl=ttl)
+    return data
     
+def is_known_unavailable(url: str) -> bool:
+    """True when yt-dlp reported the media as unavailable (a negative cache entry); never runs yt-dlp."""
+    found, data = metadata_cache.get(metadata_cache.canonical_media_id(url))
+    return found and data is None
+
 def extract_youtube_id(url: str) -> str | None:
     # Match typical YouTube URL formats
     patterns = [
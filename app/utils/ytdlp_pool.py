@@ -0,0 +1,413 @@
+"""
+Pool of long-lived yt-dlp worker processes.
+
+Spawning the yt-dlp CLI for every lookup pays the interpreter start plus the
+yt-dlp import (often more than a second) before any network work. Workers here
+import yt_dlp once, keep their `YoutubeDL` instances warm and take extraction
+jobs over a pipe. Jobs have a timeout; a worker that times out is killed and
+replaced, and every worker is recycled after `YTDLP_POOL_MAX_JOBS` jobs.
+
+Besides one-shot extractions, a worker can keep a lazily extracted result list
+open (`open_stream`), so more entries of e.g. a search can be pulled later
+without starting over.
+
+Keep the imports of this module light, it is imported again by every spawned worker.
+"""
+
+import asyncio
+import itertools
+import json
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+from app.constants import YTDLP_POOL_SIZE, YTDLP_POOL_MAX_JOBS, YTDLP_JOB_TIMEOUT, YTDLP_MAX_OPEN_STREAMS, YTDLP_MAX_INSTANCES
+
+# Options every YoutubeDL instance starts from
+BASE_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "skip_download": True,
+    "noprogress": True,
+}
+
+
+class YtdlpError(Exception):
+    """Raised when an extraction fails, times out or the worker dies."""
+
+
+class YtdlpTimeout(YtdlpError):
+    pass
+
+
+class YtdlpCancelled(YtdlpError):
+    """The job was cancelled by the caller, its worker was killed."""
+
+
+class YtdlpStreamLost(YtdlpError):
+    """The worker holding an open stream was restarted, the stream has to be opened again."""
+
+
+# --- Worker process ---
+
+def _worker_main(conn):
+    import yt_dlp
+
+    instances: "OrderedDict[str, Any]" = OrderedDict()
+    streams: "OrderedDict[int, Any]" = OrderedDict()
+
+    def get_ydl(opts):
+        key = json.dumps(opts, sort_keys=True)
+        ydl = instances.get(key)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL({**BASE_OPTS, **opts})
+            instances[key] = ydl
+            # Paged extractions use different options per page, don't keep them all
+            while len(instances) > YTDLP_MAX_INSTANCES:
+                instances.popitem(last=False)
+        instances.move_to_end(key)
+        return ydl
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if message is None:
+            break
+
+        job_id, op, args = message
+        try:
+            if op == "extract":
+                url, opts = args
+                ydl = get_ydl(opts)
+                info = ydl.extract_info(url, download=False)
+                conn.send((job_id, "ok", ydl.sanitize_info(info)))
+
+            elif op == "open":
+                stream_id, url, opts = args
+                ydl = get_ydl(opts)
+                # process=False keeps `entries` a lazy generator
+                info = ydl.extract_info(url, download=False, process=False)
+                streams[stream_id] = (ydl, iter(info.get("entries") or []))
+                while len(streams) > YTDLP_MAX_OPEN_STREAMS:
+                    streams.popitem(last=False)
+                meta = {k: v for k, v in info.items() if k != "entries"}
+                conn.send((job_id, "ok", ydl.sanitize_info(meta)))
+
+            elif op == "take":
+                stream_id, count = args
+                if stream_id not in streams:
+                    conn.send((job_id, "lost", None))
+                    continue
+                ydl, entries = streams[stream_id]
+                streams.move_to_end(stream_id)
+                # One message per entry, the caller can forward them as they arrive.
+                # Empty entries are sent as None so the caller knows its position in the list.
+                taken = 0
+                for entry in itertools.islice(entries, count):
+                    taken += 1
+                    conn.send((job_id, "item", ydl.sanitize_info(entry) if entry else None))
+                conn.send((job_id, "ok", taken))
+
+            elif op == "close":
+                streams.pop(args, None)
+                conn.send((job_id, "ok", None))
+
+            else:
+                conn.send((job_id, "error", f"Unknown op: {op}"))
+
+        except Exception as e:
+            conn.send((job_id, "error", str(e)))
+
+    conn.close()
+
+
+# --- Parent side ---
+
+_job_ids = itertools.count(1)
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self._ctx = ctx
+        self.process = None
+        self.conn = None
+        self.jobs_done = 0
+        self.generation = 0  # bumped on every (re)spawn, open streams die with the process
+        self._spawn()
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.jobs_done = 0
+        self.generation += 1
+
+    def stop(self, graceful: bool = True):
+        if self.process is None:
+            return
+        if graceful and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(timeout=2)
+            except Exception:
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=2)
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.process = None
+
+    def restart(self):
+        self.stop(graceful=False)
+        self._spawn()
+
+    def run(
+        self,
+        op: str,
+        args,
+        timeout: float,
+        recycle: bool = True,
+        on_item: Optional[Callable[[dict], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ):
+        """
+        Sends a job and waits for its reply.
+        Jobs answering with several `item` messages (`take`) return `(items, final payload)`,
+        `on_item` is called for each item as soon as it arrives.
+        Setting `cancel_event` kills the worker (and the extraction with it).
+        """
+        if self.process is None or not self.process.is_alive():
+            self.restart()
+
+        job_id = next(_job_ids)
+        self.conn.send((job_id, op, args))
+        deadline = time.monotonic() + timeout
+        items: List[dict] = []
+
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                print(f"🛑 yt-dlp job cancelled, restarting worker: {op} {args}")
+                self.restart()
+                raise YtdlpCancelled("Extraction cancelled")
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"⚠️ yt-dlp job timed out after {timeout}s, restarting worker: {op} {args}")
+                self.restart()
+                raise YtdlpTimeout(f"Extraction timed out after {timeout}s")
+
+            try:
+                if not self.conn.poll(min(remaining, 0.2)):
+                    continue
+                reply_id, status, payload = self.conn.recv()
+            except (EOFError, OSError) as e:
+                self.restart()
+                raise YtdlpError(f"yt-dlp worker died: {e}")
+
+            if reply_id != job_id:
+                continue
+            if status == "item":
+                items.append(payload)
+                if on_item:
+                    on_item(payload)
+                continue
+            break
+
+        self.jobs_done += 1
+        # Don't recycle in the middle of a stream, it would lose the open entries
+        if recycle and self.jobs_done >= YTDLP_POOL_MAX_JOBS:
+            print("♻️ Recycling yt-dlp worker")
+            self.restart()
+
+        if status == "lost":
+            raise YtdlpStreamLost("Stream is no longer open on the worker")
+        if status != "ok":
+            raise YtdlpError(payload)
+        return (items, payload) if op == "take" else payload
+
+
+class YtdlpStream:
+    """
+    A lazily extracted result list held open by one worker.
+    `take(n)` extracts only the next n entries.
+    """
+
+    def __init__(self, pool: "YtdlpPool", worker: _Worker, stream_id: int, info: dict):
+        self._pool = pool
+        self._worker = worker
+        self._generation = worker.generation
+        self.stream_id = stream_id
+        self.info = info
+        self.exhausted = False
+        # Entries taken so far, empty ones included
+        self.position = 0
+
+    def take(
+        self,
+        count: int,
+        timeout: Optional[float] = None,
+        on_item: Optional[Callable[[dict], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> List[dict]:
+        """Extracts the next `count` entries, `on_item` gets each entry as soon as it arrives."""
+        if self.exhausted:
+            return []
+        entries: List[dict] = []
+
+        def receive(entry: Optional[dict]):
+            self.position += 1
+            if entry:
+                entries.append(entry)
+                if on_item:
+                    on_item(entry)
+
+        worker = self._pool._acquire(self._worker)
+        try:
+            if worker.generation != self._generation:
+                raise YtdlpStreamLost("yt-dlp worker was restarted")
+            _, taken = worker.run(
+                "take", (self.stream_id, count), timeout or YTDLP_JOB_TIMEOUT,
+                recycle=False, on_item=receive, cancel_event=cancel_event,
+            )
+        finally:
+            self._pool._release(worker)
+
+        # Fewer entries than asked for means the end of the list, empty entries don't count against it
+        if taken < count:
+            self.exhausted = True
+        return entries
+
+    def close(self):
+        if self._worker.generation != self._generation:
+            return
+        worker = self._pool._acquire(self._worker)
+        try:
+            if worker.generation == self._generation:
+                worker.run("close", self.stream_id, 5, recycle=False)
+        except YtdlpError:
+            pass
+        finally:
+            self._pool._release(worker)
+
+
+class YtdlpPool:
+    def __init__(self, size: int = YTDLP_POOL_SIZE):
+        self.size = size
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        self._busy: set = set()
+        self._cond = threading.Condition()
+        self._stream_ids = itertools.count(1)
+        self._next_worker = 0
+
+    @property
+    def started(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        with self._cond:
+            if self._workers:
+                return
+            self._workers = [_Worker(self._ctx) for _ in range(self.size)]
+        print(f"✅ yt-dlp pool started with {self.size} workers")
+
+    def shutdown(self):
+        with self._cond:
+            for worker in self._workers:
+                worker.stop()
+            self._workers = []
+            self._busy = set()
+            self._cond.notify_all()
+        print("🛑 yt-dlp pool stopped")
+
+    def _acquire(self, worker: Optional[_Worker] = None) -> _Worker:
+        """Waits for a free worker (or for the given one) and marks it busy."""
+        if not self.started:
+            self.start()
+
+        with self._cond:
+            while True:
+                if worker is not None:
+                    if worker not in self._busy:
+                        break
+                else:
+                    # Round robin, so open streams spread over the workers
+                    count = len(self._workers)
+                    for offset in range(count):
+                        candidate = self._workers[(self._next_worker + offset) % count]
+                        if candidate not in self._busy:
+                            worker = candidate
+                            self._next_worker = (self._next_worker + offset + 1) % count
+                            break
+                    if worker is not None:
+                        break
+                self._cond.wait()
+            self._busy.add(worker)
+            return worker
+
+    def _release(self, worker: _Worker):
+        with self._cond:
+            self._busy.discard(worker)
+            self._cond.notify_all()
+
+    def extract(
+        self,
+        url: str,
+        opts: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> dict:
+        """
+        Blocking: runs `YoutubeDL.extract_info(url, download=False)` on a free worker.
+        Returns the sanitized info dict, raises `YtdlpError` on failure.
+        """
+        worker = self._acquire()
+        try:
+            return worker.run("extract", (url, opts or {}), timeout or YTDLP_JOB_TIMEOUT, cancel_event=cancel_event)
+        finally:
+            self._release(worker)
+
+    def open_stream(
+        self,
+        url: str,
+        opts: Optional[dict] = None,
+        timeout: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> YtdlpStream:
+        """
+        Blocking: starts a lazy extraction of a playlist-like URL (e.g. `ytsearchall:<query>`).
+        Entries are pulled later with `YtdlpStream.take`.
+        """
+        worker = self._acquire()
+        stream_id = next(self._stream_ids)
+        try:
+            info = worker.run("open", (stream_id, url, opts or {}), timeout or YTDLP_JOB_TIMEOUT, cancel_event=cancel_event)
+        finally:
+            self._release(worker)
+        return YtdlpStream(self, worker, stream_id, info)
+
+
+pool = YtdlpPool()
+
+
+def extract_info(url: str, opts: Optional[dict] = None, timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None) -> dict:
+    """Blocking extraction through the shared pool. `opts` are `YoutubeDL` options."""
+    return pool.extract(url, opts, timeout, cancel_event)
+
+
+async def extract_info_async(url: str, opts: Optional[dict] = None, timeout: Optional[float] = None) -> dict:
+    """Same as `extract_info`, without blocking the event loop."""
+    return await asyncio.to_thread(pool.extract, url, opts, timeout)
+
+
+def open_stream(url: str, opts: Optional[dict] = None, timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None) -> YtdlpStream:
+    return pool.open_stream(url, opts, timeout, cancel_event)
@@ -19,5 +19,8 @@ last_played_media = LastPlayedMedia(title="", url="")
 
 player_instance: Optional[MediaPlayerBase] = None
 
+# Art id of the playing track, set by /player/album_art
+current_art_id: Optional[str] = None
+
 mpd_proc: subprocess.Popen | None = None
 mpdirs2_proc: subprocess.Popen | None = None
\ No newline at end of file
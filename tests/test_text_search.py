@@ -0,0 +1,75 @@
+import uuid
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("yaml")
+if not (Path(__file__).resolve().parents[1] / "app" / "configs" / "config.yaml").exists():
+    # app.constants reads it on import
+    pytest.skip("app/configs/config.yaml is missing", allow_module_level=True)
+
+from sqlalchemy import text
+from sqlmodel import SQLModel, Session, create_engine, select
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # app.database creates ./db on import
+    monkeypatch.chdir(tmp_path)
+    import app.database as database
+    import app.models  # noqa: F401, registers the tables
+    import app.utils.text_search as text_search
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(database, "engine", engine)
+    monkeypatch.setattr(text_search, "engine", engine)
+    SQLModel.metadata.create_all(engine)
+    database._create_fts_indexes()
+    if not database.fts_available:
+        pytest.skip("SQLite without FTS5")
+    return engine
+
+
+def test_search_after_vacuum(db):
+    from app.models import FavouritedSongs, SpotifyLikedSongItem
+    from app.utils.text_search import search
+
+    with Session(db) as session:
+        for i in range(30):
+            session.add(FavouritedSongs(
+                id=uuid.uuid4(), song_name=f"Song {i}", artist="Someone", url=f"https://example.com/{i}",
+                date_added=None, type="youtube", cover_art_url=None,
+            ))
+            session.add(SpotifyLikedSongItem(
+                id=f"track{i}", name=f"Liked {i}", artist="Band", album_art=None,
+                spotify_url=f"https://open.spotify.com/track/track{i}",
+            ))
+        session.commit()
+
+        # Leave gaps, VACUUM renumbers the implicit rowids of tables without an INTEGER PRIMARY KEY
+        for row in session.exec(select(FavouritedSongs)).all()[:20]:
+            session.delete(row)
+        for row in session.exec(select(SpotifyLikedSongItem)).all()[:20]:
+            session.delete(row)
+        renamed = session.get(SpotifyLikedSongItem, "track25")
+        renamed.name = "Renamed tune"
+        session.add(renamed)
+        session.commit()
+
+    with db.connect() as conn:
+        conn.execute(text("VACUUM"))
+
+    rows, total = search(FavouritedSongs, "song")
+    assert total == 10
+    assert sorted(row.song_name for row in rows) == sorted(f"Song {i}" for i in range(20, 30))
+
+    rows, total = search(SpotifyLikedSongItem, "liked")
+    assert total == 9
+    assert {row.id for row in rows} == {f"track{i}" for i in range(20, 30)} - {"track25"}
+
+    rows, total = search(SpotifyLikedSongItem, "renamed tu")
+    assert [row.id for row in rows] == ["track25"]
+
+    rows, total = search(SpotifyLikedSongItem, "liked 25")
+    assert total == 0